@@ -0,0 +1,179 @@
+"""
+Generador de corpus sintéticos de duplicados, reproducible a partir de una semilla.
+Crea, repartidas en las subcarpetas "a" y "b":
+- Imágenes: la mitad tiene copias redimensionadas, recomprimidas y sin metadatos; el resto es única.
+- Videos: la mitad tiene copias recodificadas a otras resoluciones; el resto es único.
+- Copias exactas de audio, documentos y otros, más archivos del mismo tamaño y distinto contenido
+  para que el prefiltro tenga algo que descartar.
+- Archivos dispersos grandes (.iso) con su copia, que ocupan poco en disco pero se leen enteros.
+Junto al corpus se guarda "manifiesto.json" con los grupos de duplicados esperados por tipo,
+con rutas relativas a la carpeta del corpus.
+
+Uso: python benchmarks/corpus.py CARPETA [--imagenes 40] [--videos 6] [--exactos 200] [--dispersos 2] [--semilla 0]
+"""
+import os
+import json
+import argparse
+import numpy as np
+from PIL import Image
+
+MANIFIESTO = "manifiesto.json"
+EXTENSIONES_EXACTOS = {"Audio": ".mp3", "Documentos": ".pdf", "Otros": ".zip"}
+
+def _ruta(carpeta, subcarpeta, nombre):
+    os.makedirs(os.path.join(carpeta, subcarpeta), exist_ok=True)
+    return os.path.join(carpeta, subcarpeta, nombre)
+
+# INICIO - Imágenes.
+def imagen_base(aleatorio, ancho=640, alto=480):
+    """
+    Imagen suave (ruido de baja resolución ampliado), parecida a una foto para los hashes perceptuales.
+    """
+    ruido = Image.fromarray((aleatorio.rand(6, 8, 3) * 255).astype("uint8"))
+    return ruido.resize((ancho, alto), Image.BICUBIC)
+
+def generar_imagenes(carpeta, cantidad, aleatorio):
+    grupos = []
+    for i in range(cantidad):
+        img = imagen_base(aleatorio)
+        exif = Image.Exif()
+        exif[0x010E] = f"Imagen sintética {i}" # ImageDescription
+        exif[0x0131] = "DoppelFiles corpus" # Software
+        original = _ruta(carpeta, "a", f"imagen_{i}.jpg")
+        img.save(original, quality=95, exif=exif)
+        if i % 2:
+            continue
+
+        redimensionada = _ruta(carpeta, "b", f"imagen_{i}_chica.png")
+        img.resize((img.width // 2, img.height // 2), Image.LANCZOS).save(redimensionada)
+        recomprimida = _ruta(carpeta, "b", f"imagen_{i}_q60.jpg")
+        img.save(recomprimida, quality=60, exif=exif)
+        sin_metadatos = _ruta(carpeta, "b", f"imagen_{i}_sin_exif.jpg")
+        img.save(sin_metadatos, quality=95)
+        grupos.append([original, redimensionada, recomprimida, sin_metadatos])
+    return grupos
+
+# FIN - Imágenes.
+
+# INICIO - Videos.
+def generar_video(ruta, aleatorio, segundos=4, fps=25, ancho=640, alto=360):
+    import cv2
+    escritor = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*"mp4v"), fps, (ancho, alto))
+    fondo = cv2.resize((aleatorio.rand(9, 16, 3) * 255).astype("uint8"), (ancho, alto))
+    for i in range(segundos * fps):
+        escritor.write(np.roll(fondo, i * 4, axis=1))
+    escritor.release()
+
+def recodificar_video(origen, destino, ancho, alto):
+    import cv2
+    captura = cv2.VideoCapture(origen)
+    escritor = cv2.VideoWriter(destino, cv2.VideoWriter_fourcc(*"mp4v"), captura.get(cv2.CAP_PROP_FPS) or 25, (ancho, alto))
+    while True:
+        leido, frame = captura.read()
+        if not leido:
+            break
+        escritor.write(cv2.resize(frame, (ancho, alto), interpolation=cv2.INTER_AREA))
+    escritor.release()
+    captura.release()
+
+def generar_videos(carpeta, cantidad, aleatorio):
+    grupos = []
+    for i in range(cantidad):
+        original = _ruta(carpeta, "a", f"video_{i}.mp4")
+        generar_video(original, aleatorio)
+        if i % 2:
+            continue
+
+        grupo = [original]
+        for ancho, alto in ((480, 270), (320, 180)):
+            copia = _ruta(carpeta, "b", f"video_{i}_{alto}p.mp4")
+            recodificar_video(original, copia, ancho, alto)
+            grupo.append(copia)
+        grupos.append(grupo)
+    return grupos
+
+# FIN - Videos.
+
+# INICIO - Exactos y dispersos.
+def generar_exactos(carpeta, cantidad, aleatorio):
+    """
+    Un tercio de los archivos tiene una copia exacta, otro tercio un archivo del mismo tamaño
+    y distinto final (llega al hash completo) y el resto es único.
+    """
+    grupos = {tipo: [] for tipo in EXTENSIONES_EXACTOS}
+    tipos = list(EXTENSIONES_EXACTOS)
+    for i in range(cantidad):
+        tipo = tipos[(i // 3) % len(tipos)]
+        extension = EXTENSIONES_EXACTOS[tipo]
+        datos = aleatorio.bytes(int(aleatorio.randint(4 * 1024, 512 * 1024)))
+        original = _ruta(carpeta, "a", f"exacto_{i}{extension}")
+        with open(original, "wb") as f:
+            f.write(datos)
+
+        if i % 3 == 0:
+            copia = _ruta(carpeta, "b", f"exacto_{i}_copia{extension}")
+            with open(copia, "wb") as f:
+                f.write(datos)
+            grupos[tipo].append([original, copia])
+        elif i % 3 == 1:
+            with open(_ruta(carpeta, "b", f"exacto_{i}_parecido{extension}"), "wb") as f:
+                f.write(datos[:-1] + bytes([datos[-1] ^ 0xFF]))
+    return grupos
+
+def generar_dispersos(carpeta, cantidad, tamano_mb, aleatorio):
+    """
+    Pares de archivos dispersos idénticos: una cabecera aleatoria y el resto sin escribir.
+    """
+    grupos = []
+    for i in range(cantidad):
+        cabecera = aleatorio.bytes(64 * 1024)
+        grupo = []
+        for subcarpeta in ("a", "b"):
+            ruta = _ruta(carpeta, subcarpeta, f"disperso_{i}.iso")
+            with open(ruta, "wb") as f:
+                f.write(cabecera)
+                f.truncate(tamano_mb * 1024 * 1024)
+            grupo.append(ruta)
+        grupos.append(grupo)
+    return grupos
+
+# FIN - Exactos y dispersos.
+
+def generar_corpus(carpeta, imagenes=40, videos=6, exactos=200, dispersos=2, tamano_dispersos_mb=256, semilla=0):
+    """
+    Genera el corpus en "carpeta" y devuelve el manifiesto: parámetros y {tipo: [grupos de rutas]}.
+    """
+    aleatorio = np.random.RandomState(semilla)
+    grupos = generar_exactos(carpeta, exactos, aleatorio)
+    grupos["Otros"] += generar_dispersos(carpeta, dispersos, tamano_dispersos_mb, aleatorio)
+    grupos["Imagenes"] = generar_imagenes(carpeta, imagenes, aleatorio)
+    grupos["Videos"] = generar_videos(carpeta, videos, aleatorio)
+
+    grupos = {tipo: [[os.path.relpath(ruta, carpeta) for ruta in grupo] for grupo in lista] for tipo, lista in grupos.items()}
+    manifiesto = {
+        "parametros": {"imagenes": imagenes, "videos": videos, "exactos": exactos, "dispersos": dispersos,
+                       "tamano_dispersos_mb": tamano_dispersos_mb, "semilla": semilla},
+        "grupos": grupos,
+    }
+    with open(os.path.join(carpeta, MANIFIESTO), "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, indent=2)
+    return manifiesto
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("carpeta")
+    parser.add_argument("--imagenes", type=int, default=40)
+    parser.add_argument("--videos", type=int, default=6)
+    parser.add_argument("--exactos", type=int, default=200)
+    parser.add_argument("--dispersos", type=int, default=2)
+    parser.add_argument("--tamano-dispersos-mb", type=int, default=256)
+    parser.add_argument("--semilla", type=int, default=0)
+    args = parser.parse_args()
+
+    manifiesto = generar_corpus(args.carpeta, args.imagenes, args.videos, args.exactos, args.dispersos,
+                                args.tamano_dispersos_mb, args.semilla)
+    for tipo, grupos in manifiesto["grupos"].items():
+        print(f"{tipo:<11} {len(grupos):>5} grupos, {sum(len(grupo) - 1 for grupo in grupos):>5} duplicados")
+
+if __name__ == "__main__":
+    main()
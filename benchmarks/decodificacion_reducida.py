@@ -0,0 +1,120 @@
+"""
+Compara la decodificación completa contra la decodificación reducida de imagenes.hashear_imagen.
+Para cada imagen original se crean copias redimensionadas y recomprimidas, y se mide:
+- tiempo por imagen y pico de memoria (RSS) de cada modo,
+- distancia entre los hashes de cada modo para el mismo archivo,
+- cuántos pares (original, copia) detecta cada modo con el umbral dado.
+
+Si no se indica una carpeta, se generan fotos sintéticas de 24 megapíxeles.
+
+Uso: python benchmarks/decodificacion_reducida.py [--carpeta FOTOS] [--cantidad 12] [--umbral 3] [--json salida.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import numpy as np
+import imagehash
+from PIL import Image
+
+VARIANTES = {
+    "mitad": lambda img: img.resize((img.width // 2, img.height // 2), Image.LANCZOS),
+    "cuarto": lambda img: img.resize((img.width // 4, img.height // 4), Image.LANCZOS),
+    "jpeg_q50": lambda img: img,
+    "png": lambda img: img,
+}
+
+def generar_foto(ruta, semilla, ancho=6000, alto=4000):
+    """
+    Crea una imagen con estructura de baja frecuencia y ruido fino, parecida a una foto.
+    """
+    aleatorio = np.random.RandomState(semilla)
+    base = Image.fromarray((aleatorio.rand(12, 18, 3) * 255).astype("uint8")).resize((ancho, alto), Image.BICUBIC)
+    ruido = aleatorio.randint(-12, 12, (alto, ancho, 3))
+    pixeles = np.clip(np.asarray(base, dtype=np.int16) + ruido, 0, 255).astype("uint8")
+    Image.fromarray(pixeles).save(ruta, quality=92)
+
+def preparar_corpus(carpeta_origen, cantidad, destino):
+    originales = []
+    if carpeta_origen:
+        for nombre in sorted(os.listdir(carpeta_origen))[:cantidad]:
+            originales.append(os.path.join(carpeta_origen, nombre))
+    else:
+        for i in range(cantidad):
+            ruta = os.path.join(destino, f"original_{i}.jpg")
+            generar_foto(ruta, i)
+            originales.append(ruta)
+
+    pares = []
+    for i, original in enumerate(originales):
+        with Image.open(original) as img:
+            img = img.convert("RGB")
+            for nombre, transformar in VARIANTES.items():
+                extension = ".png" if nombre == "png" else ".jpg"
+                ruta = os.path.join(destino, f"{i}_{nombre}{extension}")
+                transformar(img).save(ruta, quality=50 if nombre == "jpeg_q50" else 90)
+                pares.append((original, ruta, nombre))
+    return originales, pares
+
+def medir_modo(rutas, reducida):
+    """
+    Se ejecuta en un proceso aparte para que el pico de memoria sea el de este modo.
+    """
+    import imagenes
+    hashes = {}
+    inicio = time.perf_counter()
+    for ruta in rutas:
+        hashes[ruta], _ = imagenes.hashear_imagen(ruta, reducida)
+    duracion = time.perf_counter() - inicio
+    return hashes, duracion / len(rutas), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def distancias(h1, h2):
+    return [int(imagehash.hex_to_hash(a) - imagehash.hex_to_hash(b)) for a, b in zip(h1, h2)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--carpeta", help="Carpeta con fotos reales para usar como originales.")
+    parser.add_argument("--cantidad", type=int, default=12)
+    parser.add_argument("--umbral", type=int, default=3)
+    parser.add_argument("--json", help="Guarda los resultados en este archivo.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporal:
+        originales, pares = preparar_corpus(args.carpeta, args.cantidad, temporal)
+        rutas = originales + [copia for _, copia, _ in pares]
+
+        modos = {}
+        for reducida in (False, True):
+            with ProcessPoolExecutor(1) as pool:
+                modos[reducida] = pool.submit(medir_modo, rutas, reducida).result()
+
+    completo, reducido = modos[False][0], modos[True][0]
+    resultado = {
+        "imagenes": len(rutas),
+        "umbral": args.umbral,
+        "ms_por_imagen": {"completa": round(modos[False][1] * 1000, 1), "reducida": round(modos[True][1] * 1000, 1)},
+        "pico_rss_kb": {"completa": modos[False][2], "reducida": modos[True][2]},
+        "distancia_max_mismo_archivo": max(max(distancias(completo[r], reducido[r])) for r in rutas),
+        "pares_detectados": {},
+    }
+    for nombre in VARIANTES:
+        seleccion = [(o, c) for o, c, v in pares if v == nombre]
+        resultado["pares_detectados"][nombre] = {
+            modo: sum(max(distancias(hashes[o], hashes[c])) <= args.umbral for o, c in seleccion)
+            for modo, hashes in (("completa", completo), ("reducida", reducido))
+        } | {"total": len(seleccion)}
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark de escalado del agrupamiento de hashes perceptuales.
+Genera N tuplas sintéticas de cuatro hashes de 64 bits (con un porcentaje de casi-duplicados)
+y compara la búsqueda lineal original contra el índice de Hamming y el agrupamiento vectorizado
+(éste une los grupos de forma transitiva, así que puede dar menos grupos).
+
+Uso: python benchmarks/indice_hamming.py [--tamanos 10000 100000 1000000] [--umbral 3] [--lineal-max 10000]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from indice import agrupar_por_umbral, agrupar_vectorizado, dentro_del_umbral
+
+def generar_hashes(cantidad, umbral, proporcion_duplicados=0.2, semilla=0):
+    """
+    Devuelve una lista de (id, enteros). Los casi-duplicados se crean invirtiendo hasta "umbral" bits.
+    """
+    aleatorio = random.Random(semilla)
+    elementos = []
+    for i in range(cantidad):
+        if elementos and aleatorio.random() < proporcion_duplicados:
+            _, base = aleatorio.choice(elementos)
+            enteros = []
+            for h in base:
+                for bit in aleatorio.sample(range(64), aleatorio.randint(0, umbral)):
+                    h ^= 1 << bit
+                enteros.append(h)
+            elementos.append((i, tuple(enteros)))
+        else:
+            elementos.append((i, tuple(aleatorio.getrandbits(64) for _ in range(4))))
+    return elementos
+
+def agrupar_lineal(elementos, umbral): # Réplica de la búsqueda original: cada elemento contra todos los grupos.
+    grupos = []
+    for dato, enteros in elementos:
+        for representante, miembros in grupos:
+            if dentro_del_umbral(enteros, representante, umbral):
+                miembros.append(dato)
+                break
+        else:
+            grupos.append((enteros, [dato]))
+    return grupos
+
+def medir(funcion, elementos, umbral):
+    inicio = time.perf_counter()
+    grupos = funcion(elementos, umbral)
+    return time.perf_counter() - inicio, grupos
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--umbral", type=int, default=3)
+    parser.add_argument("--lineal-max", type=int, default=10_000, help="Tamaño máximo para medir la búsqueda lineal.")
+    parser.add_argument("--json", help="Guarda los resultados en este archivo.")
+    args = parser.parse_args()
+
+    resultados = []
+    for tamano in args.tamanos:
+        elementos = generar_hashes(tamano, args.umbral)
+        tiempo_indice, grupos_indice = medir(agrupar_por_umbral, elementos, args.umbral)
+        tiempo_vectorizado, grupos_vectorizado = medir(agrupar_vectorizado, elementos, args.umbral)
+        resultado = {"tamano": tamano, "umbral": args.umbral, "indice_s": round(tiempo_indice, 3),
+                     "grupos": len(grupos_indice), "vectorizado_s": round(tiempo_vectorizado, 3),
+                     "grupos_vectorizado": len(grupos_vectorizado), "lineal_s": None, "identicos": None}
+
+        if tamano <= args.lineal_max:
+            tiempo_lineal, grupos_lineal = medir(agrupar_lineal, elementos, args.umbral)
+            resultado["lineal_s"] = round(tiempo_lineal, 3)
+            resultado["identicos"] = grupos_lineal == grupos_indice
+
+        resultados.append(resultado)
+        print(f"{tamano:>9} hashes | índice {resultado['indice_s']:>8.3f} s | "
+              f"vectorizado {resultado['vectorizado_s']:>8.3f} s ({resultado['grupos_vectorizado']} grupos) | "
+              f"lineal {resultado['lineal_s'] if resultado['lineal_s'] is not None else '-':>8} s | "
+              f"grupos {resultado['grupos']} | idénticos {resultado['identicos']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+if __name__ == "__main__":
+    main()
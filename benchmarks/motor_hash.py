@@ -0,0 +1,81 @@
+"""
+Rendimiento (MB/s) del motor de hash por algoritmo y tamaño de buffer, contra el bucle anterior
+de bloques de 4096 bytes con iter(lambda: f.read(4096), b"").
+Cada combinación se mide varias veces sobre el mismo archivo y se informa la mejor, así la lectura
+sale de la caché de páginas y se compara el costo de CPU; con --frio se pide al sistema que descarte
+el archivo de la caché antes de cada medición (posix_fadvise), para medir también el disco.
+
+Uso: python benchmarks/motor_hash.py [--archivo RUTA] [--tamano-mb 512] [--repeticiones 3] [--frio] [--json salida.json]
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from motor_hash import ALGORITMOS, hashear_archivo
+
+BUFFERS = [64 * 1024, 1024 * 1024, 8 * 1024 * 1024]
+
+def hash_antes(ruta): # Réplica del bucle anterior de los módulos exactos.
+    hash_sha256 = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(4096), b""):
+            hash_sha256.update(bloque)
+    return hash_sha256.hexdigest()
+
+def descartar_cache(ruta):
+    if hasattr(os, "posix_fadvise"):
+        with open(ruta, "rb") as f:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+
+def medir(funcion, ruta, repeticiones, frio):
+    mejor = None
+    for _ in range(repeticiones):
+        if frio:
+            descartar_cache(ruta)
+        inicio = time.perf_counter()
+        funcion()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return os.path.getsize(ruta) / (1024 * 1024) / mejor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--archivo", help="Archivo a hashear; si no se indica se crea uno aleatorio.")
+    parser.add_argument("--tamano-mb", type=int, default=512, help="Tamaño del archivo aleatorio.")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--frio", action="store_true", help="Descarta el archivo de la caché de páginas antes de cada medición.")
+    parser.add_argument("--json", help="Guarda los resultados en este archivo.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporal:
+        ruta = args.archivo
+        if not ruta:
+            ruta = os.path.join(temporal, "aleatorio.bin")
+            with open(ruta, "wb") as f:
+                for _ in range(args.tamano_mb):
+                    f.write(os.urandom(1024 * 1024))
+
+        resultados = [{"algoritmo": "sha256", "lectura": "read(4096)",
+                       "mb_s": round(medir(lambda: hash_antes(ruta), ruta, args.repeticiones, args.frio), 1)}]
+        for algoritmo in ALGORITMOS:
+            for buffer in BUFFERS:
+                mb_s = medir(lambda: hashear_archivo(ruta, algoritmo, buffer, umbral_mmap=None), ruta, args.repeticiones, args.frio)
+                resultados.append({"algoritmo": algoritmo, "lectura": f"readinto({buffer // 1024} KB)", "mb_s": round(mb_s, 1)})
+            mb_s = medir(lambda: hashear_archivo(ruta, algoritmo, umbral_mmap=0), ruta, args.repeticiones, args.frio)
+            resultados.append({"algoritmo": algoritmo, "lectura": "mmap", "mb_s": round(mb_s, 1)})
+
+    for resultado in resultados:
+        print(f"{resultado['algoritmo']:<8} {resultado['lectura']:<18} {resultado['mb_s']:>9.1f} MB/s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+if __name__ == "__main__":
+    main()
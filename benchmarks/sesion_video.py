@@ -0,0 +1,108 @@
+"""
+Tiempo por video de calcular_hash_video + seleccionar_mejor_calidad antes y después de SesionVideo
+y de la huella perceptual de tamaño fijo.
+"Antes" reproduce el flujo anterior: hasta cinco aperturas de cv2.VideoCapture por archivo
+y un set(CAP_PROP_POS_FRAMES) antes de cada frame leído.
+
+Si no se indica una carpeta, se generan videos sintéticos con OpenCV.
+
+Uso: python benchmarks/sesion_video.py [--carpeta VIDEOS] [--duraciones 20 90 400] [--json salida.json]
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import cv2
+import numpy as np
+
+def generar_video(ruta, segundos, fps=25, ancho=640, alto=360):
+    escritor = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*"mp4v"), fps, (ancho, alto))
+    aleatorio = np.random.RandomState(segundos)
+    fondo = cv2.resize((aleatorio.rand(9, 16, 3) * 255).astype("uint8"), (ancho, alto))
+    for i in range(segundos * fps):
+        frame = np.roll(fondo, i * 3, axis=1)
+        cv2.putText(frame, str(i), (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        escritor.write(frame)
+    escritor.release()
+
+def hash_frame(gray): # Hash por frame del flujo anterior.
+    return int.from_bytes(hashlib.blake2b(gray.tobytes(), digest_size=8).digest(), "little", signed=True)
+
+def hash_antes(ruta_video):
+    """
+    Réplica del flujo anterior a SesionVideo, sin caché ni movimientos de archivos.
+    """
+    for backend in [cv2.CAP_FFMPEG, cv2.CAP_GSTREAMER, cv2.CAP_DSHOW]:  # configurar_backend
+        cap = cv2.VideoCapture(ruta_video, backend)
+        if cap.isOpened():
+            cap.release()
+            break
+
+    cap = cv2.VideoCapture(ruta_video)  # definir_frame_interval
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30
+    duracion = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    cap.release()
+    intervalo = 10 if duracion < 60 else 30 if duracion < 300 else 60
+
+    cap = cv2.VideoCapture(ruta_video, backend)  # calcular_hash_video
+    frames_hash = []
+    for i in range(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), intervalo):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, i)
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames_hash.append(hash_frame(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)))
+    cap.release()
+
+    cap = cv2.VideoCapture(ruta_video)  # seleccionar_mejor_calidad
+    calidad = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) * int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    return sum(frames_hash) // len(frames_hash), calidad
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--carpeta", help="Carpeta con videos reales.")
+    parser.add_argument("--duraciones", type=int, nargs="+", default=[20, 90, 400], help="Segundos de cada video sintético.")
+    parser.add_argument("--json", help="Guarda los resultados en este archivo.")
+    args = parser.parse_args()
+
+    import cache
+    import videos
+    cache.USAR_CACHE = False  # Se mide el cálculo, no la caché.
+
+    with tempfile.TemporaryDirectory() as temporal:
+        if args.carpeta:
+            rutas = [os.path.join(args.carpeta, n) for n in sorted(os.listdir(args.carpeta))]
+        else:
+            rutas = []
+            for segundos in args.duraciones:
+                ruta = os.path.join(temporal, f"sintetico_{segundos}s.mp4")
+                generar_video(ruta, segundos)
+                rutas.append(ruta)
+
+        resultados = []
+        for ruta in rutas:
+            inicio = time.perf_counter()
+            hash_antes(ruta)
+            antes = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            videos.calcular_hash_video(ruta)
+            videos.seleccionar_mejor_calidad([ruta])
+            despues = time.perf_counter() - inicio
+
+            resultados.append({"video": os.path.basename(ruta), "antes_s": round(antes, 3), "despues_s": round(despues, 3)})
+            print(f"{resultados[-1]['video']:<30} antes {antes:8.3f} s | después {despues:8.3f} s | x{antes / despues:5.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+if __name__ == "__main__":
+    main()
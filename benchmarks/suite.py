@@ -0,0 +1,287 @@
+"""
+Suite de rendimiento de punta a punta sobre un corpus sintético (ver corpus.py), para comparar commits.
+Mide por separado cada etapa de cada tipo: recorrido, hash, agrupado, selección de la mejor copia y
+movimiento, con archivos/s, MB/s y el pico de memoria residente (RSS) al terminar la etapa.
+En los tipos exactos el agrupado ocurre dentro del prefiltro y queda incluido en "hash".
+También compara los archivos movidos con los duplicados esperados del manifiesto.
+
+La caché de hashes se desactiva (salvo con --con-cache) y todo se ejecuta en una carpeta temporal:
+un corpus indicado con --corpus se copia antes, así nunca se mueve nada del original.
+
+Uso: python benchmarks/suite.py [--corpus CARPETA] [--imagenes 40] [--videos 6] [--exactos 200]
+                                [--tipos Audio,Imagenes] [--json salida.json] [--comparar anterior.json]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from contextlib import contextmanager, redirect_stdout
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(RAIZ, "src"))
+
+from corpus import MANIFIESTO, generar_corpus
+
+try:
+    import resource
+except ImportError: # Windows: sin pico de memoria.
+    resource = None
+
+TIPOS = ("Audio", "Documentos", "Otros", "Imagenes", "Videos")
+
+def rss_maximo_mb():
+    """
+    Pico de memoria residente de este proceso y de sus hijos ya terminados (pools de procesos).
+    """
+    if resource is None:
+        return None
+    escala = 1024 * 1024 if sys.platform == "darwin" else 1024 # ru_maxrss está en bytes en macOS y en KB en Linux.
+    pico = max(resource.getrusage(quien).ru_maxrss for quien in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+    return round(pico / escala, 1)
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "-C", RAIZ, "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def tamano_total(rutas):
+    return sum(os.path.getsize(ruta) for ruta in rutas if os.path.exists(ruta))
+
+class Mediciones:
+    def __init__(self):
+        self.etapas = []
+
+    @contextmanager
+    def etapa(self, tipo, nombre, archivos, bytes_=0):
+        """
+        Mide el bloque. "archivos" y "bytes_" son lo que procesa la etapa; se pueden corregir
+        dentro del bloque modificando el diccionario devuelto.
+        """
+        datos = {"tipo": tipo, "etapa": nombre, "archivos": archivos, "bytes": bytes_}
+        inicio = time.perf_counter()
+        yield datos
+        duracion = time.perf_counter() - inicio
+        datos.update({
+            "duracion_s": round(duracion, 4),
+            "archivos_s": round(datos["archivos"] / duracion, 1) if duracion else None,
+            "mb_s": round(datos["bytes"] / (1024 * 1024) / duracion, 1) if duracion and datos["bytes"] else None,
+            "rss_max_mb": rss_maximo_mb(),
+        })
+        self.etapas.append(datos)
+
+# INICIO - Etapas por tipo.
+def medir_exactos(mediciones, tipo, archivos, destino, hilos):
+    import audio, documentos, otros
+    from exactos import buscar_duplicados_exactos
+    from mover import MotorMovimiento
+    calcular_hash = {"Audio": audio.calcular_hash_audio, "Documentos": documentos.calcular_hash_documento,
+                     "Otros": otros.calcular_hash_otro}[tipo]
+
+    with mediciones.etapa(tipo, "hash", len(archivos)) as datos:
+        duplicados, reporte = buscar_duplicados_exactos(archivos, calcular_hash, hilos=hilos)
+        datos["bytes"] = sum(nivel["bytes_leidos"] for nivel in reporte.values()) # Bytes leídos de verdad.
+
+    with mediciones.etapa(tipo, "seleccion", sum(len(grupo) for grupo in duplicados.values())):
+        a_mover = [(ruta, hash_) for (hash_, _), grupo in duplicados.items() for ruta in grupo[1:]]
+
+    with mediciones.etapa(tipo, "movimiento", len(a_mover), tamano_total(ruta for ruta, _ in a_mover)):
+        with MotorMovimiento(destino) as motor:
+            for ruta, hash_ in a_mover:
+                motor.mover(ruta, hash_)
+    return [ruta for ruta, _ in a_mover]
+
+def medir_imagenes(mediciones, archivos, destino, trabajadores, reducida, umbral=3, verificar=False):
+    import imagenes
+    from indice import agrupar_vectorizado
+    from mover import MotorMovimiento
+
+    with mediciones.etapa("Imagenes", "hash", len(archivos), tamano_total(archivos)):
+        registros = [registro for registro in imagenes.iterar_hashes(archivos, trabajadores, reducida, verificar) if registro]
+
+    with mediciones.etapa("Imagenes", "agrupado", len(registros)):
+        grupos = [miembros for _, miembros in agrupar_vectorizado(
+            ((registro, imagenes.empaquetar_hashes(registro.hashes)) for registro in registros), umbral
+        ) if len(miembros) > 1]
+
+    if verificar:
+        with mediciones.etapa("Imagenes", "verificacion", sum(len(grupo) for grupo in grupos)):
+            grupos = list(imagenes.verificar_grupos(dict(enumerate(grupos)), reducida).values())
+
+    with mediciones.etapa("Imagenes", "seleccion", sum(len(grupo) for grupo in grupos)):
+        a_mover = []
+        for grupo in grupos:
+            mejor = imagenes.seleccionar_mejor_calidad(grupo)
+            a_mover += [registro.ruta for registro in grupo if registro is not mejor]
+
+    with mediciones.etapa("Imagenes", "movimiento", len(a_mover), tamano_total(a_mover)):
+        with MotorMovimiento(destino) as motor:
+            for ruta in a_mover:
+                motor.mover(ruta)
+    return a_mover
+
+def medir_videos(mediciones, archivos, destino, trabajadores):
+    import videos
+    from indice import agrupar_por_muestras
+    from mover import MotorMovimiento
+
+    with mediciones.etapa("Videos", "hash", len(archivos), tamano_total(archivos)):
+        huellas, calidades = [], {}
+        for ruta, huella, calidad in videos.iterar_huellas(archivos, trabajadores):
+            if huella is not None:
+                huellas.append((ruta, (huella,)))
+                calidades[ruta] = calidad
+
+    with mediciones.etapa("Videos", "agrupado", len(huellas)):
+        grupos = [rutas for _, rutas in agrupar_por_muestras(
+            huellas, videos.UMBRAL_VIDEO * videos.MUESTRAS_VIDEO, videos.MUESTRAS_VIDEO, videos.BITS_MUESTRA, posicion=0
+        ) if len(rutas) > 1]
+
+    with mediciones.etapa("Videos", "seleccion", sum(len(grupo) for grupo in grupos)):
+        a_mover = []
+        for grupo in grupos:
+            mejor = videos.seleccionar_mejor_calidad(grupo, calidades)
+            a_mover += [ruta for ruta in grupo if ruta != mejor]
+
+    with mediciones.etapa("Videos", "movimiento", len(a_mover), tamano_total(a_mover)):
+        with MotorMovimiento(destino) as motor:
+            for ruta in a_mover:
+                motor.mover(ruta)
+    return a_mover
+
+# FIN - Etapas por tipo.
+
+def evaluar(manifiesto, carpeta, movidos):
+    """
+    Compara los movidos de cada tipo con los grupos esperados: "correctos" son los que pertenecen
+    a un grupo de duplicados y "falsos_positivos" los que no.
+    """
+    resultado = {}
+    for tipo, rutas in movidos.items():
+        esperados = {os.path.join(carpeta, ruta) for grupo in manifiesto["grupos"].get(tipo, []) for ruta in grupo}
+        correctos = sum(1 for ruta in rutas if ruta in esperados)
+        resultado[tipo] = {
+            "duplicados_esperados": sum(len(grupo) - 1 for grupo in manifiesto["grupos"].get(tipo, [])),
+            "movidos": len(rutas), "correctos": correctos, "falsos_positivos": len(rutas) - correctos,
+        }
+    return resultado
+
+def ejecutar_suite(args, temporal):
+    carpeta = os.path.join(temporal, "corpus")
+    if args.corpus:
+        shutil.copytree(args.corpus, carpeta)
+        with open(os.path.join(carpeta, MANIFIESTO), "r", encoding="utf-8") as f:
+            manifiesto = json.load(f)
+    else:
+        manifiesto = generar_corpus(carpeta, args.imagenes, args.videos, args.exactos, args.dispersos,
+                                    args.tamano_dispersos_mb, args.semilla)
+
+    os.chdir(temporal) # Registros y caché de esta ejecución quedan en la carpeta temporal.
+    import cache
+    from escaner import escanear
+    from config import EXTENSIONES_POR_TIPO
+    cache.USAR_CACHE = args.con_cache
+    cache.CACHE_DB = os.path.join(temporal, "cache_hashes.sqlite") # Por defecto está junto a los scripts.
+
+    mediciones = Mediciones()
+    tipos = {tipo: EXTENSIONES_POR_TIPO[tipo] for tipo in args.tipos}
+    with mediciones.etapa("Todos", "recorrido", 0) as datos:
+        archivos = escanear([carpeta], tipos)
+        datos["archivos"] = sum(len(rutas) for rutas in archivos.values())
+
+    movidos = {}
+    for tipo in args.tipos:
+        destino = os.path.join(temporal, "duplicados", tipo)
+        if tipo == "Imagenes":
+            movidos[tipo] = medir_imagenes(mediciones, archivos[tipo], destino, args.trabajadores, args.reducida,
+                                           args.umbral_imagenes, args.verificar_imagenes)
+        elif tipo == "Videos":
+            movidos[tipo] = medir_videos(mediciones, archivos[tipo], destino, args.trabajadores)
+        else:
+            movidos[tipo] = medir_exactos(mediciones, tipo, archivos[tipo], destino, args.hilos)
+    cache.cerrar()
+
+    return {
+        "etiqueta": args.etiqueta or commit_actual(),
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parametros": {"trabajadores": args.trabajadores, "hilos": args.hilos, "reducida": args.reducida,
+                       "umbral_imagenes": args.umbral_imagenes, "verificar_imagenes": args.verificar_imagenes,
+                       "con_cache": args.con_cache, "tipos": args.tipos, "corpus": manifiesto["parametros"]},
+        "etapas": mediciones.etapas,
+        "precision": evaluar(manifiesto, carpeta, movidos),
+    }
+
+# INICIO - Salida.
+def imprimir_resultados(resultados, anterior=None):
+    previas = {(etapa["tipo"], etapa["etapa"]): etapa for etapa in anterior["etapas"]} if anterior else {}
+    print(f"{'Tipo':<11} {'Etapa':<11} {'Archivos':>8} {'s':>9} {'arch/s':>10} {'MB/s':>9} {'RSS MB':>8}"
+          + (f" {'vs ' + str(anterior.get('etiqueta')):>14}" if anterior else ""))
+    for etapa in resultados["etapas"]:
+        linea = (f"{etapa['tipo']:<11} {etapa['etapa']:<11} {etapa['archivos']:>8} {etapa['duracion_s']:>9.3f} "
+                 f"{etapa['archivos_s'] or 0:>10.1f} {etapa['mb_s'] or 0:>9.1f} {etapa['rss_max_mb'] or 0:>8.1f}")
+        previa = previas.get((etapa["tipo"], etapa["etapa"]))
+        if previa and etapa["duracion_s"]:
+            linea += f" {previa['duracion_s'] / etapa['duracion_s']:>13.2f}x" # Más de 1 = más rápido que antes.
+        print(linea)
+
+    for tipo, datos in resultados["precision"].items():
+        print(f"{tipo}: {datos['movidos']} movidos de {datos['duplicados_esperados']} esperados, "
+              f"{datos['falsos_positivos']} falsos positivos")
+
+# FIN - Salida.
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Corpus ya generado con corpus.py (se copia, no se modifica).")
+    parser.add_argument("--imagenes", type=int, default=40)
+    parser.add_argument("--videos", type=int, default=6)
+    parser.add_argument("--exactos", type=int, default=200)
+    parser.add_argument("--dispersos", type=int, default=2)
+    parser.add_argument("--tamano-dispersos-mb", type=int, default=256)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--tipos", type=lambda valor: [tipo.strip() for tipo in valor.split(",")], default=list(TIPOS),
+                        help=f"Tipos a medir separados por \",\" ({', '.join(TIPOS)}).")
+    parser.add_argument("--trabajadores", type=int, default=1, help="Procesos para imágenes y videos.")
+    parser.add_argument("--hilos", type=int, default=1, help="Lecturas simultáneas en los tipos exactos.")
+    parser.add_argument("--reducida", action="store_true", help="Decodificar las imágenes a escala reducida.")
+    parser.add_argument("--umbral-imagenes", type=int, default=3, help="Distancia de Hamming máxima por hash de imagen.")
+    parser.add_argument("--verificar-imagenes", action="store_true", help="Confirmar los grupos de imágenes con las miniaturas.")
+    parser.add_argument("--con-cache", action="store_true", help="Usar la caché de hashes (vacía al empezar).")
+    parser.add_argument("--etiqueta", help="Nombre de esta medición; por defecto el commit actual.")
+    parser.add_argument("--json", help="Guarda los resultados en este archivo.")
+    parser.add_argument("--comparar", help="Resultados JSON de otra ejecución para mostrar la mejora por etapa.")
+    args = parser.parse_args()
+
+    desconocidos = [tipo for tipo in args.tipos if tipo not in TIPOS]
+    if desconocidos:
+        parser.error(f"tipos desconocidos: {', '.join(desconocidos)}")
+    salida = os.path.abspath(args.json) if args.json else None
+    anterior = None
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+
+    directorio = os.getcwd()
+    with tempfile.TemporaryDirectory() as temporal:
+        try:
+            with redirect_stdout(sys.stderr): # Los mensajes de los módulos no se mezclan con la tabla.
+                resultados = ejecutar_suite(args, temporal)
+        finally:
+            os.chdir(directorio)
+
+    imprimir_resultados(resultados, anterior)
+    if salida:
+        with open(salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,28 @@
-import os
-import shutil
-import hashlib
 from tqdm import tqdm
 from colorama import Fore, Style, init
-from config import registrar_error, registrar_operacion, mover_a_problematicos, EXTENSIONES_AUDIO
+from motor_hash import calcular_hash_contenido
+from contenedores import ubicar_carga
+from exactos import buscar_duplicados_exactos, imprimir_reporte_niveles, ubicar_con_cache
+from escaner import escanear
+from mover import MotorMovimiento
+from config import registrar_error, HILOS_HASH_EXACTO, EXTENSIONES_AUDIO, IGNORAR_ETIQUETAS_AUDIO
 
 init(autoreset=True)
 
 # INICIO - Hash.
-def calcular_hash_audio(ruta_audio): # Calcula un hash SHA-256 del contenido del archivo.
+def calcular_hash_audio(ruta_audio): # Calcula el hash del contenido del archivo con el algoritmo configurado.
     try:
-        hash_sha256 = hashlib.sha256()
-        with open(ruta_audio, "rb") as f:
+        return calcular_hash_contenido(ruta_audio)
+    
+    except Exception as e:
+        registrar_error(ruta_audio, f"Error al calcular hash: {e}")
+        return None
 
-            for bloque in iter(lambda: f.read(4096), b""):
-                hash_sha256.update(bloque)
+def calcular_hash_carga_audio(ruta_audio): # Como calcular_hash_audio, pero sólo del audio: sin etiquetas ni carátula.
+    try:
+        carga = ubicar_con_cache(ruta_audio, ubicar_carga)
+        return calcular_hash_contenido(ruta_audio, carga=carga)
 
-        return hash_sha256.hexdigest()
-    
     except Exception as e:
         registrar_error(ruta_audio, f"Error al calcular hash: {e}")
         return None
@@ -25,56 +30,32 @@ def calcular_hash_audio(ruta_audio): # Calcula un hash SHA-256 del contenido del
 # FIN - Hash.
 
 # INICIO - Ejecución.
-def obtener_archivos_audio(carpeta_origen): # Busca archivos válidos en la carpeta origen y subcarpetas.
-    archivos = []
-
-    for root, _, files in os.walk(carpeta_origen):
-        for file in files:
-            if file.lower().endswith(tuple(EXTENSIONES_AUDIO)):
-                archivos.append(os.path.join(root, file))
-
-    return archivos
-
-def buscar_duplicados_audio(carpeta_origen): # Busca duplicados en la carpeta origen.
-    archivos = obtener_archivos_audio(carpeta_origen)
+def obtener_archivos_audio(carpeta_origen): # Busca archivos válidos en la/s carpeta/s origen y subcarpetas.
+    return escanear(carpeta_origen, {"Audio": EXTENSIONES_AUDIO})["Audio"]
+
+def buscar_duplicados_audio(carpeta_origen, archivos=None, hilos=HILOS_HASH_EXACTO, ignorar_etiquetas=IGNORAR_ETIQUETAS_AUDIO):
+    """
+    Busca duplicados en la carpeta origen, o en los archivos ya escaneados.
+    Con "ignorar_etiquetas" se compara sólo el audio de cada archivo (ver contenedores.py).
+    """
+    if archivos is None:
+        archivos = obtener_archivos_audio(carpeta_origen)
     print(f"Archivos de audio encontrados: {len(archivos)}")
-    hashes = {}
-    
-    for ruta in tqdm(archivos, desc="Calculando hashes"):
-        hash_audio = calcular_hash_audio(ruta)
-        if hash_audio:
-            clave = (hash_audio, os.path.splitext(ruta)[1])
-            if clave not in hashes:
-                hashes[clave] = []
-            hashes[clave].append(ruta)
-    
-    duplicados = {clave: rutas for clave, rutas in hashes.items() if len(rutas) > 1}
+    if ignorar_etiquetas:
+        duplicados, reporte = buscar_duplicados_exactos(archivos, calcular_hash_carga_audio, hilos=hilos, ubicar=ubicar_carga)
+    else:
+        duplicados, reporte = buscar_duplicados_exactos(archivos, calcular_hash_audio, hilos=hilos)
+    imprimir_reporte_niveles(reporte)
     return duplicados
 
 def mover_duplicados_audio(duplicados, carpeta_destino): # Mueve los archivos duplicados a la carpeta destino.
-    os.makedirs(carpeta_destino, exist_ok=True)
-
-    for _, grupo in tqdm(duplicados.items(), desc="Moviendo duplicados"):
-        original = grupo[0]
-        grupo.remove(original)
-        
-        for ruta in grupo:
-
-            try:
-                destino = os.path.join(carpeta_destino, os.path.basename(ruta))
-                contador = 1
-                while os.path.exists(destino):
-                    destino = os.path.join(
-                        carpeta_destino,
-                        f"{os.path.splitext(os.path.basename(ruta))[0]}_{contador}{os.path.splitext(ruta)[1]}"
-                    )
-                    contador += 1
-                shutil.move(ruta, destino)
-                registrar_operacion(ruta, destino)
+    with MotorMovimiento(carpeta_destino) as motor:
+        for (hash_, _), grupo in tqdm(duplicados.items(), desc="Moviendo duplicados"):
+            original = grupo[0]
+            grupo.remove(original)
 
-            except Exception as e:
-                registrar_error(Fore.LIGHTRED_EX + ruta, f"Error al mover archivo: {e}" + Style.RESET_ALL)
-                mover_a_problematicos(ruta, carpeta_destino)
+            for ruta in grupo:
+                motor.mover(ruta, hash_)
     
     print(Fore.LIGHTGREEN_EX + "Archivos movidos exitosamente." + Style.RESET_ALL)
 
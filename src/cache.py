@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from colorama import Fore, Style, init
+from config import registrar_error, CACHE_DB, CACHE_TAMANO_MAXIMO, USAR_CACHE
+
+init(autoreset=True)
+
+"""
+Caché persistente de hashes compartida por todos los módulos.
+Cada entrada se guarda por (ruta, tipo) junto con la firma del archivo (dispositivo, inodo, tamaño y mtime_ns).
+Si la firma no coincide al consultar, la entrada se considera inválida y se vuelve a calcular.
+"""
+
+ESCRITURAS_POR_COMMIT = 500 # Cantidad de escrituras acumuladas antes de confirmar la transacción.
+
+_conexion = None
+_bloqueo = threading.Lock()
+_pendientes = 0
+_usados = []
+
+# INICIO - Conexión.
+def _conectar():
+    """
+    Abre la conexión la primera vez. Se prepara completa (tabla e índice creados y confirmados) antes de publicarla
+    en "_conexion", bajo el bloqueo: los hilos que llegan a la vez esperan y usan la misma.
+    """
+    global _conexion
+    if _conexion is not None:
+        return _conexion
+    with _bloqueo:
+        if _conexion is None:
+            conexion = sqlite3.connect(CACHE_DB, check_same_thread=False)
+            conexion.execute("PRAGMA auto_vacuum = INCREMENTAL")  # Sólo tiene efecto al crear la base.
+            conexion.execute("PRAGMA journal_mode = WAL")
+            conexion.execute("PRAGMA synchronous = NORMAL")
+            conexion.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    ruta TEXT NOT NULL,
+                    tipo TEXT NOT NULL,
+                    firma TEXT NOT NULL,
+                    tamano INTEGER NOT NULL,
+                    valor TEXT NOT NULL,
+                    ultimo_uso REAL NOT NULL,
+                    PRIMARY KEY (ruta, tipo)
+                )
+            """)
+            conexion.execute("CREATE INDEX IF NOT EXISTS idx_cache_uso ON cache (ultimo_uso)")
+            conexion.commit()
+            _conexion = conexion
+            atexit.register(cerrar)
+    return _conexion
+
+def firma_archivo(stat): # Identifica una versión concreta de un archivo sin leer su contenido.
+    return f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+def confirmar():
+    """
+    Guarda en disco las escrituras pendientes y la fecha de uso de las entradas consultadas.
+    """
+    global _pendientes
+    if _conexion is None:
+        return
+    with _bloqueo:
+        if _usados:
+            _conexion.executemany("UPDATE cache SET ultimo_uso = ? WHERE ruta = ? AND tipo = ?", _usados)
+            _usados.clear()
+        _conexion.commit()
+        _pendientes = 0
+
+def cerrar():
+    """
+    Confirma los cambios, aplica el límite de tamaño y cierra la conexión.
+    """
+    global _conexion
+    if _conexion is None:
+        return
+    confirmar()
+    desalojar()
+    _conexion.close()
+    _conexion = None
+
+# FIN - Conexión.
+
+# INICIO - Consulta y guardado.
+def obtener(ruta, tipo, stat=None):
+    """
+    Devuelve el valor guardado para el archivo, o None si no existe o el archivo cambió.
+    """
+    if not USAR_CACHE:
+        return None
+    try:
+        stat = stat or os.stat(ruta)
+        conexion = _conectar()
+        with _bloqueo:
+            fila = conexion.execute(
+                "SELECT firma, valor FROM cache WHERE ruta = ? AND tipo = ?", (ruta, tipo)
+            ).fetchone()
+            if fila is None or fila[0] != firma_archivo(stat):
+                return None
+            _usados.append((time.time(), ruta, tipo))
+        return json.loads(fila[1])
+    except (OSError, sqlite3.Error, ValueError) as e:
+        registrar_error(ruta, f"Error al consultar la caché: {e}", consola=False)
+        return None
+
+def guardar(ruta, tipo, valor, stat=None):
+    """
+    Guarda el valor calculado para el archivo junto con su firma actual.
+    """
+    global _pendientes
+    if not USAR_CACHE:
+        return
+    try:
+        stat = stat or os.stat(ruta)
+        conexion = _conectar()
+        with _bloqueo:
+            conexion.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?)",
+                (ruta, tipo, firma_archivo(stat), stat.st_size, json.dumps(valor), time.time())
+            )
+            _pendientes += 1
+            confirmar_ahora = _pendientes >= ESCRITURAS_POR_COMMIT
+        if confirmar_ahora:
+            confirmar()
+    except (OSError, sqlite3.Error, TypeError) as e:
+        registrar_error(ruta, f"Error al guardar en la caché: {e}", consola=False)
+
+# FIN - Consulta y guardado.
+
+# INICIO - Mantenimiento.
+def tamano_cache(): # Tamaño ocupado por la base en bytes.
+    conexion = _conectar()
+    paginas = conexion.execute("PRAGMA page_count").fetchone()[0]
+    libres = conexion.execute("PRAGMA freelist_count").fetchone()[0]
+    return (paginas - libres) * conexion.execute("PRAGMA page_size").fetchone()[0]
+
+def desalojar(tamano_maximo=CACHE_TAMANO_MAXIMO):
+    """
+    Elimina las entradas usadas hace más tiempo hasta que la caché quede por debajo del tamaño máximo.
+    """
+    conexion = _conectar()
+    tamano = tamano_cache()
+    if tamano <= tamano_maximo:
+        return 0
+
+    total = conexion.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+    sobrante = int(total * (1 - tamano_maximo / tamano) * 1.1) + 1  # Margen para no desalojar en cada ejecución.
+    with _bloqueo:
+        conexion.execute(
+            "DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache ORDER BY ultimo_uso LIMIT ?)", (sobrante,)
+        )
+        conexion.commit()
+        conexion.execute("PRAGMA incremental_vacuum")
+    return sobrante
+
+def podar_cache():
+    """
+    Elimina las entradas de archivos borrados o modificados desde que se guardaron.
+    """
+    conexion = _conectar()
+    confirmar()
+    eliminar = []
+    for ruta, tipo, firma in conexion.execute("SELECT ruta, tipo, firma FROM cache").fetchall():
+        try:
+            if firma_archivo(os.stat(ruta)) == firma:
+                continue
+        except OSError:
+            pass
+        eliminar.append((ruta, tipo))
+
+    with _bloqueo:
+        conexion.executemany("DELETE FROM cache WHERE ruta = ? AND tipo = ?", eliminar)
+        conexion.commit()
+        conexion.execute("PRAGMA incremental_vacuum")
+
+    print(Fore.LIGHTGREEN_EX + f"Entradas eliminadas de la caché: {len(eliminar)}" + Style.RESET_ALL)
+    return len(eliminar)
+
+# FIN - Mantenimiento.
@@ -0,0 +1,188 @@
+import time
+INICIO = time.perf_counter() # Antes de cualquier otro import, para medir también la carga de módulos.
+
+import os
+import sys
+import json
+import argparse
+from contextlib import redirect_stdout
+
+"""
+Ejecución sin menú, pensada para tareas programadas (cron, el Programador de tareas de Windows).
+No hay animaciones ni preguntas por consola: todo se pasa por argumentos. Los mensajes y las barras
+de progreso salen por stderr y al terminar se escribe en stdout un resumen en JSON.
+Sólo se importan los módulos de los tipos elegidos, así una búsqueda de audio no carga OpenCV ni PIL.
+
+Ejemplo:
+    python cli.py --origen /mnt/a --origen /mnt/b --destino /mnt/duplicados --tipos Audio,Documentos
+"""
+
+TIPOS = ("Imagenes", "Videos", "Audio", "Documentos", "Otros")
+
+_arranque = None # Segundos desde el inicio hasta empezar la primera búsqueda.
+
+# INICIO - Argumentos.
+def _tipos(valor): # "Audio,Videos" -> ["Audio", "Videos"], sin distinguir mayúsculas.
+    por_nombre = {tipo.lower(): tipo for tipo in TIPOS}
+    tipos = []
+    for nombre in (parte.strip().lower() for parte in valor.split(",")):
+        if nombre == "todos":
+            tipos.extend(TIPOS)
+        elif nombre in por_nombre:
+            tipos.append(por_nombre[nombre])
+        elif nombre:
+            raise argparse.ArgumentTypeError(f"tipo desconocido: {nombre} (válidos: {', '.join(TIPOS)}, Todos)")
+    if not tipos:
+        raise argparse.ArgumentTypeError("no se eligió ningún tipo")
+    return list(dict.fromkeys(tipos))
+
+def _dentro_o_igual(ruta, carpeta): # True si "ruta" es "carpeta" o está dentro de ella (rutas reales).
+    ruta, carpeta = os.path.realpath(ruta), os.path.realpath(carpeta)
+    try:
+        return os.path.commonpath([ruta, carpeta]) == carpeta
+    except ValueError: # Unidades distintas en Windows.
+        return False
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Busca duplicados y los mueve a la carpeta de destino, sin menú interactivo."
+    )
+    parser.add_argument("-o", "--origen", action="append", required=True, metavar="CARPETA",
+                        help="Carpeta de origen. Se puede repetir para buscar en varias.")
+    parser.add_argument("-d", "--destino", required=True, metavar="CARPETA",
+                        help="Carpeta donde se mueven los duplicados (se crea si no existe).")
+    parser.add_argument("-t", "--tipos", type=_tipos, required=True,
+                        help=f"Tipos a buscar separados por \",\": {', '.join(TIPOS)} o Todos.")
+    parser.add_argument("--umbral-imagenes", type=int, default=3, metavar="N",
+                        help="Distancia de Hamming máxima por hash de imagen (por defecto 3).")
+    parser.add_argument("--verificar-imagenes", action="store_true",
+                        help="Confirmar cada grupo de imágenes comparando sus miniaturas (SSIM e histograma de color); "
+                             "permite subir --umbral-imagenes sin mover imágenes distintas.")
+    parser.add_argument("--umbral-videos", type=int, default=None, metavar="N",
+                        help="Bits distintos permitidos por muestra de video, en promedio (por defecto el de videos.py).")
+    parser.add_argument("--trabajadores-imagenes", type=int, default=None, metavar="N",
+                        help="Procesos para calcular los hashes de imágenes.")
+    parser.add_argument("--trabajadores-videos", type=int, default=None, metavar="N",
+                        help="Procesos para calcular las huellas de videos.")
+    parser.add_argument("--hilos-hash", type=int, default=None, metavar="N",
+                        help="Lecturas simultáneas al hashear audio, documentos y otros.")
+    parser.add_argument("--ignorar-etiquetas-audio", action="store_true",
+                        help="Comparar sólo el audio: las copias que difieren en etiquetas o carátula cuentan como duplicados.")
+    parser.add_argument("--zip-por-contenido", action="store_true",
+                        help="Comparar docx, xlsx, odt, epub, zip... por los archivos que contienen (nombre, CRC-32 y tamaño), "
+                             "sin importar la compresión ni las fechas.")
+    parser.add_argument("--referencia", action="append", metavar="CARPETA",
+                        help="Colección de imágenes ya ordenada: se indexa una vez (y después sólo lo que cambia) y las "
+                             "imágenes de origen que ya están en ella se mueven. Se puede repetir; nunca se modifica.")
+    parser.add_argument("--solo-reportar-referencia", action="store_true",
+                        help="Con --referencia, sólo informar en el resumen las imágenes que ya están, sin moverlas.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Releer sólo las carpetas que cambiaron desde la última ejecución incremental.")
+    parser.add_argument("--vigilar", action="store_true",
+                        help="Quedarse esperando archivos nuevos y procesarlos al llegar (implica --incremental). "
+                             "Escribe un resumen JSON por línea después de cada pasada.")
+    parser.add_argument("--intervalo", type=float, default=None, metavar="SEGUNDOS",
+                        help="Con --vigilar y sin inotify, cada cuánto revisar las carpetas.")
+    parser.add_argument("--metricas", action="store_true",
+                        help="Medir tiempos y contadores por etapa; se guardan en \"Registros\" y en el resumen.")
+    parser.add_argument("--prometheus", metavar="ARCHIVO",
+                        help="Escribir también las métricas en formato de texto de Prometheus (activa --metricas).")
+    parser.add_argument("--sin-progreso", action="store_true", help="No mostrar las barras de progreso.")
+    parser.add_argument("--resumen", metavar="ARCHIVO",
+                        help="Guardar el resumen JSON en ARCHIVO además de escribirlo en stdout.")
+    return parser
+
+# FIN - Argumentos.
+
+# INICIO - Ejecución.
+def ejecutar(argumentos, instantanea=None):
+    """
+    Corre la búsqueda con los argumentos ya interpretados y devuelve el resumen.
+    """
+    global _arranque
+    import main # Recién acá, para que "--help" y los errores de argumentos no carguen nada.
+    import metricas
+    if argumentos.metricas or argumentos.prometheus:
+        metricas.activar()
+    opciones = {"umbral_imagenes": argumentos.umbral_imagenes, "umbral_videos": argumentos.umbral_videos,
+                "instantanea": instantanea}
+    if argumentos.ignorar_etiquetas_audio:
+        opciones["ignorar_etiquetas_audio"] = True
+    if argumentos.zip_por_contenido:
+        opciones["zip_por_contenido"] = True
+    if argumentos.verificar_imagenes:
+        opciones["verificar_imagenes"] = True
+    if argumentos.referencia:
+        opciones.update(referencia=argumentos.referencia, mover_referencia=not argumentos.solo_reportar_referencia)
+    for nombre in ("trabajadores_imagenes", "trabajadores_videos", "hilos_hash"):
+        if getattr(argumentos, nombre) is not None:
+            opciones[nombre] = getattr(argumentos, nombre)
+
+    inicio_busqueda = time.perf_counter()
+    if _arranque is None:
+        _arranque = inicio_busqueda - INICIO
+    os.makedirs(argumentos.destino, exist_ok=True)
+    resumen = main.ejecutar_busqueda(argumentos.origen, argumentos.destino, argumentos.tipos, **opciones)
+    if metricas.activas():
+        resumen["metricas"] = metricas.exportar(ruta_prometheus=argumentos.prometheus)
+    resumen.update({
+        "origenes": argumentos.origen, "destino": argumentos.destino,
+        "inicio_s": _arranque, # Carga de módulos e interpretación de argumentos.
+        "duracion_s": time.perf_counter() - inicio_busqueda,
+        "modulos_cargados": sorted(modulo for modulo in ("cv2", "PIL", "imagehash", "numpy") if modulo in sys.modules),
+    })
+    return resumen
+
+def main_cli(argv=None):
+    parser = crear_parser()
+    argumentos = parser.parse_args(argv)
+
+    faltantes = [carpeta for carpeta in argumentos.origen if not os.path.isdir(carpeta)]
+    if faltantes:
+        parser.error(f"no existe la carpeta de origen: {', '.join(faltantes)}")
+    for carpeta in argumentos.referencia or ():
+        if not os.path.isdir(carpeta):
+            parser.error(f"no existe la carpeta de referencia: {carpeta}")
+        if any(_dentro_o_igual(carpeta, origen) for origen in argumentos.origen + [argumentos.destino]):
+            parser.error(f"la carpeta de referencia no puede estar dentro del origen ni del destino: {carpeta}")
+
+    if argumentos.sin_progreso:
+        os.environ["TQDM_DISABLE"] = "1" # Leído por tqdm al crear cada barra.
+    instantanea = None
+    if argumentos.incremental or argumentos.vigilar:
+        from incremental import Instantanea
+        instantanea = Instantanea()
+
+    if argumentos.vigilar:
+        return vigilar(argumentos, instantanea)
+
+    with redirect_stdout(sys.stderr): # stdout queda sólo para el resumen.
+        resumen = ejecutar(argumentos, instantanea)
+
+    texto = json.dumps(resumen, ensure_ascii=False, indent=2)
+    if argumentos.resumen:
+        with open(argumentos.resumen, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+    print(texto)
+    return 0
+
+def vigilar(argumentos, instantanea):
+    """
+    Modo vigilancia: una pasada incremental al empezar y otra cada vez que llegan archivos.
+    Cada pasada escribe su resumen en una línea de stdout. Termina con Ctrl+C.
+    """
+    import vigilancia
+
+    def pasada():
+        with redirect_stdout(sys.stderr):
+            resumen = ejecutar(argumentos, instantanea)
+        print(json.dumps(resumen, ensure_ascii=False), flush=True)
+
+    opciones = {} if argumentos.intervalo is None else {"intervalo": argumentos.intervalo}
+    vigilancia.vigilar(pasada, argumentos.origen, [argumentos.destino], **opciones)
+    return 0
+
+# FIN - Ejecución.
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
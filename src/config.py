@@ -2,65 +2,108 @@ import os
 import shutil
 from datetime import datetime
 from colorama import Fore, Style, init
+from diario import Diario, DiarioOperaciones
 
 EXTENSIONES_IMAGENES = [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".webp", ".svg"]
 EXTENSIONES_VIDEOS = [".mp4", ".avi", ".mov", ".mkv", ".flv", ".wmv", ".webm"]
+EXTENSIONES_AUDIO = [".mp3", ".m4a", ".wav", ".flac", ".aac", ".ogg"]
 EXTENSIONES_DOCUMENTOS = [".txt", ".doc", ".docx", ".xls", ".xlsx", ".xlsm", ".ppt", ".pptx", 
                           ".ppsx", ".odt", ".ods", ".odp", ".pdf", ".epub", ".mobi"]
 EXTENSIONES_OTROS = [".zip", ".rar", ".7z", ".tar", ".gz", ".iso", ".ttf", ".otf"]
+EXTENSIONES_POR_TIPO = {
+    "Imagenes": EXTENSIONES_IMAGENES,
+    "Videos": EXTENSIONES_VIDEOS,
+    "Audio": EXTENSIONES_AUDIO,
+    "Documentos": EXTENSIONES_DOCUMENTOS,
+    "Otros": EXTENSIONES_OTROS,
+}
+
+# Carpeta de los scripts: las bases persistentes (caché, instantáneas e índice de referencia) se guardan ahí,
+# así se reutilizan aunque el programa se ejecute desde otra carpeta.
+DIRECTORIO_BASE = os.path.dirname(os.path.abspath(__file__))
 
 LOG_DIR = "Registros"
 os.makedirs(LOG_DIR, exist_ok=True)
 
 TIMESTAMP = datetime.now().strftime("%Y%m%d-%H%M%S")
 LOG_ERRORES = os.path.join(LOG_DIR, f"errores-{TIMESTAMP}.txt")
-LOG_OPERACIONES = os.path.join(LOG_DIR, f"operaciones-{TIMESTAMP}.txt")
+LOG_OPERACIONES = os.path.join(LOG_DIR, f"operaciones-{TIMESTAMP}.jsonl")
 
-# INICIO - Registro de errores, función deshacer y apartar archivos problematicos.
-def registrar_error(ruta, mensaje, consola=True):
-    """
-    Registra un error en el archivo y lo muestra en consola.
-    """
-    with open(LOG_ERRORES, "a", encoding="utf-8") as log:
-        log.write(f"{ruta}: {mensaje}\n")
-    if consola:
-        print(Fore.LIGHTRED_EX + f"[ERROR] {ruta}: {mensaje}" + Style.RESET_ALL)
+# Los registros se llevan a disco en grupo: cada tantas líneas o cada tantos segundos, lo que ocurra primero.
+REGISTROS_POR_CONFIRMACION = 1000
+INTERVALO_CONFIRMACION_REGISTROS = 1.0
+DIARIO_ERRORES = Diario(LOG_ERRORES, REGISTROS_POR_CONFIRMACION, INTERVALO_CONFIRMACION_REGISTROS, fsync=False)
+DIARIO_OPERACIONES = DiarioOperaciones(LOG_OPERACIONES, TIMESTAMP, lineas_por_confirmacion=REGISTROS_POR_CONFIRMACION,
+                                       intervalo_confirmacion=INTERVALO_CONFIRMACION_REGISTROS)
 
-def registrar_operacion(original, destino, consola=False):
-    """
-    Registra la operación en el archivo y la muestra en consola.
-    """
-    with open(LOG_OPERACIONES, "a", encoding="utf-8") as log:
-        log.write(f"{original}|{destino}\n")
-    if consola:
-        print(Fore.LIGHTGREEN_EX + f"[MOVIDO] {original} -> {destino}" + Style.RESET_ALL)
+# Procesos usados para calcular los hashes de imágenes (1 = sin pool).
+TRABAJADORES_IMAGENES = os.cpu_count() or 1
+# Procesos usados para analizar videos y hilos de OpenCV dentro de cada uno.
+TRABAJADORES_VIDEOS = os.cpu_count() or 1
+HILOS_OPENCV_POR_TRABAJADOR = 1
+# Decodificar las imágenes a escala reducida antes de calcular los hashes perceptuales.
+DECODIFICACION_REDUCIDA = False
+# Confirmar cada grupo de imágenes comparando las miniaturas guardadas al calcular los hashes (SSIM e histograma de color).
+# Permite subir el umbral de los hashes sin mover imágenes distintas; los umbrales van de 0 a 1.
+VERIFICAR_IMAGENES = False
+UMBRAL_SSIM = 0.8
+UMBRAL_HISTOGRAMA = 0.8
 
-def deshacer_ultima_operacion():
-    """
-    Deshace la última operación basada en el log de operaciones.
-    """
-    if not os.path.exists(LOG_OPERACIONES):
-        print(Fore.LIGHTYELLOW_EX + "No hay operaciones previas para deshacer." + Style.RESET_ALL)
-        return
+# Hash de contenido de los módulos exactos: "sha256" o "blake2b".
+ALGORITMO_HASH = "sha256"
+# Hash parcial (inicio y final) usado como primera pasada; "crc32" es más rápido y el hash completo confirma igual.
+ALGORITMO_PARCIAL = "sha256"
+TAMANO_BUFFER_HASH = 1024 * 1024 # Buffer reutilizable de lectura.
+# Desde este tamaño los archivos se hashean con mmap (por ejemplo 64 * 1024 * 1024); None para leer siempre con readinto.
+# Sólo para discos locales: si el archivo se trunca mientras se hashea, o el recurso de red se desconecta,
+# leer el mapa mata el proceso con SIGBUS en lugar de dar un error.
+UMBRAL_MMAP = None
+# Lecturas simultáneas al hashear los módulos exactos. 1 para discos locales; 8-16 para NAS (SMB/NFS) o USB lentos.
+HILOS_HASH_EXACTO = 1
 
-    confirmacion = input("¿Deseas deshacer la última operación? (s/n): ")
-    if confirmacion.lower() != "s":
-        print(Fore.LIGHTRED_EX + "Operación cancelada." + Style.RESET_ALL)
-        return
+# Audio: comparar sólo el audio de cada archivo, sin etiquetas (ID3, APE, Vorbis, MP4) ni carátula.
+# Encuentra las copias reetiquetadas y no lee la carátula; se conserva la primera copia encontrada, con sus etiquetas.
+IGNORAR_ETIQUETAS_AUDIO = False
 
-    with open(LOG_OPERACIONES, "r") as log:
-        operaciones = log.readlines()
+# ZIP (docx, xlsx, odt, epub, zip...): con True dos archivos con el mismo contenido (nombre, CRC-32 y tamaño de cada
+# archivo interno) son duplicados aunque difieran en la compresión, el orden o las fechas. Sólo se lee el directorio central.
+COMPARAR_ZIP_POR_CONTENIDO = False
 
-    for operacion in reversed(operaciones):
-        original, destino = operacion.strip().split("|")
-        try:
-            os.rename(destino, original)
-            print(f"Restaurado: {destino} -> {original}")
-        except Exception as e:
-            print(f"Error al restaurar {destino}: {e}")
+# Hilos usados al deshacer: cada uno restaura los archivos de una carpeta de origen distinta.
+TRABAJADORES_DESHACER = 8
 
-    os.remove(LOG_OPERACIONES)  # Borra el log después de deshacer.
-    print(Fore.LIGHTGREEN_EX + "Operación deshecha con éxito." + Style.RESET_ALL)
+# Copias simultáneas cuando la carpeta de destino está en otro dispositivo (en el mismo se usa os.rename).
+TRABAJADORES_COPIA = 4
+
+# Instantánea de carpetas del recorrido incremental (ver incremental.py).
+INSTANTANEA_DB = os.path.join(DIRECTORIO_BASE, "instantanea_carpetas.sqlite")
+INSTANTANEA_REFERENCIA_DB = os.path.join(DIRECTORIO_BASE, "instantanea_referencia.sqlite") # La de la biblioteca de referencia, aparte.
+# Modo vigilancia: segundos sin cambios antes de procesar lo que llegó, y cada cuánto revisar si no hay inotify.
+ESPERA_VIGILANCIA = 2.0
+INTERVALO_SONDEO = 30.0
+
+# Índice persistente de la biblioteca de referencia de imágenes (ver referencia.py).
+INDICE_REFERENCIA_DB = os.path.join(DIRECTORIO_BASE, "indice_referencia.sqlite")
+
+# Contadores y tiempos por etapa (ver metricas.py). Al terminar se guardan en "Registros" y,
+# si se indica una ruta, también en formato de texto de Prometheus.
+USAR_METRICAS = False
+LOG_METRICAS = os.path.join(LOG_DIR, "metricas-{}.json") # "{}" es la fecha y hora del comienzo de cada búsqueda.
+METRICAS_PROMETHEUS = None
+
+# Caché persistente de hashes, en la carpeta de los scripts.
+USAR_CACHE = True
+CACHE_DB = os.path.join(DIRECTORIO_BASE, "cache_hashes.sqlite")
+CACHE_TAMANO_MAXIMO = 512 * 1024 * 1024 # Al superarlo se eliminan las entradas usadas hace más tiempo.
+
+# INICIO - Registro de errores y apartar archivos problematicos.
+def registrar_error(ruta, mensaje, consola=True):
+    """
+    Registra un error en el archivo y lo muestra en consola.
+    """
+    DIARIO_ERRORES.escribir(f"{ruta}: {mensaje}")
+    if consola:
+        print(Fore.LIGHTRED_EX + f"[ERROR] {ruta}: {mensaje}" + Style.RESET_ALL)
 
 def mover_a_problematicos(ruta, carpeta_destino):
     """
@@ -71,4 +114,4 @@ def mover_a_problematicos(ruta, carpeta_destino):
     destino = os.path.join(carpeta_problematicos, os.path.basename(ruta))
     shutil.move(ruta, destino)
     
-# FIN - Registro de errores, función deshacer y apartar archivos problematicos.
+# FIN - Registro de errores y apartar archivos problematicos.
@@ -0,0 +1,379 @@
+import os
+import struct
+import hashlib
+from collections import namedtuple
+
+"""
+Ubica el audio dentro de los contenedores más comunes leyendo sólo sus cabeceras, sin decodificar nada:
+etiquetas ID3v2/ID3v1/APE/Lyrics3 en MP3 y AAC, bloques de metadatos en FLAC, páginas de cabecera en Ogg,
+el átomo "mdat" en M4A y el chunk "data" en WAV. Así dos copias que sólo difieren en las etiquetas
+o en la carátula tienen el mismo hash, y el hash no lee los megabytes de la carátula.
+
+Los documentos y archivos comprimidos en ZIP (docx, xlsx, odt, epub, zip...) guardan al final un directorio
+central con el CRC-32 y el tamaño de cada archivo interno: leyéndolo se obtiene una huella del contenido
+con una o dos lecturas chicas, sin importar la compresión, el orden ni las fechas de cada archivo.
+
+En Ogg, al cambiar el tamaño de los comentarios cambia la cantidad de páginas de cabecera y los
+reetiquetadores renumeran las páginas de audio; por eso el número de secuencia y el CRC de cada página
+se ponen en cero antes de hashear (ver enmascarar_ogg).
+"""
+
+# Región del archivo con el audio: desde "inicio", "largo" bytes. "ogg" indica que hay que enmascarar las páginas.
+Carga = namedtuple("Carga", ["inicio", "largo", "ogg"])
+
+MAXIMO_ETIQUETAS_FINALES = 4 # Etiquetas apiladas al final (ID3v1, APE, Lyrics3...) que se quitan como máximo.
+# Huella de un ZIP: "largo" es la suma de los tamaños sin comprimir y "valor" el hash de (nombre, CRC-32, tamaño).
+Huella = namedtuple("Huella", ["largo", "valor"])
+
+EXTENSIONES_ZIP = (".zip", ".docx", ".xlsx", ".xlsm", ".pptx", ".ppsx", ".odt", ".ods", ".odp", ".epub")
+COLA_ZIP = 8 * 1024 # Bytes leídos al final del archivo: alcanzan para el fin del directorio y, casi siempre, el directorio.
+COLA_ZIP_MAXIMA = 22 + 65535 + 20 + 56 # Fin del directorio con el comentario más largo posible y los registros zip64.
+_CABECERA_OGG = 27
+_UINT32_LE = struct.Struct("<I")
+
+# INICIO - Lectura.
+def _leer(f, posicion, cantidad):
+    f.seek(posicion)
+    return f.read(cantidad)
+
+def _tamano_synchsafe(datos): # Enteros de ID3v2: 7 bits útiles por byte.
+    return (datos[0] << 21) | (datos[1] << 14) | (datos[2] << 7) | datos[3]
+
+# FIN - Lectura.
+
+# INICIO - Etiquetas.
+def _saltar_id3v2(f, inicio, fin):
+    """
+    Devuelve la posición después de las etiquetas ID3v2 que haya desde "inicio" (algunos programas apilan varias).
+    """
+    while inicio + 10 <= fin:
+        cabecera = _leer(f, inicio, 10)
+        if cabecera[:3] != b"ID3" or any(byte & 0x80 for byte in cabecera[6:10]):
+            break
+        inicio += 10 + _tamano_synchsafe(cabecera[6:10]) + (10 if cabecera[5] & 0x10 else 0) # 0x10: tiene pie.
+    return min(inicio, fin)
+
+def _quitar_etiquetas_finales(f, inicio, fin):
+    """
+    Devuelve el final del audio sin las etiquetas que haya al final del archivo: ID3v1, APEv1/v2,
+    Lyrics3v2 e ID3v2 con pie, en cualquier orden.
+    """
+    for _ in range(MAXIMO_ETIQUETAS_FINALES):
+        if fin - 128 >= inicio and _leer(f, fin - 128, 3) == b"TAG":
+            fin -= 128
+            continue
+        if fin - 32 >= inicio:
+            pie = _leer(f, fin - 32, 32)
+            if pie[:8] == b"APETAGEX":
+                tamano, _, banderas = struct.unpack_from("<III", pie, 12)
+                fin -= tamano + (32 if banderas & 0x80000000 else 0) # El tamaño no incluye la cabecera opcional.
+                continue
+        if fin - 15 >= inicio:
+            pie = _leer(f, fin - 15, 15)
+            if pie[6:] == b"LYRICS200" and pie[:6].isdigit():
+                fin -= int(pie[:6]) + 15
+                continue
+        if fin - 10 >= inicio:
+            pie = _leer(f, fin - 10, 10)
+            if pie[:3] == b"3DI" and not any(byte & 0x80 for byte in pie[6:10]):
+                fin -= _tamano_synchsafe(pie[6:10]) + 20
+                continue
+        break
+    return max(fin, inicio)
+
+def _carga_mpeg(f, tamano): # MP3 y AAC (ADTS): todo lo que no sea una etiqueta es audio.
+    inicio = _saltar_id3v2(f, 0, tamano)
+    return Carga(inicio, _quitar_etiquetas_finales(f, inicio, tamano) - inicio, False)
+
+# FIN - Etiquetas.
+
+# INICIO - Contenedores.
+def _carga_flac(f, tamano):
+    posicion = _saltar_id3v2(f, 0, tamano)
+    if _leer(f, posicion, 4) != b"fLaC":
+        return None
+    posicion += 4
+    while True:
+        cabecera = _leer(f, posicion, 4)
+        if len(cabecera) < 4:
+            return None
+        posicion += 4 + int.from_bytes(cabecera[1:4], "big")
+        if cabecera[0] & 0x80: # Último bloque de metadatos.
+            break
+    if posicion > tamano:
+        return None
+    return Carga(posicion, _quitar_etiquetas_finales(f, posicion, tamano) - posicion, False)
+
+def _carga_wav(f, tamano):
+    cabecera = _leer(f, 0, 12)
+    if cabecera[:4] not in (b"RIFF", b"RF64") or cabecera[8:12] != b"WAVE":
+        return None
+    posicion = 12
+    while posicion + 8 <= tamano:
+        chunk = _leer(f, posicion, 8)
+        largo = _UINT32_LE.unpack_from(chunk, 4)[0]
+        if chunk[:4] == b"data":
+            # En RF64 (y en WAV cortados) el tamaño real no está acá: se toma hasta el final del archivo.
+            if largo == 0xFFFFFFFF or posicion + 8 + largo > tamano:
+                largo = tamano - posicion - 8
+            return Carga(posicion + 8, largo, False)
+        posicion += 8 + largo + (largo & 1) # Los chunks se alinean a 2 bytes.
+    return None
+
+def _carga_mp4(f, tamano):
+    """
+    El audio está en el átomo "mdat"; las etiquetas y la carátula, en "moov" (antes o después).
+    Con más de un "mdat" se hashea el archivo entero.
+    """
+    posicion = 0
+    cargas = []
+    while posicion + 8 <= tamano:
+        cabecera = _leer(f, posicion, 16)
+        largo, tipo = int.from_bytes(cabecera[:4], "big"), cabecera[4:8]
+        if posicion == 0 and tipo != b"ftyp":
+            return None
+        inicio_datos = 8
+        if largo == 1: # Tamaño de 64 bits.
+            if len(cabecera) < 16:
+                return None
+            largo, inicio_datos = int.from_bytes(cabecera[8:16], "big"), 16
+        elif largo == 0: # Hasta el final del archivo.
+            largo = tamano - posicion
+        if largo < inicio_datos:
+            return None
+        if tipo == b"mdat":
+            cargas.append(Carga(posicion + inicio_datos, min(largo, tamano - posicion) - inicio_datos, False))
+        posicion += largo
+    return cargas[0] if len(cargas) == 1 else None
+
+def _paquetes_de_cabecera(primer_paquete): # Cantidad de paquetes de cabecera según el códec, o None si no se conoce.
+    if primer_paquete.startswith(b"\x01vorbis"):
+        return 3 # Identificación, comentarios y configuración.
+    if primer_paquete.startswith(b"OpusHead"):
+        return 2 # OpusHead y OpusTags.
+    if primer_paquete.startswith(b"\x7fFLAC") and len(primer_paquete) >= 9:
+        adicionales = int.from_bytes(primer_paquete[7:9], "big")
+        return 1 + adicionales if adicionales else None # 0 significa "desconocido".
+    return None
+
+def _carga_ogg(f, tamano):
+    """
+    Vorbis, Opus y FLAC en Ogg empiezan el audio en una página nueva después de los paquetes de
+    cabecera (donde están los comentarios y la carátula): la carga va desde esa página hasta el final.
+    """
+    posicion = 0
+    paquetes = 0
+    cabeceras = None
+    while posicion + _CABECERA_OGG <= tamano:
+        cabecera = _leer(f, posicion, _CABECERA_OGG)
+        if cabecera[:4] != b"OggS":
+            return None
+        segmentos = f.read(cabecera[26])
+        if len(segmentos) < cabecera[26]:
+            return None
+        if cabeceras is None:
+            cabeceras = _paquetes_de_cabecera(f.read(min(segmentos[0] if segmentos else 0, 16)))
+            if cabeceras is None:
+                return None
+        paquetes += sum(1 for segmento in segmentos if segmento < 255) # Un segmento menor a 255 cierra un paquete.
+        posicion += _CABECERA_OGG + len(segmentos) + sum(segmentos)
+        if paquetes >= cabeceras:
+            return Carga(posicion, tamano - posicion, True) if posicion <= tamano else None
+    return None
+
+UBICADORES = {
+    ".mp3": _carga_mpeg,
+    ".aac": _carga_mpeg,
+    ".flac": _carga_flac,
+    ".ogg": _carga_ogg,
+    ".oga": _carga_ogg,
+    ".opus": _carga_ogg,
+    ".m4a": _carga_mp4,
+    ".wav": _carga_wav,
+}
+
+def ubicar_carga(ruta, tamano=None):
+    """
+    Devuelve la Carga del archivo según su extensión, o None si el formato no se reconoce o las
+    cabeceras no son válidas (en ese caso se compara el archivo entero).
+    Los errores de lectura se propagan.
+    """
+    ubicador = UBICADORES.get(os.path.splitext(ruta)[1].lower())
+    if ubicador is None:
+        return None
+    with open(ruta, "rb") as f:
+        tamano = os.fstat(f.fileno()).st_size if tamano is None else tamano
+        try:
+            carga = ubicador(f, tamano)
+        except (struct.error, ValueError, IndexError): # Cabeceras cortadas o inválidas.
+            return None
+    if carga is None or carga.largo < 0 or carga.inicio + carga.largo > tamano:
+        return None
+    return carga
+
+# FIN - Contenedores.
+
+# INICIO - Páginas Ogg.
+def enmascarar_ogg(datos, posicion=0):
+    """
+    Pone en cero el número de secuencia y el CRC de las páginas de "datos" (un bytearray) desde "posicion",
+    que debe ser el comienzo de una página. Devuelve la posición donde empezaría la siguiente página,
+    o None si se encontró algo que no es una página (el resto queda sin tocar).
+    Una página cortada al final se enmascara hasta donde llegan los datos.
+    """
+    while posicion < len(datos):
+        if datos[posicion:posicion + 4] != b"OggS"[:len(datos) - posicion]:
+            return None
+        campos = datos[posicion + 18:posicion + 26]
+        datos[posicion + 18:posicion + 26] = bytes(len(campos))
+        if posicion + _CABECERA_OGG > len(datos):
+            return posicion # Cabecera incompleta: la página sigue en los datos siguientes.
+        fin_tabla = posicion + _CABECERA_OGG + datos[posicion + 26]
+        if fin_tabla > len(datos):
+            return posicion
+        posicion = fin_tabla + sum(datos[posicion + _CABECERA_OGG:fin_tabla])
+    return posicion
+
+def actualizar_con_ogg(hash_obj, f, cantidad, tamano_bloque=1024 * 1024):
+    """
+    Agrega al hash "cantidad" bytes de "f" desde la posición actual (el comienzo de una página),
+    con las páginas enmascaradas. Da el mismo resultado que enmascarar_ogg sobre los mismos bytes leídos juntos.
+    Devuelve los bytes leídos.
+    """
+    pendiente = bytearray() # Cabecera de página que quedó cortada entre dos bloques.
+    siguiente = 0 # Posición de la próxima página dentro de "datos", o None si ya no hay páginas.
+    leidos = 0
+    while leidos < cantidad:
+        bloque = f.read(min(tamano_bloque, cantidad - leidos))
+        if not bloque:
+            break
+        leidos += len(bloque)
+        datos = pendiente + bloque
+        pendiente = bytearray()
+        if siguiente is not None and siguiente < len(datos):
+            siguiente = enmascarar_ogg(datos, siguiente)
+            if siguiente is not None and siguiente < len(datos) and leidos < cantidad:
+                # La cabecera sigue en el próximo bloque: se vuelve a enmascarar completa con los datos siguientes.
+                pendiente = datos[siguiente:]
+                del datos[siguiente:]
+                siguiente = 0
+        hash_obj.update(datos)
+        if siguiente is not None and not pendiente:
+            siguiente -= len(datos)
+    if pendiente:
+        hash_obj.update(pendiente)
+    return leidos
+
+# FIN - Páginas Ogg.
+
+# INICIO - ZIP.
+def _fin_en_cola(cola):
+    """
+    Devuelve (posición del registro de fin de directorio en "cola", si su comentario llega justo al final),
+    o (-1, False). El comentario del ZIP puede contener la firma: se prefiere la última que coincide con el final
+    y, si ninguna coincide (bytes agregados después del comentario), la última que entra completa.
+    """
+    candidata = -1
+    fin = cola.rfind(b"PK\x05\x06")
+    while fin >= 0:
+        if fin + 22 <= len(cola):
+            if fin + 22 + struct.unpack_from("<H", cola, fin + 20)[0] == len(cola):
+                return fin, True
+            if candidata < 0:
+                candidata = fin
+        fin = cola.rfind(b"PK\x05\x06", 0, fin)
+    return candidata, False
+
+def _buscar_fin_directorio(f, tamano): # Devuelve (cola, posición del registro de fin de directorio en la cola) o None.
+    leido = min(tamano, COLA_ZIP)
+    cola = _leer(f, tamano - leido, leido)
+    fin, exacto = _fin_en_cola(cola)
+    if not exacto and leido < tamano: # Comentario largo: se lee hasta el máximo posible.
+        leido = min(tamano, COLA_ZIP_MAXIMA)
+        cola = _leer(f, tamano - leido, leido)
+        fin, _ = _fin_en_cola(cola)
+    if fin < 0:
+        return None
+    return cola, fin
+
+def leer_directorio_zip(f, tamano, maximo=None):
+    """
+    Devuelve los bytes desde el directorio central hasta el final del archivo y el tamaño del directorio,
+    o None si no es un ZIP válido o esos bytes superan "maximo".
+    Lee la cola del archivo y, sólo si el directorio no entra en ella, hace una segunda lectura.
+    Soporta zip64 y datos agregados al principio (ejecutables autoextraíbles).
+    """
+    encontrado = _buscar_fin_directorio(f, tamano)
+    if encontrado is None:
+        return None
+    cola, fin = encontrado
+    entradas, largo_directorio = struct.unpack_from("<HI", cola, fin + 10)
+    fin_directorio = fin
+    if entradas == 0xFFFF or largo_directorio == 0xFFFFFFFF: # zip64: los valores reales están en otro registro.
+        localizador = fin - 20
+        if localizador < 0 or cola[localizador:localizador + 4] != b"PK\x06\x07":
+            return None
+        posicion_64 = struct.unpack_from("<Q", cola, localizador + 8)[0] - (tamano - len(cola))
+        for registro in (posicion_64, localizador - 56): # Posición declarada, o justo antes del localizador.
+            if 0 <= registro <= localizador - 56 and cola[registro:registro + 4] == b"PK\x06\x06":
+                break
+        else:
+            return None
+        largo_directorio = struct.unpack_from("<Q", cola, registro + 40)[0]
+        fin_directorio = registro
+
+    inicio = tamano - len(cola) + fin_directorio - largo_directorio # Relativo al final: ignora datos agregados al principio.
+    if inicio < 0 or (maximo is not None and tamano - inicio > maximo):
+        return None
+    desde = inicio - (tamano - len(cola))
+    datos = cola[desde:] if desde >= 0 else _leer(f, inicio, tamano - inicio)
+    if largo_directorio and datos[:4] != b"PK\x01\x02":
+        return None
+    return datos, largo_directorio
+
+def _tamano_zip64(extra): # Tamaño sin comprimir del campo extra zip64 (id 0x0001), o None.
+    posicion = 0
+    while posicion + 4 <= len(extra):
+        identificador, largo = struct.unpack_from("<HH", extra, posicion)
+        if identificador == 0x0001 and largo >= 8:
+            return struct.unpack_from("<Q", extra, posicion + 4)[0]
+        posicion += 4 + largo
+    return None
+
+def huella_zip(ruta, tamano=None):
+    """
+    Devuelve la Huella del ZIP a partir de su directorio central, o None si la extensión no es de un ZIP
+    o el directorio no es válido. Las carpetas se ignoran (hay compresores que no las guardan).
+    Los errores de lectura se propagan.
+    """
+    if os.path.splitext(ruta)[1].lower() not in EXTENSIONES_ZIP:
+        return None
+    with open(ruta, "rb") as f:
+        tamano = os.fstat(f.fileno()).st_size if tamano is None else tamano
+        leido = leer_directorio_zip(f, tamano)
+    if leido is None:
+        return None
+    datos, largo_directorio = leido
+
+    miembros = []
+    posicion = 0
+    while posicion < largo_directorio:
+        if posicion + 46 > len(datos) or datos[posicion:posicion + 4] != b"PK\x01\x02":
+            return None
+        crc, _, tamano_miembro, largo_nombre, largo_extra, largo_comentario = struct.unpack_from("<IIIHHH", datos, posicion + 16)
+        nombre = datos[posicion + 46:posicion + 46 + largo_nombre]
+        if tamano_miembro == 0xFFFFFFFF:
+            extra = posicion + 46 + largo_nombre
+            tamano_miembro = _tamano_zip64(datos[extra:extra + largo_extra])
+            if tamano_miembro is None:
+                return None
+        if not nombre.endswith(b"/"):
+            miembros.append((nombre, crc, tamano_miembro))
+        posicion += 46 + largo_nombre + largo_extra + largo_comentario
+
+    valor = hashlib.sha256()
+    for nombre, crc, tamano_miembro in sorted(miembros):
+        valor.update(struct.pack("<I", len(nombre)) + nombre + struct.pack("<IQ", crc, tamano_miembro))
+    return Huella(sum(miembro[2] for miembro in miembros), valor.hexdigest())
+
+# FIN - ZIP.
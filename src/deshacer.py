@@ -0,0 +1,198 @@
+import os
+import json
+import errno
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from tqdm import tqdm
+from tabulate import tabulate
+from colorama import Fore, Style, init
+from mover import copiar_y_borrar
+from diario import Diario, leer_eventos, leer_operaciones_en_reversa
+from config import registrar_error, LOG_DIR, DIARIO_OPERACIONES, TRABAJADORES_DESHACER
+
+init(autoreset=True)
+
+"""
+Deshacer de cualquier ejecución guardada en "Registros", completa o en parte.
+El registro se lee desde el final sin cargarlo entero, los archivos se restauran en paralelo
+(un hilo por carpeta de origen, así el orden dentro de cada carpeta se respeta) y cada operación
+restaurada se anota en un archivo de avance, para poder retomar un deshacer interrumpido.
+"""
+
+INDICE_CORRIDAS = os.path.join(LOG_DIR, "indice_corridas.json")
+TAMANO_LOTE_DESHACER = 1000 # Operaciones repartidas entre los hilos en cada tanda.
+
+# INICIO - Índice de corridas.
+def _corrida_de(nombre): # "operaciones-20240101-120000.jsonl" -> "20240101-120000"
+    return os.path.splitext(nombre)[0][len("operaciones-"):]
+
+def ruta_avance(ruta_registro): # Archivo con las operaciones ya restauradas de un registro.
+    return os.path.splitext(ruta_registro)[0] + ".deshacer"
+
+def _contar_restauradas(ruta_registro):
+    ruta = ruta_avance(ruta_registro)
+    if not os.path.exists(ruta):
+        return 0
+    with open(ruta, "r", encoding="utf-8", errors="replace") as archivo:
+        return sum(1 for linea in archivo if linea.strip())
+
+def indexar_corridas(carpeta=LOG_DIR):
+    """
+    Devuelve las corridas con registro de operaciones, de la más reciente a la más antigua.
+    El conteo de cada registro se guarda en INDICE_CORRIDAS y sólo se recalcula si el archivo cambió.
+    """
+    try:
+        with open(INDICE_CORRIDAS, "r", encoding="utf-8") as archivo:
+            indice = json.load(archivo)
+    except (OSError, ValueError):
+        indice = {}
+
+    corridas = []
+    vigentes = {}
+    for entrada in os.scandir(carpeta):
+        if not entrada.name.startswith("operaciones-") or not entrada.name.endswith((".jsonl", ".txt")):
+            continue
+        stat = entrada.stat()
+        datos = indice.get(entrada.name)
+        if not datos or datos["mtime_ns"] != stat.st_mtime_ns or datos["tamano"] != stat.st_size:
+            operaciones = sum(1 for evento in leer_eventos(entrada.path) if "origen" in evento)
+            datos = {"mtime_ns": stat.st_mtime_ns, "tamano": stat.st_size, "operaciones": operaciones}
+        vigentes[entrada.name] = datos
+        corridas.append({"corrida": _corrida_de(entrada.name), "ruta": entrada.path,
+                         "operaciones": datos["operaciones"], "restauradas": _contar_restauradas(entrada.path)})
+
+    if vigentes != indice:
+        try:
+            with open(INDICE_CORRIDAS, "w", encoding="utf-8") as archivo:
+                json.dump(vigentes, archivo)
+        except OSError as e:
+            registrar_error(INDICE_CORRIDAS, f"Error al guardar el índice de corridas: {e}", consola=False)
+
+    return sorted(corridas, key=lambda corrida: corrida["corrida"], reverse=True)
+
+# FIN - Índice de corridas.
+
+# INICIO - Restauración.
+def restaurar_operacion(operacion):
+    """
+    Devuelve un archivo a su ruta original. Si está en otro dispositivo se copia de vuelta.
+    Devuelve "restaurado", "omitido" (nunca se movió o ya estaba restaurado) o "error".
+    """
+    origen, destino = operacion["origen"], operacion["destino"]
+    if operacion["estado"] == "fallido":
+        return "omitido"
+    if os.path.exists(origen):
+        if operacion["estado"] == "intencion" or not os.path.exists(destino):
+            return "omitido" # No llegó a moverse, o ya se restauró en un deshacer anterior.
+        registrar_error(destino, f"No se restauró: ya existe {origen}")
+        return "error"
+    if not os.path.exists(destino):
+        if operacion["estado"] != "intencion":
+            registrar_error(destino, "No se restauró: el archivo ya no está en el destino.")
+            return "error"
+        return "omitido"
+
+    try:
+        os.makedirs(os.path.dirname(origen) or ".", exist_ok=True)
+        try:
+            os.rename(destino, origen)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            copiar_y_borrar(destino, origen)
+        return "restaurado"
+    except OSError as e:
+        registrar_error(destino, f"Error al restaurar: {e}")
+        return "error"
+
+def _restaurar_carpeta(operaciones): # Restaura en orden las operaciones de una misma carpeta de origen.
+    return [(operacion, restaurar_operacion(operacion)) for operacion in operaciones]
+
+def deshacer_corrida(ruta_registro, cantidad=None, trabajadores=TRABAJADORES_DESHACER):
+    """
+    Deshace las últimas "cantidad" operaciones del registro (todas si es None), desde la más reciente.
+    Las operaciones anotadas en el archivo de avance se saltean, así un deshacer cortado se retoma
+    donde quedó. Si se deshizo la corrida completa sin errores se borran el registro y el avance.
+    Devuelve {"restaurado": n, "omitido": n, "error": n}.
+    """
+    if os.path.abspath(ruta_registro) == os.path.abspath(DIARIO_OPERACIONES.ruta):
+        DIARIO_OPERACIONES.cerrar()  # Para leer también lo que quedaba en el buffer de esta ejecución.
+
+    avance = ruta_avance(ruta_registro)
+    hechas = set()
+    if os.path.exists(avance):
+        with open(avance, "r", encoding="utf-8", errors="replace") as archivo:
+            hechas = {linea.rstrip("\n") for linea in archivo if linea.strip()}
+    diario_avance = Diario(avance)
+
+    pendientes = (operacion for operacion in leer_operaciones_en_reversa(ruta_registro)
+                  if operacion["destino"] not in hechas)
+    if cantidad is not None:
+        pendientes = islice(pendientes, cantidad)
+
+    conteo = {"restaurado": 0, "omitido": 0, "error": 0}
+    completa = cantidad is None
+    with ThreadPoolExecutor(max(1, trabajadores)) as pool, tqdm(desc="Restaurando", unit=" archivos") as progreso:
+        while tanda := list(islice(pendientes, TAMANO_LOTE_DESHACER)):
+            por_carpeta = {}
+            for operacion in tanda:
+                por_carpeta.setdefault(os.path.dirname(operacion["origen"]), []).append(operacion)
+
+            for resultados in pool.map(_restaurar_carpeta, por_carpeta.values()):
+                for operacion, estado in resultados:
+                    conteo[estado] += 1
+                    if estado != "error":
+                        diario_avance.escribir(operacion["destino"])
+                progreso.update(len(resultados))
+            diario_avance.confirmar() # Punto de control: la tanda queda anotada antes de seguir.
+
+    diario_avance.cerrar()
+    if completa and not conteo["error"]:
+        os.remove(ruta_registro)
+        if os.path.exists(avance):
+            os.remove(avance)
+    return conteo
+
+# FIN - Restauración.
+
+# INICIO - Menú.
+def imprimir_resultado(conteo):
+    print(Fore.LIGHTGREEN_EX + f"Restaurados: {conteo['restaurado']}, omitidos: {conteo['omitido']}, "
+          f"con error: {conteo['error']}." + Style.RESET_ALL)
+
+def menu_deshacer():
+    """
+    Muestra las corridas guardadas y deshace la elegida, entera o sus últimas N operaciones.
+    """
+    corridas = indexar_corridas()
+    if not corridas:
+        print(Fore.LIGHTYELLOW_EX + "No hay operaciones previas para deshacer." + Style.RESET_ALL)
+        return
+
+    filas = [[idx, corrida["corrida"], corrida["operaciones"], corrida["restauradas"]]
+             for idx, corrida in enumerate(corridas, start=1)]
+    print(Fore.LIGHTMAGENTA_EX + tabulate(filas, headers=["#", "Corrida", "Operaciones", "Ya restauradas"],
+                                          tablefmt="grid") + Style.RESET_ALL)
+
+    try:
+        seleccion = input("Elija la corrida a deshacer (Enter = la más reciente): ").strip()
+        indice = int(seleccion) if seleccion else 1
+        if indice < 1: # Un índice negativo elegiría otra corrida contando desde el final.
+            raise IndexError
+        corrida = corridas[indice - 1]
+        cantidad = input("¿Cuántas operaciones deshacer, desde la última? (Enter = todas): ").strip()
+        cantidad = int(cantidad) if cantidad else None
+        if cantidad is not None and cantidad < 1:
+            raise ValueError
+    except (ValueError, IndexError):
+        print(Fore.LIGHTRED_EX + "Selección inválida. Intente nuevamente." + Style.RESET_ALL)
+        return
+
+    confirmacion = input(f"¿Deseas deshacer la corrida {corrida['corrida']}? (s/n): ")
+    if confirmacion.lower() != "s":
+        print(Fore.LIGHTRED_EX + "Operación cancelada." + Style.RESET_ALL)
+        return
+
+    imprimir_resultado(deshacer_corrida(corrida["ruta"], cantidad))
+
+# FIN - Menú.
@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import atexit
+import threading
+from itertools import count
+
+"""
+Registros en disco con escrituras en buffer, compartidos por todos los módulos.
+El archivo se abre una sola vez y se confirma (flush + fsync) en grupo: cada cierta cantidad
+de líneas o cada cierto tiempo, en lugar de abrirlo y cerrarlo por cada archivo movido.
+
+El registro de operaciones usa una línea JSON por evento. Antes de mover un lote se escribe
+y confirma la intención de cada movimiento, y después el resultado; así, aunque el programa
+se corte a mitad de un lote, el deshacer sabe qué archivos pudieron haberse movido.
+Una línea cortada al final del archivo se ignora al leerlo.
+"""
+
+# INICIO - Archivo con buffer.
+class Diario:
+    """
+    Archivo de texto que sólo se agrega al final, con confirmación en grupo.
+    Con "fsync" en False sólo se vacía el buffer (suficiente para el registro de errores).
+    """
+
+    def __init__(self, ruta, lineas_por_confirmacion=1000, intervalo_confirmacion=1.0, fsync=True):
+        self.ruta = ruta
+        self.lineas_por_confirmacion = lineas_por_confirmacion
+        self.intervalo_confirmacion = intervalo_confirmacion
+        self.fsync = fsync
+        self._archivo = None
+        self._bloqueo = threading.RLock()
+        self._sin_confirmar = 0
+        self._ultima_confirmacion = time.monotonic()
+        atexit.register(self.cerrar)
+
+    def escribir(self, linea):
+        with self._bloqueo:
+            if self._archivo is None: # Se abre recién con la primera línea, para no dejar archivos vacíos.
+                self._archivo = open(self.ruta, "a", encoding="utf-8", buffering=1024 * 1024)
+            self._archivo.write(linea + "\n")
+            self._sin_confirmar += 1
+            if (self._sin_confirmar >= self.lineas_por_confirmacion
+                    or time.monotonic() - self._ultima_confirmacion >= self.intervalo_confirmacion):
+                self.confirmar()
+
+    def confirmar(self): # Lleva a disco todo lo escrito hasta ahora.
+        with self._bloqueo:
+            if self._archivo is None:
+                return
+            self._archivo.flush()
+            if self.fsync and self._sin_confirmar:
+                os.fsync(self._archivo.fileno())
+            self._sin_confirmar = 0
+            self._ultima_confirmacion = time.monotonic()
+
+    def cerrar(self): # Confirma y cierra; si se vuelve a escribir, el archivo se reabre.
+        with self._bloqueo:
+            if self._archivo is None:
+                return
+            self.confirmar()
+            self._archivo.close()
+            self._archivo = None
+
+# FIN - Archivo con buffer.
+
+# INICIO - Registro de operaciones.
+class DiarioOperaciones(Diario):
+    """
+    Registro de movimientos de una ejecución ("corrida"). Cada movimiento tiene un id de operación
+    y dos eventos: "intencion" (origen, destino, tamaño, hash y modo) y luego "hecho" o "fallido".
+    """
+
+    def __init__(self, ruta, corrida, **opciones):
+        super().__init__(ruta, **opciones)
+        self.corrida = corrida
+        self._ids = count(1)
+
+    def _evento(self, **datos):
+        self.escribir(json.dumps({"corrida": self.corrida, **datos}, ensure_ascii=False))
+
+    def intencion(self, origen, destino, tamano=None, hash_=None, modo="rename"):
+        """
+        Anota que se va a mover "origen" a "destino" y devuelve el id de la operación.
+        La intención recién es segura en disco después de confirmar().
+        """
+        with self._bloqueo:
+            op = next(self._ids)
+            self._evento(op=op, estado="intencion", origen=os.path.abspath(origen), destino=os.path.abspath(destino),
+                         tamano=tamano, hash=hash_, modo=modo)
+        return op
+
+    def resultado(self, op, exito=True):
+        self._evento(op=op, estado="hecho" if exito else "fallido")
+
+    def registrar(self, origen, destino, tamano=None, hash_=None, modo="rename"):
+        """
+        Registra un movimiento ya hecho, con los dos eventos seguidos.
+        """
+        with self._bloqueo:
+            self.resultado(self.intencion(origen, destino, tamano, hash_, modo))
+
+def interpretar_linea(linea, numero=None):
+    """
+    Convierte una línea del registro en un evento, o None si está cortada o es ilegible.
+    Las líneas del formato anterior ("origen|destino") se leen como movimientos hechos.
+    """
+    linea = linea.strip()
+    if not linea:
+        return None
+    if not linea.startswith("{"):
+        if "|" not in linea:
+            return None
+        origen, destino = linea.split("|", 1)
+        return {"op": numero, "estado": "hecho", "origen": origen, "destino": destino, "modo": None}
+    try:
+        return json.loads(linea)
+    except ValueError:
+        return None
+
+def leer_eventos(ruta):
+    """
+    Devuelve los eventos del registro en orden, ignorando líneas cortadas o ilegibles.
+    """
+    with open(ruta, "r", encoding="utf-8", errors="replace") as archivo:
+        for numero, linea in enumerate(archivo, start=1):
+            evento = interpretar_linea(linea, numero)
+            if evento is not None:
+                yield evento
+
+def leer_lineas_en_reversa(ruta, bloque=1024 * 1024):
+    """
+    Devuelve las líneas del archivo desde la última hasta la primera, leyendo de a bloques
+    desde el final, sin cargar el archivo entero.
+    """
+    with open(ruta, "rb") as archivo:
+        posicion = archivo.seek(0, os.SEEK_END)
+        resto = b""
+        while posicion > 0:
+            cantidad = min(bloque, posicion)
+            posicion -= cantidad
+            archivo.seek(posicion)
+            lineas = (archivo.read(cantidad) + resto).split(b"\n")
+            resto = lineas.pop(0) # Puede ser el final de una línea que empieza en el bloque anterior.
+            for linea in reversed(lineas):
+                yield linea.decode("utf-8", errors="replace")
+        if resto:
+            yield resto.decode("utf-8", errors="replace")
+
+def leer_operaciones_en_reversa(ruta):
+    """
+    Como leer_operaciones, pero devuelve las operaciones una por una desde la última.
+    Sólo se guardan en memoria los resultados cuya intención todavía no apareció,
+    que son a lo sumo los de un lote de movimientos.
+    """
+    resultados = {}
+    for linea in leer_lineas_en_reversa(ruta):
+        evento = interpretar_linea(linea)
+        if evento is None:
+            continue
+        if "origen" in evento:
+            if evento.get("estado") == "intencion":
+                evento["estado"] = resultados.pop(evento.get("op"), "intencion")
+            yield evento
+        else:
+            resultados[evento.get("op")] = evento.get("estado")
+
+def leer_operaciones(ruta):
+    """
+    Junta los eventos de cada operación: devuelve {op: datos de la intención + "estado" final}
+    en el orden en que se registraron. Una intención sin resultado queda con estado "intencion".
+    """
+    operaciones = {}
+    for evento in leer_eventos(ruta):
+        op = evento.get("op")
+        if evento.get("estado") == "intencion" or (op not in operaciones and "origen" in evento):
+            operaciones[op] = evento
+        elif op in operaciones:
+            operaciones[op]["estado"] = evento["estado"]
+    return operaciones
+
+# FIN - Registro de operaciones.
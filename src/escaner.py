@@ -0,0 +1,111 @@
+import os
+from config import registrar_error
+
+"""
+Recorrido único de las carpetas de origen para todos los tipos de archivo.
+Usa os.scandir, clasifica cada archivo por su extensión con una búsqueda en un diccionario
+y guarda el stat de cada DirEntry para que la caché y el prefiltro no vuelvan a pedirlo.
+"""
+
+_stats = {}
+
+# INICIO - Stats.
+def obtener_stat(ruta):
+    """
+    Devuelve el stat obtenido durante el último escaneo, o lo pide al sistema si no se escaneó.
+    """
+    stat = _stats.get(ruta)
+    return stat if stat is not None else os.stat(ruta)
+
+def recordar_stat(ruta, stat): # Guarda un stat ya conocido (por ejemplo, de una instantánea anterior).
+    _stats[ruta] = stat
+
+def stat_de_entrada(entrada):
+    """
+    Stat de un DirEntry sin otra llamada al sistema cuando se puede. En Windows DirEntry.stat()
+    devuelve st_ino y st_dev en 0, y la caché, la poda y el motor de movimiento los usan: ahí se pide con os.stat.
+    """
+    stat = entrada.stat()
+    return stat if stat.st_ino and stat.st_dev else os.stat(entrada.path)
+
+def olvidar_stat(ruta=None): # Descarta el stat guardado de una ruta, o de todas.
+    if ruta is None:
+        _stats.clear()
+    else:
+        _stats.pop(ruta, None)
+
+# FIN - Stats.
+
+# INICIO - Escaneo.
+def _dentro_de(ruta, carpeta): # True si "ruta" está dentro de "carpeta" (sin ser la misma).
+    try:
+        return ruta != carpeta and os.path.commonpath([ruta, carpeta]) == carpeta
+    except ValueError:  # Unidades distintas en Windows.
+        return False
+
+def normalizar_raices(raices):
+    """
+    Quita las carpetas repetidas y las que están dentro de otra carpeta de la lista (comparando
+    rutas reales), para no recorrer dos veces el mismo árbol. Conserva el orden y la forma en que se escribieron.
+    """
+    if isinstance(raices, str):
+        raices = [raices]
+    reales = {}
+    for raiz in raices:
+        reales.setdefault(os.path.realpath(raiz), raiz)
+    return [raiz for real, raiz in reales.items() if not any(_dentro_de(real, otra) for otra in reales)]
+
+def recorrer(raices, tipos, excluir=(), olvidar=True):
+    """
+    Recorre una sola vez todas las carpetas de "raices" y va devolviendo (ruta, [tipos]) por cada archivo
+    cuya extensión está en algún tipo de "tipos" ({tipo: extensiones}), en el orden de os.walk.
+    Las carpetas de "excluir" (y su contenido) se saltan, por ejemplo la carpeta de destino.
+    Con "olvidar" en False no se descartan los stats del escaneo anterior.
+    """
+    por_extension = {}
+    for tipo, extensiones in tipos.items():
+        for extension in extensiones:
+            por_extension.setdefault(extension.lower(), []).append(tipo)
+
+    excluidas = {os.path.realpath(carpeta) for carpeta in excluir}
+    if olvidar:
+        olvidar_stat()
+    pendientes = list(reversed(normalizar_raices(raices)))
+
+    while pendientes:
+        carpeta = pendientes.pop()
+        subcarpetas = []
+        encontrados = []
+        try:
+            with os.scandir(carpeta) as entradas:
+                for entrada in entradas:
+                    try:
+                        if entrada.is_dir(follow_symlinks=False):
+                            if not excluidas or os.path.realpath(entrada.path) not in excluidas:
+                                subcarpetas.append(entrada.path)
+                            continue
+                        tipos_archivo = por_extension.get(os.path.splitext(entrada.name)[1].lower())
+                        if tipos_archivo and entrada.is_file():
+                            _stats[entrada.path] = stat_de_entrada(entrada)
+                            encontrados.append((entrada.path, tipos_archivo))
+                    except OSError as e:
+                        registrar_error(entrada.path, f"Error al leer entrada: {e}", consola=False)
+        except OSError as e:
+            registrar_error(carpeta, f"Error al recorrer carpeta: {e}", consola=False)
+            continue
+        pendientes.extend(reversed(subcarpetas))  # Mismo orden que os.walk: primero en profundidad.
+        yield from encontrados  # Se entregan con la carpeta ya cerrada, por si el consumidor mueve archivos.
+
+def escanear(raices, tipos, excluir=()):
+    """
+    Recorre una sola vez todas las carpetas de "raices" y clasifica cada archivo en todos los tipos
+    de "tipos" ({tipo: extensiones}) que incluyan su extensión.
+    Devuelve {tipo: [rutas]} con los tipos pedidos, en el orden en que se encontraron los archivos.
+    """
+    archivos = {tipo: [] for tipo in tipos}
+    for ruta, tipos_archivo in recorrer(raices, tipos, excluir):
+        for tipo in tipos_archivo:
+            archivos[tipo].append(ruta)
+    return archivos
+
+# FIN - Escaneo.
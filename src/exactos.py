@@ -0,0 +1,374 @@
+import os
+import cache
+import metricas
+from tqdm import tqdm
+from colorama import Fore, Style, init
+from escaner import obtener_stat
+from contenedores import Carga, Huella, EXTENSIONES_ZIP, enmascarar_ogg, actualizar_con_ogg, leer_directorio_zip
+from motor_hash import nuevo_hash, actualizar_con_archivo, SUFIJO_CARGA
+from paralelo import mapear_en_paralelo
+from config import registrar_error, ALGORITMO_HASH, ALGORITMO_PARCIAL
+
+init(autoreset=True)
+
+TAMANO_BLOQUE_PARCIAL = 64 * 1024 # Bytes leídos al inicio y al final de cada archivo en el hash parcial.
+TAMANO_LOTE_HILOS = 4 # Archivos por tarea en el pool de hilos; lotes chicos para no frenar la tubería.
+TIPO_CACHE_UBICACION = "ubicacion_contenedor" # Carga o huella de cada archivo (ver contenedores.py).
+_UBICACIONES = {forma.__name__: forma for forma in (Carga, Huella)}
+
+# INICIO - Utilidades.
+def formatear_bytes(cantidad): # Convierte una cantidad de bytes a una cadena legible.
+    if cantidad < 1024:
+        return f"{cantidad} B"
+    for unidad in ("KB", "MB", "GB"):
+        cantidad /= 1024
+        if cantidad < 1024:
+            return f"{cantidad:.1f} {unidad}"
+    return f"{cantidad / 1024:.1f} TB"
+
+def nuevo_reporte(): # Contadores vacíos de cada nivel del prefiltro.
+    return {
+        nivel: {"descartados": 0, "bytes_leidos": 0, "bytes_evitados": 0}
+        for nivel in ("Tamaño", "Hash parcial", "Hash completo")
+    }
+
+def imprimir_reporte_niveles(reporte):
+    """
+    Muestra en consola cuántos archivos descartó cada nivel y cuántos bytes evitó leer.
+    """
+    print(Fore.LIGHTCYAN_EX + "Resumen del prefiltro:" + Style.RESET_ALL)
+    for nivel, datos in reporte.items():
+        print(Fore.LIGHTCYAN_EX + f"  {nivel}: {datos['descartados']} descartados, "
+              f"{formatear_bytes(datos['bytes_leidos'])} leídos, "
+              f"{formatear_bytes(datos['bytes_evitados'])} evitados" + Style.RESET_ALL)
+
+# FIN - Utilidades.
+
+# INICIO - Prefiltro por niveles.
+def calcular_hash_parcial(ruta, tamano, bloque=TAMANO_BLOQUE_PARCIAL, algoritmo=ALGORITMO_PARCIAL, carga=None):
+    """
+    Calcula un hash del bloque inicial y el bloque final del archivo, o de su "carga" si se indica
+    (en ese caso "tamano" es el largo de la carga).
+    Si el archivo cabe en ambos bloques se lee entero, y con el mismo algoritmo el resultado coincide con el hash completo.
+    En los ZIP más grandes se hashea el directorio central, que está al final y tiene el CRC-32 de cada
+    archivo interno, con una lectura chica en lugar de dos bloques.
+    Devuelve el hash y los bytes leídos (0 si se obtuvo de la caché).
+    """
+    es_zip = carga is None and tamano > 2 * bloque and os.path.splitext(ruta)[1].lower() in EXTENSIONES_ZIP
+    tipo = f"{algoritmo}_parcial_{bloque}" + (SUFIJO_CARGA if carga is not None else "_zip" if es_zip else "")
+    stat = obtener_stat(ruta)
+    guardado = cache.obtener(ruta, tipo, stat)
+    if guardado:
+        return guardado, 0
+
+    inicio = 0 if carga is None else carga.inicio
+    hash_parcial = nuevo_hash(algoritmo)
+    with metricas.medir("hash.parcial"), open(ruta, "rb", buffering=0) as f:
+        directorio = leer_directorio_zip(f, tamano, 2 * bloque) if es_zip else None
+        f.seek(inicio)
+        if directorio is not None:
+            hash_parcial.update(directorio[0])
+            leidos = len(directorio[0])
+        elif carga is not None and carga.ogg:
+            leidos = _hash_parcial_ogg(hash_parcial, f, inicio, tamano, bloque)
+        elif tamano <= 2 * bloque:
+            leidos = actualizar_con_archivo(hash_parcial, f, tamano)
+        else:
+            leidos = actualizar_con_archivo(hash_parcial, f, bloque)
+            f.seek(inicio + tamano - bloque)
+            leidos += actualizar_con_archivo(hash_parcial, f, bloque)
+    metricas.sumar("hash.bytes_leidos_parcial", leidos)
+    cache.guardar(ruta, tipo, hash_parcial.hexdigest(), stat)
+    return hash_parcial.hexdigest(), leidos
+
+def _hash_parcial_ogg(hash_parcial, f, inicio, largo, bloque):
+    """
+    Como el hash parcial, pero con las páginas Ogg enmascaradas: el bloque inicial empieza en una página
+    y el final se enmascara desde la primera página que aparece en él.
+    """
+    if largo <= 2 * bloque:
+        return actualizar_con_ogg(hash_parcial, f, largo)
+    datos = bytearray(f.read(bloque))
+    enmascarar_ogg(datos)
+    hash_parcial.update(datos)
+    f.seek(inicio + largo - bloque)
+    final = bytearray(f.read(bloque))
+    pagina = final.find(b"OggS")
+    if pagina >= 0:
+        enmascarar_ogg(final, pagina)
+    hash_parcial.update(final)
+    return len(datos) + len(final)
+
+def parcial_es_completo(tamano, bloque=TAMANO_BLOQUE_PARCIAL, algoritmo=ALGORITMO_PARCIAL, tipo_cache=ALGORITMO_HASH):
+    """
+    True si el hash parcial del archivo ya es su hash completo: se leyó entero y con el mismo algoritmo.
+    """
+    return tamano <= 2 * bloque and algoritmo == tipo_cache
+
+def hash_parcial_o_error(ruta, tamano, bloque=TAMANO_BLOQUE_PARCIAL, carga=None): # Como calcular_hash_parcial, pero registra el error y devuelve None.
+    if isinstance(carga, Huella):
+        return carga.valor, 0 # La huella ya identifica el contenido: no hay nada más que leer.
+    try:
+        return calcular_hash_parcial(ruta, tamano, bloque, carga=carga)
+    except Exception as e:
+        registrar_error(ruta, f"Error al calcular hash parcial: {e}")
+        return None
+
+def ubicar_con_cache(ruta, ubicar):
+    """
+    Devuelve la Carga o la Huella de "ruta" según "ubicar" (contenedores.ubicar_carga o contenedores.huella_zip),
+    guardada en la caché para no volver a leer las cabeceras; None si se compara el archivo entero.
+    Los errores de lectura se propagan.
+    """
+    stat = obtener_stat(ruta)
+    guardado = cache.obtener(ruta, TIPO_CACHE_UBICACION, stat)
+    if guardado is None:
+        ubicacion = ubicar(ruta, stat.st_size)
+        guardado = {type(ubicacion).__name__: list(ubicacion)} if ubicacion else {}
+        if isinstance(ubicacion, Carga):
+            metricas.sumar("contenedores.bytes_omitidos", stat.st_size - ubicacion.largo)
+        cache.guardar(ruta, TIPO_CACHE_UBICACION, guardado, stat)
+    for forma, campos in guardado.items():
+        return _UBICACIONES[forma](*campos)
+    return None
+
+def tamano_comparable(ruta, ubicar=None):
+    """
+    Devuelve el tamaño con el que se agrupa el archivo y su Carga o Huella (o None) según "ubicar":
+    el largo de la carga, o la suma de los tamaños sin comprimir de la huella.
+    """
+    if ubicar is not None:
+        carga = ubicar_con_cache(ruta, ubicar)
+        if carga is not None:
+            return carga.largo, carga
+    return obtener_stat(ruta).st_size, None
+
+def tipo_cache_de(tipo_cache, carga): # Tipo de caché del hash completo de un archivo, o sólo de su carga.
+    return tipo_cache if carga is None else tipo_cache + SUFIJO_CARGA
+
+def hash_completo_con_cache(ruta, calcular_hash, tipo_cache=ALGORITMO_HASH):
+    """
+    Devuelve el hash completo y si hubo que leer el archivo (False si salió de la caché).
+    El hash es None si "calcular_hash" falló.
+    """
+    guardado = cache.obtener(ruta, tipo_cache, obtener_stat(ruta))
+    if guardado:
+        return guardado, False
+    return calcular_hash(ruta), True
+
+def mapear(funcion, elementos, hilos=1):
+    """
+    Aplica "funcion" a cada elemento en orden; con más de un hilo las lecturas se solapan en un pool
+    de hilos (hashlib libera el GIL), útil en discos de red o USB donde manda la latencia.
+    """
+    if hilos <= 1:
+        return map(funcion, elementos)
+    return mapear_en_paralelo(funcion, elementos, hilos, tamano_lote=TAMANO_LOTE_HILOS, hilos=True)
+
+def agrupar(claves): # Devuelve sólo los grupos de rutas con más de un elemento, respetando el orden original.
+    grupos = {}
+    for ruta, clave in claves.items():
+        grupos.setdefault(clave, []).append(ruta)
+    return {clave: rutas for clave, rutas in grupos.items() if len(rutas) > 1}
+
+def buscar_duplicados_exactos(archivos, calcular_hash, bloque=TAMANO_BLOQUE_PARCIAL, tipo_cache=ALGORITMO_HASH, hilos=1,
+                              ubicar=None):
+    """
+    Busca copias exactas en tres niveles para no leer archivos que no pueden tener duplicado:
+    1. Agrupa por (tamaño, extensión).
+    2. Calcula el hash parcial (inicio y final) de los archivos que comparten grupo.
+    3. Calcula el hash completo con "calcular_hash" sólo en los que siguen coincidiendo.
+    Devuelve los duplicados con la misma forma que antes, {(hash, extension): [rutas]},
+    y un reporte con los archivos descartados y los bytes evitados por cada nivel.
+    "tipo_cache" es el tipo con el que "calcular_hash" guarda sus resultados en la caché.
+    Con "hilos" mayor a 1 los hashes de cada nivel se calculan en un pool de hilos, con el mismo resultado.
+    Con "ubicar" (ver ubicar_con_cache) se compara sólo la carga de cada archivo: los tres niveles usan
+    su largo y sus bytes, y "calcular_hash" debe hashear la misma región. Si devuelve una Huella, los
+    archivos se agrupan por la suma de sus tamaños sin comprimir y la huella reemplaza a los dos hashes.
+    """
+    reporte = nuevo_reporte()
+
+    # Nivel 1 - Tamaño y extensión.
+    tamanos = {}
+    cargas = {}
+    for ruta in archivos:
+        try:
+            tamanos[ruta], cargas[ruta] = tamano_comparable(ruta, ubicar)
+        except OSError as e:
+            registrar_error(ruta, f"Error al obtener tamaño: {e}")
+
+    grupos = agrupar({ruta: (tamano, os.path.splitext(ruta)[1]) for ruta, tamano in tamanos.items()})
+    candidatos = {ruta for rutas in grupos.values() for ruta in rutas}
+    for ruta, tamano in tamanos.items():
+        if ruta not in candidatos:
+            reporte["Tamaño"]["descartados"] += 1
+            reporte["Tamaño"]["bytes_evitados"] += tamano
+
+    # Nivel 2 - Hash parcial.
+    parciales = {}
+    completos = {}
+    pendientes = [ruta for ruta in tamanos if ruta in candidatos]
+    resultados = mapear(lambda ruta: hash_parcial_o_error(ruta, tamanos[ruta], bloque, cargas[ruta]), pendientes, hilos)
+    for ruta, resultado in tqdm(zip(pendientes, resultados), total=len(pendientes), desc="Calculando hashes parciales"):
+        if resultado is None:
+            continue
+        parcial, leidos = resultado
+        reporte["Hash parcial"]["bytes_leidos"] += leidos
+        parciales[ruta] = (tamanos[ruta], os.path.splitext(ruta)[1], parcial)
+        if isinstance(cargas[ruta], Huella) or parcial_es_completo(tamanos[ruta], bloque, tipo_cache=tipo_cache):
+            completos[ruta] = parcial # El archivo se leyó entero (o es una huella), el hash parcial ya es el completo.
+
+    grupos = agrupar(parciales)
+    candidatos = {ruta for rutas in grupos.values() for ruta in rutas}
+    for ruta in parciales:
+        if ruta not in candidatos:
+            reporte["Hash parcial"]["descartados"] += 1
+            reporte["Hash parcial"]["bytes_evitados"] += tamanos[ruta] - min(tamanos[ruta], 2 * bloque)
+
+    # Nivel 3 - Hash completo.
+    for ruta in completos:
+        if ruta in candidatos:
+            reporte["Hash completo"]["bytes_evitados"] += tamanos[ruta]
+    pendientes = [ruta for ruta in parciales if ruta in candidatos and ruta not in completos]
+    resultados = mapear(lambda ruta: hash_completo_con_cache(ruta, calcular_hash, tipo_cache_de(tipo_cache, cargas[ruta])),
+                        pendientes, hilos)
+    for ruta, (hash_completo, leido) in tqdm(zip(pendientes, resultados), total=len(pendientes), desc="Calculando hashes"):
+        if hash_completo:
+            completos[ruta] = hash_completo
+            reporte["Hash completo"]["bytes_leidos" if leido else "bytes_evitados"] += tamanos[ruta]
+
+    duplicados = agrupar({
+        ruta: (completos[ruta], os.path.splitext(ruta)[1])
+        for ruta in parciales if ruta in candidatos and ruta in completos
+    })
+    confirmados = {ruta for rutas in duplicados.values() for ruta in rutas}
+    reporte["Hash completo"]["descartados"] = sum(1 for ruta in completos if ruta in candidatos and ruta not in confirmados)
+
+    return duplicados, reporte
+
+# FIN - Prefiltro por niveles.
+
+# INICIO - Prefiltro incremental.
+class PrefiltroIncremental:
+    """
+    Versión incremental de buscar_duplicados_exactos para usar mientras se recorren las carpetas.
+    Cada archivo queda en espera en su grupo de (tipo, tamaño, extensión) hasta que aparece otro igual;
+    recién entonces se calculan los hashes de ambos, y lo mismo con el hash parcial.
+    Como se conserva el primer archivo encontrado de cada grupo, un duplicado es definitivo apenas su
+    hash completo coincide con uno anterior, así que se puede mover sin esperar al resto del recorrido.
+    La excepción son los archivos nuevos (recorrido incremental): si uno que ya estaba aparece después
+    de una copia nueva, pasa a ser el original y se mueve la copia nueva.
+    "funciones_hash" es {tipo: calcular_hash}; cada tipo tiene sus grupos y su reporte.
+    "cargas" es {tipo: ubicar} para los tipos que se comparan por su carga o su huella (ver buscar_duplicados_exactos).
+    """
+
+    def __init__(self, funciones_hash, bloque=TAMANO_BLOQUE_PARCIAL, tipo_cache=ALGORITMO_HASH, hilos=1, cargas=None):
+        self.funciones_hash = funciones_hash
+        self.bloque = bloque
+        self.tipo_cache = tipo_cache
+        self.hilos = hilos
+        self.cargas = cargas or {}
+        self.reportes = {tipo: nuevo_reporte() for tipo in funciones_hash}
+        self._tamanos = {}    # (tipo, tamaño, extensión) -> (tipo, ruta, tamaño, carga) en espera, o None si el grupo ya se activó.
+        self._parciales = {}  # (tipo, tamaño, extensión, hash parcial) -> (tipo, ruta, tamaño, carga, parcial) en espera, o None.
+        self._originales = {} # (tipo, hash, extensión) -> [ruta original, True si ya tuvo algún duplicado, si es nuevo].
+
+    def _activar(self, grupos, clave, elemento):
+        """
+        Devuelve los elementos del grupo que pasan al siguiente nivel: ninguno si es el primero
+        (queda en espera), el que esperaba más el nuevo si es el segundo, y sólo el nuevo después.
+        """
+        if clave not in grupos:
+            grupos[clave] = elemento
+            return []
+        en_espera = grupos[clave]
+        grupos[clave] = None
+        return [en_espera, elemento] if en_espera else [elemento]
+
+    def procesar(self, entradas):
+        """
+        Recibe (tipo, ruta, nuevo) a medida que se encuentran y devuelve (tipo, original, duplicado, hash)
+        apenas cada duplicado queda confirmado. Los niveles se encadenan con generadores y,
+        con más de un hilo, los hashes de cada nivel se calculan en un pool sin alterar el orden.
+        Si hay tipos con "cargas", sus cabeceras también se leen en el pool.
+        """
+        ubicados = mapear(self._ubicar, entradas, self.hilos if self.cargas else 1)
+        candidatos = (elemento for ubicado in ubicados for elemento in self._nivel_tamano(ubicado))
+        parciales = mapear(self._hash_parcial, candidatos, self.hilos)
+        pendientes = (elemento for resultado in parciales for elemento in self._nivel_parcial(resultado))
+        completos = mapear(self._hash_completo, pendientes, self.hilos)
+        for resultado in completos:
+            yield from self._nivel_completo(resultado)
+
+    def _ubicar(self, entrada): # Se ejecuta en el pool de hilos si hay tipos con "cargas".
+        tipo, ruta, nuevo = entrada
+        try:
+            return (tipo, ruta) + tamano_comparable(ruta, self.cargas.get(tipo)) + (nuevo,)
+        except OSError as e:
+            registrar_error(ruta, f"Error al obtener tamaño: {e}")
+            return None
+
+    def _nivel_tamano(self, elemento):
+        if elemento is None:
+            return []
+        tipo, ruta, tamano, _, _ = elemento
+        return self._activar(self._tamanos, (tipo, tamano, os.path.splitext(ruta)[1]), elemento)
+
+    def _hash_parcial(self, elemento): # Se ejecuta en el pool de hilos.
+        _, ruta, tamano, carga, _ = elemento
+        return elemento, hash_parcial_o_error(ruta, tamano, self.bloque, carga)
+
+    def _nivel_parcial(self, resultado):
+        (tipo, ruta, tamano, carga, nuevo), hash_parcial = resultado
+        if hash_parcial is None:
+            return []
+        parcial, leidos = hash_parcial
+        self.reportes[tipo]["Hash parcial"]["bytes_leidos"] += leidos
+        clave = (tipo, tamano, os.path.splitext(ruta)[1], parcial)
+        return self._activar(self._parciales, clave, (tipo, ruta, tamano, carga, nuevo, parcial))
+
+    def _hash_completo(self, elemento): # Se ejecuta en el pool de hilos.
+        tipo, ruta, tamano, carga, _, parcial = elemento
+        if isinstance(carga, Huella) or parcial_es_completo(tamano, self.bloque, tipo_cache=self.tipo_cache):
+            return elemento, parcial, False # El archivo (o su carga) se leyó entero, o es una huella: el parcial ya es el completo.
+        return (elemento,) + hash_completo_con_cache(ruta, self.funciones_hash[tipo], tipo_cache_de(self.tipo_cache, carga))
+
+    def _nivel_completo(self, resultado):
+        (tipo, ruta, tamano, _, nuevo, _), hash_completo, leido = resultado
+        if not hash_completo:
+            return []
+        self.reportes[tipo]["Hash completo"]["bytes_leidos" if leido else "bytes_evitados"] += tamano
+
+        clave = (tipo, hash_completo, os.path.splitext(ruta)[1])
+        original = self._originales.get(clave)
+        if original is None:
+            self._originales[clave] = [ruta, False, nuevo]
+            return []
+        original[1] = True
+        if original[2] and not nuevo: # Se conserva el que ya estaba y se mueve la copia nueva.
+            duplicado = original[0]
+            original[0], original[2] = ruta, False
+            return [(tipo, ruta, duplicado, hash_completo)]
+        return [(tipo, original[0], ruta, hash_completo)]
+
+    def finalizar(self):
+        """
+        Cuenta los archivos que quedaron sin pareja en cada nivel y devuelve {tipo: reporte},
+        con la misma forma que el de buscar_duplicados_exactos.
+        """
+        for en_espera in self._tamanos.values():
+            if en_espera:
+                tipo, _, tamano, _, _ = en_espera
+                self.reportes[tipo]["Tamaño"]["descartados"] += 1
+                self.reportes[tipo]["Tamaño"]["bytes_evitados"] += tamano
+        for en_espera in self._parciales.values():
+            if en_espera:
+                tipo, _, tamano, _, _, _ = en_espera
+                self.reportes[tipo]["Hash parcial"]["descartados"] += 1
+                self.reportes[tipo]["Hash parcial"]["bytes_evitados"] += tamano - min(tamano, 2 * self.bloque)
+        for (tipo, _, _), (_, con_duplicados, _) in self._originales.items():
+            if not con_duplicados:
+                self.reportes[tipo]["Hash completo"]["descartados"] += 1
+        return self.reportes
+
+# FIN - Prefiltro incremental.
@@ -1,180 +1,352 @@
 import os
-import time
-import shutil
+import base64
+import cache
+import metricas
 import imagehash
+import numpy as np
 from tqdm import tqdm
 from PIL import Image, ImageFile
-from collections import defaultdict
-
-# Registros de errores y operaciones.
-LOG_ERRORES = "log_errores.txt"
-LOG_OPERACIONES = "log_ultima_operacion.txt"
+from functools import partial
+from collections import defaultdict, namedtuple
+from indice import agrupar_vectorizado
+from paralelo import mapear_en_paralelo
+from escaner import escanear, obtener_stat
+from mover import MotorMovimiento
+from config import registrar_error, UMBRAL_SSIM, UMBRAL_HISTOGRAMA
 
 EXTENSIONES_IMAGENES = [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".webp", ".svg"]
 
+TAMANO_LOTE_IMAGENES = 16 # Imágenes enviadas juntas a cada trabajador del pool.
+LADO_DECODIFICACION_REDUCIDA = 256 # Lado menor mínimo al decodificar a escala reducida.
+# Modos que Image.reduce() acepta; el resto (paleta, 1 bit, 16 bits) se pasa a RGB antes de reducir.
+MODOS_REDUCIBLES = {"L", "LA", "La", "RGB", "RGBA", "RGBa", "RGBX", "CMYK", "YCbCr", "I", "F"}
+LADO_MINIATURA = 16 # Miniatura RGB para verificar los grupos (768 bytes por imagen), sólo si se verifica.
+VENTANA_SSIM = 4 # Lado de las ventanas (sin solapamiento) del SSIM sobre la miniatura en grises.
+BINS_HISTOGRAMA = 8 # Bins por canal del histograma de color.
+
 ImageFile.LOAD_TRUNCATED_IMAGES = True # Permitir la carga de imágenes truncadas.
 
-# INICIO - Registro de errores y función deshacer.
-def registrar_error(ruta, mensaje):
+# Datos de cada imagen obtenidos al calcular sus hashes, reutilizados al agrupar y al elegir la mejor copia.
+# "miniatura" son los bytes RGB de LADO_MINIATURA x LADO_MINIATURA, o None si no se pidió o no estaba en la caché.
+RegistroImagen = namedtuple("RegistroImagen", ["ruta", "ancho", "alto", "tamano", "modo", "formato", "hashes", "miniatura"])
+
+
+# INICIO - Hashes.
+def decodificar_reducida(img, lado=LADO_DECODIFICACION_REDUCIDA):
     """
-    Registra un error en el archivo de errores.
+    Reduce la imagen antes de decodificarla completa: en JPEG usa el escalado DCT de draft()
+    y en el resto reduce() por un factor entero. El lado menor nunca queda por debajo de "lado",
+    que sigue siendo mayor que las grillas de 8x8 a 32x32 que usan los hashes.
     """
-    with open(LOG_ERRORES, "a", encoding="utf-8") as log:
-        log.write(f"{ruta}: {mensaje}\n")
+    img.draft("RGB", (lado, lado))
+    factor = min(img.size) // lado
+    if factor >= 2:
+        if img.mode not in MODOS_REDUCIBLES:
+            img = img.convert("RGB") # Igual se convierte a RGB antes de calcular los hashes.
+        img = img.reduce(factor)
+    return img
+
+def miniatura(img): # Bytes RGB de la miniatura de una imagen ya convertida a RGB, en base64 para la caché.
+    return base64.b64encode(img.resize((LADO_MINIATURA, LADO_MINIATURA), Image.BOX).tobytes()).decode("ascii")
 
-def registrar_operacion(original, destino):
+def hashear_imagen(ruta_imagen, reducida=False, con_miniatura=False):
     """
-    Registra una operación de movimiento en el archivo de log.
+    Abre la imagen una sola vez, la verifica y calcula sus hashes perceptuales en hexadecimal.
+    Con "reducida" la imagen se decodifica a menor escala antes de calcular los hashes.
+    No usa la caché ni el registro de errores, así puede ejecutarse en otro proceso.
+    Devuelve (datos, None) o (None, mensaje de error); "datos" es un diccionario con las
+    dimensiones originales, el modo, el formato, los hashes y, con "con_miniatura", la miniatura.
     """
-    with open(LOG_OPERACIONES, "a", encoding="utf-8") as log:
-        log.write(f"{original}|{destino}\n")
+    try:
+        with metricas.medir("imagenes.decodificacion"), open(ruta_imagen, "rb") as archivo:
+            with Image.open(archivo) as img:
+                img.verify()  # Verifica si la imagen está corrupta antes de procesarla.
+            archivo.seek(0)  # verify() deja la imagen inutilizable, se vuelve a leer sin reabrir el archivo.
+            with Image.open(archivo) as img:
+                datos = {"ancho": img.width, "alto": img.height, "modo": img.mode, "formato": img.format}
+                if reducida:
+                    img = decodificar_reducida(img)
+                if img.mode != "RGB":
+                    img = img.convert("RGB")
+                hashes = (
+                    imagehash.average_hash(img),
+                    imagehash.phash(img),
+                    imagehash.dhash(img),
+                    imagehash.whash(img)
+                )
+                if con_miniatura:
+                    datos["miniatura"] = miniatura(img)
+        datos["hashes"] = [str(h) for h in hashes]
+        return datos, None
+    except Exception as e:
+        return None, f"Imagen dañada o truncada: {e}"
+
+def tipo_cache(reducida): # Los registros de cada modo de decodificación se guardan por separado.
+    return "registro_imagen_reducida" if reducida else "registro_imagen"
+
+def tipo_cache_miniatura(reducida): # Aparte de los hashes: activar la verificación no invalida los registros guardados.
+    return tipo_cache(reducida) + "_miniatura"
+
+def crear_registro(ruta_imagen, stat, datos, datos_miniatura=None): # Arma el registro a partir de los datos calculados o guardados.
+    return RegistroImagen(
+        ruta_imagen, datos["ancho"], datos["alto"], stat.st_size, datos["modo"], datos["formato"],
+        tuple(imagehash.hex_to_hash(h) for h in datos["hashes"]),
+        base64.b64decode(datos_miniatura) if datos_miniatura else None
+    )
 
-def mover_a_problematicos(ruta, carpeta_destino):
+def miniatura_guardada(ruta_imagen, stat, reducida, datos):
     """
-    Mueve el archivo que genera el error a una subcarpeta.
+    Miniatura en base64 de la caché, o None. Los registros de versiones anteriores la guardaban junto a los hashes.
     """
-    carpeta_problematicos = os.path.join(carpeta_destino, "problematicos")
-    os.makedirs(carpeta_problematicos, exist_ok=True)
-    destino = os.path.join(carpeta_problematicos, os.path.basename(ruta))
-    shutil.move(ruta, destino)
+    return cache.obtener(ruta_imagen, tipo_cache_miniatura(reducida), stat) or datos.get("miniatura")
 
-# FIN - Registro de errores y función deshacer.
+def registrar_resultado(ruta_imagen, stat, reducida, datos, error):
+    """
+    Registra el error o guarda los datos (y la miniatura, si se calculó) en la caché, y devuelve el registro de la imagen.
+    """
+    if error:
+        registrar_error(ruta_imagen, error, consola=False)
+        return None
+    datos_miniatura = datos.pop("miniatura", None)
+    cache.guardar(ruta_imagen, tipo_cache(reducida), datos, stat)
+    if datos_miniatura:
+        cache.guardar(ruta_imagen, tipo_cache_miniatura(reducida), datos_miniatura, stat)
+    return crear_registro(ruta_imagen, stat, datos, datos_miniatura)
 
-# INICIO - Hashes.
-def calcular_varios_hashes(ruta_imagen):
+def calcular_varios_hashes(ruta_imagen, reducida=False, con_miniatura=False):
     """
     Calcula múltiples hashes perceptuales para una imagen.
+    Devuelve un RegistroImagen con los hashes y los datos necesarios para elegir la mejor copia;
+    con "con_miniatura", también la miniatura para verificar los grupos.
     """
     try:
-        with Image.open(ruta_imagen) as img:
-            img.verify()  # Verifica si la imagen está corrupta antes de procesarla.
-        with Image.open(ruta_imagen) as img:  # Reabrir después de verificar.
-            if img.mode != "RGB":
-                img = img.convert("RGB")
-            return (
-                imagehash.average_hash(img),
-                imagehash.phash(img),
-                imagehash.dhash(img),
-                imagehash.whash(img)
-            )
-    except Exception as e:
-        registrar_error(ruta_imagen, f"Imagen dañada o truncada: {e}")
+        stat = obtener_stat(ruta_imagen)
+    except OSError as e:
+        registrar_error(ruta_imagen, f"Imagen dañada o truncada: {e}", consola=False)
         return None
 
-def calcular_hashes_imagenes(archivos, umbral_hash=3):
+    guardado = cache.obtener(ruta_imagen, tipo_cache(reducida), stat)
+    if guardado:
+        metricas.sumar("imagenes.desde_cache")
+        datos_miniatura = miniatura_guardada(ruta_imagen, stat, reducida, guardado) if con_miniatura else None
+        return crear_registro(ruta_imagen, stat, guardado, datos_miniatura)
+    with metricas.medir("imagenes.hash"):
+        metricas.sumar("imagenes.bytes_leidos", stat.st_size)
+        return registrar_resultado(ruta_imagen, stat, reducida, *hashear_imagen(ruta_imagen, reducida, con_miniatura))
+
+def iterar_hashes(archivos, trabajadores=1, reducida=False, con_miniatura=False):
+    """
+    Genera el RegistroImagen de cada archivo (o None si falló) en el mismo orden que "archivos".
+    Con más de un trabajador, las imágenes que no están en la caché se decodifican en un pool
+    de procesos; la caché y el registro de errores se siguen manejando desde este proceso.
+    Con "con_miniatura" los registros llevan la miniatura (ver verificar_grupos).
+    """
+    if trabajadores <= 1:
+        for ruta in archivos:
+            yield calcular_varios_hashes(ruta, reducida, con_miniatura)
+        return
+
+    consultas = []
+    for ruta in archivos:
+        try:
+            stat = obtener_stat(ruta)
+            consultas.append((ruta, stat, cache.obtener(ruta, tipo_cache(reducida), stat)))
+        except OSError as e:
+            registrar_error(ruta, f"Imagen dañada o truncada: {e}", consola=False)
+            consultas.append((ruta, None, None))
+
+    faltantes = [(ruta, stat) for ruta, stat, guardado in consultas if stat and not guardado]
+    if metricas.activas():
+        metricas.sumar("imagenes.desde_cache", sum(1 for _, _, guardado in consultas if guardado))
+        metricas.sumar("imagenes.bytes_leidos", sum(stat.st_size for _, stat in faltantes))
+    resultados = mapear_en_paralelo(partial(hashear_imagen, reducida=reducida, con_miniatura=con_miniatura),
+                                    (ruta for ruta, _ in faltantes), trabajadores, TAMANO_LOTE_IMAGENES)
+
+    for ruta, stat, guardado in consultas:
+        if stat is None:
+            yield None
+        elif guardado:
+            yield crear_registro(ruta, stat, guardado, miniatura_guardada(ruta, stat, reducida, guardado) if con_miniatura else None)
+        else:
+            yield registrar_resultado(ruta, stat, reducida, *next(resultados))
+
+def empaquetar_hashes(hashes_varios):
+    """
+    Convierte cada hash en un entero para compararlos con operaciones de bits.
+    """
+    return tuple(int(str(h), 16) for h in hashes_varios)
+
+def calcular_hashes_imagenes(archivos, umbral_hash=3, trabajadores=1, reducida=False, con_miniatura=False):
     """
     Procesa las imágenes y calcula los hashes perceptuales.
-    Agrupa hashes similares según el umbral proporcionado.
+    Agrupa hashes similares según el umbral proporcionado, todos juntos con NumPy (ver indice.agrupar_vectorizado):
+    los grupos no dependen del orden de los archivos y una imagen se une a todas las que se le parecen.
+    Devuelve {hashes: [RegistroImagen]}.
     """
+    def procesar():
+        registros = iterar_hashes(archivos, trabajadores, reducida, con_miniatura)
+        for registro in tqdm(registros, total=len(archivos), desc="Procesando imágenes"):
+            if registro:
+                yield registro, empaquetar_hashes(registro.hashes)
+
     hashes = defaultdict(list)
-    for ruta in tqdm(archivos, desc="Procesando imágenes"):
-        hashes_varios = calcular_varios_hashes(ruta)
-        if hashes_varios:
-            encontrado = False
-            for key in hashes:
-                if son_duplicados(hashes_varios, key, umbral_hash):
-                    hashes[key].append(ruta)
-                    encontrado = True
-                    break
-            if not encontrado:
-                hashes[hashes_varios] = [ruta]
+    for _, miembros in agrupar_vectorizado(procesar(), umbral_hash):
+        hashes[miembros[0].hashes] = miembros
     return hashes
 
-def son_duplicados(hashes1, hashes2, umbral=3):
+# FIN - Hashes.
+
+# INICIO - Análisis y procesamiento.
+def obtener_archivos_imagenes(carpeta, extensiones=EXTENSIONES_IMAGENES):
     """
-    Determina si dos imágenes son duplicados comparando múltiples hashes.
+    Busca imágenes válidas en una o más carpetas y subcarpetas.
     """
-    return all(abs(h1 - h2) <= umbral for h1, h2 in zip(hashes1, hashes2))
+    return escanear(carpeta, {"Imagenes": extensiones})["Imagenes"]
 
-# FIN - Hashes.
+def calidad(registro): # Resolución y, a igual resolución, tamaño del archivo.
+    return registro.ancho * registro.alto, registro.tamano
 
-# INICIO - Análisis y procesamiento.
-def obtener_archivos_imagenes(carpeta):
+def seleccionar_mejor_calidad(grupo_imagenes):
     """
-    Busca imágenes válidas en una carpeta y subcarpetas.
+    Selecciona la imagen de mejor calidad (mayor resolución o tamaño) usando los datos
+    ya guardados en cada RegistroImagen, sin volver a abrir los archivos.
     """
-    archivos = []
-    for root, _, files in os.walk(carpeta):
-        for file in files:
-            if file.lower().endswith(tuple(EXTENSIONES_IMAGENES)):
-                archivos.append(os.path.join(root, file))
-    return archivos
+    return max(grupo_imagenes, key=calidad)
+
+# FIN - Análisis y procesamiento.
+
+# INICIO - Verificación.
+def _arreglo_miniaturas(miniaturas): # [bytes] -> arreglo (k, lado, lado, 3) uint8.
+    return np.frombuffer(b"".join(miniaturas), dtype=np.uint8).reshape(-1, LADO_MINIATURA, LADO_MINIATURA, 3)
 
-def comparar_por_histograma(img1_path, img2_path, umbral=0.9):
+def _histogramas(miniaturas):
     """
-    Compara dos imágenes por su histograma para determinar similitud.
+    Histograma de color de cada miniatura, con BINS_HISTOGRAMA bins por canal, normalizado para que sume 1.
     """
-    try:
-        with Image.open(img1_path) as img1, Image.open(img2_path) as img2:
-            hist1 = img1.histogram()
-            hist2 = img2.histogram()
-            similitud = sum(1 - abs(h1 - h2) / max(h1, h2) for h1, h2 in zip(hist1, hist2)) / len(hist1)
-            return similitud >= umbral
-    except Exception as e:
-        registrar_error(img1_path, f"Error al comparar histogramas: {e}")
-        return False
+    cantidad = len(miniaturas)
+    bins = (miniaturas // (256 // BINS_HISTOGRAMA)).astype(np.int64) + np.arange(3) * BINS_HISTOGRAMA
+    bins = bins.reshape(cantidad, -1) + (np.arange(cantidad) * 3 * BINS_HISTOGRAMA)[:, None]
+    conteos = np.bincount(bins.ravel(), minlength=cantidad * 3 * BINS_HISTOGRAMA).reshape(cantidad, -1)
+    return conteos / (LADO_MINIATURA * LADO_MINIATURA * 3)
 
-def seleccionar_mejor_calidad(grupo_imagenes):
+def comparar_por_histograma(miniatura, otras, umbral=UMBRAL_HISTOGRAMA):
     """
-    Selecciona la imagen de mejor calidad (mayor resolución o tamaño).
+    Compara el histograma de color de "miniatura" (1, lado, lado, 3) con el de cada una de "otras"
+    (k, lado, lado, 3) por intersección de histogramas. Devuelve un arreglo bool de k elementos.
     """
-    return max(grupo_imagenes, key=lambda img: (Image.open(img).size[0] * Image.open(img).size[1], os.path.getsize(img)))
+    histogramas = _histogramas(np.concatenate((miniatura, otras)))
+    return np.minimum(histogramas[:1], histogramas[1:]).sum(axis=1) >= umbral
 
-# FIN - Análisis y procesamiento.
+def comparar_por_ssim(miniatura, otras, umbral=UMBRAL_SSIM):
+    """
+    SSIM medio sobre ventanas de VENTANA_SSIM x VENTANA_SSIM de las miniaturas en grises:
+    compara la estructura (bordes y zonas), que el histograma no ve. Devuelve un arreglo bool como comparar_por_histograma.
+    """
+    grises = np.concatenate((miniatura, otras)).astype(np.float64) @ np.array([0.299, 0.587, 0.114])
+    por_lado = LADO_MINIATURA // VENTANA_SSIM
+    ventanas = grises.reshape(-1, por_lado, VENTANA_SSIM, por_lado, VENTANA_SSIM).transpose(0, 1, 3, 2, 4)
+    ventanas = ventanas.reshape(len(grises), por_lado * por_lado, -1)
+    medias = ventanas.mean(axis=2)
+    centradas = ventanas - medias[:, :, None]
+    varianzas = (centradas ** 2).mean(axis=2)
+    covarianzas = (centradas[:1] * centradas[1:]).mean(axis=2)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    ssim = ((2 * medias[:1] * medias[1:] + c1) * (2 * covarianzas + c2)) / (
+        (medias[:1] ** 2 + medias[1:] ** 2 + c1) * (varianzas[:1] + varianzas[1:] + c2))
+    return ssim.mean(axis=1) >= umbral
 
-def mover_archivo_con_reintento(origen, destino, intentos=3, espera=5):
+def completar_miniaturas(registros, reducida=False):
     """
-    Intenta mover un archivo con reintentos en caso de error.
+    Calcula la miniatura de los registros que no la tienen (hashes guardados en la caché sin verificación)
+    y la guarda en la caché. Devuelve los registros en el mismo orden; si la imagen no se puede abrir,
+    su miniatura queda en None.
     """
-    for intento in range(intentos):
-        try:
-            shutil.move(origen, destino)
-            return True
-        except PermissionError:
-            time.sleep(espera)
-        except Exception as e:
-            registrar_error(origen, f"Error inesperado al mover: {e}")
-            return False
-    registrar_error(origen, f"No se pudo mover tras {intentos} intentos.")
-    return False
+    completos = []
+    for registro in registros:
+        if registro.miniatura is None:
+            try:
+                with Image.open(registro.ruta) as img:
+                    if reducida:
+                        img = decodificar_reducida(img)
+                    datos_miniatura = miniatura(img.convert("RGB"))
+                cache.guardar(registro.ruta, tipo_cache_miniatura(reducida), datos_miniatura, obtener_stat(registro.ruta))
+                registro = registro._replace(miniatura=base64.b64decode(datos_miniatura))
+            except Exception as e:
+                registrar_error(registro.ruta, f"Error al calcular la miniatura: {e}", consola=False)
+        completos.append(registro)
+    return completos
+
+def verificar_grupo(grupo, umbral_ssim=UMBRAL_SSIM, umbral_histograma=UMBRAL_HISTOGRAMA):
+    """
+    Segunda etapa sobre un grupo de candidatos por hashes: la mejor copia se compara con las demás
+    por SSIM e histograma de sus miniaturas, y sólo las que pasan las dos quedan en su grupo.
+    Con las rechazadas se repite lo mismo, así un grupo puede partirse en varios.
+    Las imágenes sin miniatura no se verifican y quedan fuera de todo grupo (no se mueven).
+    Devuelve la lista de subgrupos con más de un miembro.
+    """
+    # Mismo orden que seleccionar_mejor_calidad: el primero de cada subgrupo es la copia que se conserva.
+    pendientes = sorted((registro for registro in grupo if registro.miniatura is not None), key=calidad, reverse=True)
+    subgrupos = []
+    while len(pendientes) > 1:
+        mejor, resto = pendientes[0], pendientes[1:]
+        miniatura_mejor, otras = _arreglo_miniaturas([mejor.miniatura]), _arreglo_miniaturas([r.miniatura for r in resto])
+        similares = comparar_por_histograma(miniatura_mejor, otras, umbral_histograma)
+        similares &= comparar_por_ssim(miniatura_mejor, otras, umbral_ssim)
+        metricas.sumar("imagenes.verificaciones", len(resto))
+        metricas.sumar("imagenes.verificaciones_rechazadas", int((~similares).sum()))
+        if similares.any():
+            subgrupos.append([mejor] + [registro for registro, similar in zip(resto, similares) if similar])
+        pendientes = [registro for registro, similar in zip(resto, similares) if not similar]
+    return subgrupos
+
+def verificar_grupos(duplicados, reducida=False, umbral_ssim=UMBRAL_SSIM, umbral_histograma=UMBRAL_HISTOGRAMA):
+    """
+    Aplica verificar_grupo a cada grupo de "duplicados" ({hashes: [RegistroImagen]}), usando las miniaturas
+    calculadas junto con los hashes: no se vuelve a decodificar ninguna imagen (salvo las que estaban en la caché
+    sin miniatura). Devuelve {(hashes, número de subgrupo): [RegistroImagen]}.
+    """
+    verificados = {}
+    with metricas.medir("imagenes.verificacion"):
+        for hash_, grupo in tqdm(duplicados.items(), desc="Verificando grupos"):
+            subgrupos = verificar_grupo(completar_miniaturas(grupo, reducida), umbral_ssim, umbral_histograma)
+            for numero, subgrupo in enumerate(subgrupos):
+                verificados[(hash_, numero)] = subgrupo
+    return verificados
+
+# FIN - Verificación.
 
 # INICIO - Ejecución.
-def buscar_duplicados_imagenes(carpeta_origen, extensiones, umbral_hash=3):
+def buscar_duplicados_imagenes(carpeta_origen, extensiones, umbral_hash=3, trabajadores=1, reducida=False, archivos=None,
+                               verificar=False):
     """
     Busca duplicados de imágenes en una carpeta y devuelve un diccionario
-    de duplicados donde la clave es el hash y el valor son las rutas de las imágenes.
+    de duplicados donde la clave es el hash y el valor son los registros de las imágenes.
+    Con "trabajadores" mayor a 1 los hashes se calculan en varios procesos.
+    Con "reducida" las imágenes se decodifican a menor escala antes de calcular los hashes.
+    Si se pasan "archivos" (por ejemplo, de un escaneo conjunto) no se vuelve a recorrer la carpeta.
+    Con "verificar" los grupos se confirman con las miniaturas (ver verificar_grupos).
     """
-    archivos = [ruta for ruta in obtener_archivos_imagenes(carpeta_origen) if ruta.lower().endswith(tuple(extensiones))]
+    if archivos is None:
+        archivos = obtener_archivos_imagenes(carpeta_origen, extensiones)
     print(f"Imágenes encontradas: {len(archivos)}")
-    hashes = calcular_hashes_imagenes(archivos, umbral_hash)
-    return {hash_: rutas for hash_, rutas in hashes.items() if len(rutas) > 1}
+    hashes = calcular_hashes_imagenes(archivos, umbral_hash, trabajadores, reducida, con_miniatura=verificar)
+    duplicados = {hash_: rutas for hash_, rutas in hashes.items() if len(rutas) > 1}
+    return verificar_grupos(duplicados, reducida) if verificar else duplicados
 
-def mover_duplicados_imagenes(duplicados, carpeta_destino, registrar_operacion):
+def mover_duplicados_imagenes(duplicados, carpeta_destino):
     """
     Mueve los archivos duplicados, dejando el de mejor calidad en su lugar.
+    Devuelve las estadísticas del motor de movimiento.
     """
-    os.makedirs(carpeta_destino, exist_ok=True)
-
-    for hash_, grupo in tqdm(duplicados.items(), desc="Moviendo duplicados"):
-        mejor = seleccionar_mejor_calidad(grupo)
-        grupo.remove(mejor)
-
-        for ruta in grupo:
-            destino = os.path.join(carpeta_destino, os.path.basename(ruta))
-
-            contador = 1
-            while os.path.exists(destino):
-                destino = os.path.join(
-                    carpeta_destino,
-                    f"{os.path.splitext(os.path.basename(ruta))[0]}_{contador}{os.path.splitext(ruta)[1]}"
-                )
-                contador += 1
-
-            if not mover_archivo_con_reintento(ruta, destino):
-                continue
+    with MotorMovimiento(carpeta_destino) as motor:
+        for hash_, grupo in tqdm(duplicados.items(), desc="Moviendo duplicados"):
+            mejor = seleccionar_mejor_calidad(grupo)
+            grupo.remove(mejor)
 
-            registrar_operacion(ruta, destino)
+            for registro in grupo:
+                motor.mover(registro.ruta, ",".join(str(h) for h in registro.hashes))
 
     print("Proceso completado.")
+    return motor.estadisticas
 
 # FIN - Ejecución.
@@ -0,0 +1,156 @@
+import os
+import json
+import sqlite3
+import threading
+from collections import namedtuple
+from escaner import normalizar_raices, recordar_stat, olvidar_stat, stat_de_entrada
+from config import registrar_error, INSTANTANEA_DB
+
+"""
+Recorrido incremental: guarda una instantánea de cada carpeta (su mtime, sus subcarpetas y el stat
+de sus archivos) y en la siguiente ejecución no vuelve a listar las carpetas cuyo mtime no cambió.
+Agregar, borrar o renombrar un archivo cambia el mtime de su carpeta, así que los archivos nuevos
+siempre aparecen; las subcarpetas se siguen visitando porque su mtime es independiente del de la madre.
+Un archivo modificado sin cambiar de nombre no cambia el mtime de la carpeta: eso se detecta
+en la próxima ejecución completa.
+
+Los archivos que ya estaban se entregan marcados como existentes y con el stat guardado, así la
+caché de hashes los reconoce sin leerlos y los nuevos se comparan contra sus hashes guardados.
+"""
+
+# Stat guardado en la instantánea: los campos que usan la caché, el prefiltro y el motor de movimiento.
+StatGuardado = namedtuple("StatGuardado", ["st_size", "st_mtime_ns", "st_ino", "st_dev"])
+
+# INICIO - Instantánea.
+class Instantanea:
+    """
+    Instantánea de carpetas en SQLite, una fila por carpeta.
+    "estadisticas" cuenta las carpetas leídas y reutilizadas y los archivos nuevos o modificados del último recorrido.
+    """
+
+    def __init__(self, ruta=INSTANTANEA_DB):
+        self.ruta = ruta
+        self._conexion = None
+        self._bloqueo = threading.Lock()
+        self.estadisticas = {"carpetas_leidas": 0, "carpetas_reutilizadas": 0, "archivos_nuevos": 0}
+
+    def _conectar(self):
+        if self._conexion is None:
+            self._conexion = sqlite3.connect(self.ruta, check_same_thread=False)
+            self._conexion.execute("PRAGMA journal_mode = WAL")
+            self._conexion.execute("PRAGMA synchronous = NORMAL")
+            self._conexion.execute("""
+                CREATE TABLE IF NOT EXISTS carpetas (
+                    ruta TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    subcarpetas TEXT NOT NULL,
+                    archivos TEXT NOT NULL
+                )
+            """)
+        return self._conexion
+
+    def _leer(self, carpeta): # Devuelve (mtime_ns, subcarpetas, {nombre: stat}) guardados, o None.
+        fila = self._conectar().execute(
+            "SELECT mtime_ns, subcarpetas, archivos FROM carpetas WHERE ruta = ?", (carpeta,)
+        ).fetchone()
+        if fila is None:
+            return None
+        archivos = {nombre: StatGuardado(*datos) for nombre, *datos in json.loads(fila[2])}
+        return fila[0], json.loads(fila[1]), archivos
+
+    def _listar(self, carpeta):
+        """
+        Lee la carpeta del disco: devuelve (subcarpetas, {nombre: stat}) con todos los archivos,
+        de cualquier tipo, así la misma instantánea sirve para cualquier selección de tipos y de exclusiones.
+        """
+        subcarpetas = []
+        archivos = {}
+        with os.scandir(carpeta) as entradas:
+            for entrada in entradas:
+                try:
+                    if entrada.is_dir(follow_symlinks=False):
+                        subcarpetas.append(entrada.name)
+                    elif entrada.is_file():
+                        stat = stat_de_entrada(entrada)
+                        archivos[entrada.name] = StatGuardado(stat.st_size, stat.st_mtime_ns, stat.st_ino, stat.st_dev)
+                except OSError as e:
+                    registrar_error(entrada.path, f"Error al leer entrada: {e}", consola=False)
+        return subcarpetas, archivos
+
+    def recorrer(self, raices, tipos, excluir=(), olvidar=True):
+        """
+        Como escaner.recorrer, pero devuelve (ruta, [tipos], nuevo): "nuevo" es False para los archivos
+        que ya estaban en la instantánea con el mismo tamaño, mtime e inodo. Actualiza la instantánea
+        con lo recorrido y olvida las carpetas de estas raíces que ya no existen.
+        """
+        por_extension = {}
+        for tipo, extensiones in tipos.items():
+            for extension in extensiones:
+                por_extension.setdefault(extension.lower(), []).append(tipo)
+
+        excluidas = {os.path.realpath(carpeta) for carpeta in excluir}
+        self.estadisticas = {"carpetas_leidas": 0, "carpetas_reutilizadas": 0, "archivos_nuevos": 0}
+        if olvidar:
+            olvidar_stat()
+        raices = [os.path.abspath(raiz) for raiz in normalizar_raices(raices)]
+        pendientes = list(reversed(raices))
+        visitadas = set()
+        cambios = []
+
+        while pendientes:
+            carpeta = pendientes.pop()
+            visitadas.add(carpeta)
+            try:
+                mtime_ns = os.stat(carpeta).st_mtime_ns # Antes de listar: si cambia mientras tanto, se relee la próxima vez.
+                guardado = self._leer(carpeta)
+                if guardado and guardado[0] == mtime_ns:
+                    _, subcarpetas, archivos = guardado
+                    anteriores = archivos
+                    self.estadisticas["carpetas_reutilizadas"] += 1
+                else:
+                    subcarpetas, archivos = self._listar(carpeta)
+                    anteriores = guardado[2] if guardado else {}
+                    cambios.append((carpeta, mtime_ns, json.dumps(subcarpetas),
+                                    json.dumps([[nombre, *stat] for nombre, stat in archivos.items()])))
+                    self.estadisticas["carpetas_leidas"] += 1
+            except OSError as e:
+                registrar_error(carpeta, f"Error al recorrer carpeta: {e}", consola=False)
+                continue
+
+            encontrados = []
+            for nombre, stat in archivos.items():
+                tipos_archivo = por_extension.get(os.path.splitext(nombre)[1].lower())
+                if not tipos_archivo:
+                    continue
+                ruta = os.path.join(carpeta, nombre)
+                nuevo = anteriores.get(nombre) != stat
+                if nuevo:
+                    self.estadisticas["archivos_nuevos"] += 1
+                recordar_stat(ruta, stat)
+                encontrados.append((ruta, tipos_archivo, nuevo))
+
+            subcarpetas = [os.path.join(carpeta, nombre) for nombre in subcarpetas]
+            if excluidas:
+                subcarpetas = [ruta for ruta in subcarpetas if os.path.realpath(ruta) not in excluidas]
+            pendientes.extend(reversed(subcarpetas))  # Mismo orden que os.walk: primero en profundidad.
+            yield from encontrados
+
+        self._guardar(cambios, raices, visitadas)
+
+    def _guardar(self, cambios, raices, visitadas):
+        with self._bloqueo:
+            conexion = self._conectar()
+            with conexion:
+                conexion.executemany("INSERT OR REPLACE INTO carpetas VALUES (?, ?, ?, ?)", cambios)
+                # Carpetas de estas raíces que no aparecieron en el recorrido: se borraron o se movieron.
+                viejas = [(ruta,) for (ruta,) in conexion.execute("SELECT ruta FROM carpetas")
+                          if ruta not in visitadas and any(ruta.startswith(raiz + os.sep) for raiz in raices)]
+                conexion.executemany("DELETE FROM carpetas WHERE ruta = ?", viejas)
+
+    def cerrar(self):
+        with self._bloqueo:
+            if self._conexion is not None:
+                self._conexion.close()
+                self._conexion = None
+
+# FIN - Instantánea.
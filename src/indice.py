@@ -0,0 +1,324 @@
+import numpy as np
+from itertools import chain
+import metricas
+
+"""
+Índice por distancia de Hamming para hashes perceptuales empaquetados como enteros.
+Usa tablas multi-índice: el hash se divide en (umbral + 1) trozos y, por el principio del palomar,
+dos hashes a distancia <= umbral coinciden exactamente en al menos uno de ellos. Cada consulta
+revisa sólo los elementos que comparten algún trozo, en lugar de recorrer todos. Sirve mientras los trozos
+son pocos y anchos (umbral + 1 <= MAXIMO_TROZOS): con más, casi todos los elementos comparten algún trozo
+y se compara contra todos directamente. Las huellas formadas por varias muestras (videos) se indexan
+por muestra con agrupar_por_muestras, que aplica el palomar dos veces.
+
+agrupar_vectorizado aplica la misma idea por lotes con NumPy para hashes de 64 bits: ordena por cada
+trozo, compara los elementos que lo comparten con operaciones sobre arreglos uint64 y une los pares
+con union-find, procesando los grupos grandes en bloques para que la memoria no dependa de su tamaño.
+buscar_en_referencia hace lo mismo entre dos conjuntos (consultas contra una colección ya indexada)
+con búsqueda binaria sobre los trozos ordenados de la referencia.
+"""
+
+TAMANO_BLOQUE_HAMMING = 1024 # Filas y columnas de cada bloque de distancias (1024 x 1024 uint64 = 8 MB).
+MAXIMO_TROZOS = 16 # Con más trozos (umbral + 1) serían tan chicos que conviene comparar todo contra todo.
+LARGO_RUN_CHICO = 64 # Elementos que comparten trozo por encima de los cuales se compara en bloques.
+MAXIMO_CANDIDATOS = 4 * 1024 * 1024 # Pares revisados juntos al consultar contra una referencia.
+
+_BITS_POR_BYTE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# INICIO - Distancias.
+def distancia_hamming(a, b): # Cantidad de bits distintos entre dos enteros.
+    return (a ^ b).bit_count()
+
+def contar_bits(arreglo):
+    """
+    Cantidad de bits en 1 de cada elemento de un arreglo uint64 (np.bitwise_count desde NumPy 2.0).
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(arreglo)
+    bytes_ = np.ascontiguousarray(arreglo).view(np.uint8).reshape(arreglo.shape + (8,))
+    return _BITS_POR_BYTE[bytes_].sum(axis=-1, dtype=np.uint8)
+
+def dentro_del_umbral(enteros1, enteros2, umbral):
+    """
+    Dos imágenes son duplicadas si todos sus hashes empaquetados están a distancia <= umbral.
+    """
+    return all((h1 ^ h2).bit_count() <= umbral for h1, h2 in zip(enteros1, enteros2))
+
+# FIN - Distancias.
+
+# INICIO - Índice.
+class IndiceHamming:
+    """
+    Tablas multi-índice sobre enteros de "bits" bits.
+    Devuelve los identificadores cuyo valor está a distancia <= umbral del valor consultado.
+    Con umbral + 1 > MAXIMO_TROZOS no hay tablas y cada búsqueda recorre todos los valores: con las huellas
+    de videos completas (1024 bits, umbral 96) los trozos serían de ~10 bits (ver agrupar_por_muestras).
+    """
+    def __init__(self, umbral, bits=64):
+        self.umbral = umbral
+        trozos = min(umbral + 1, bits)
+        limites = [bits * i // trozos for i in range(trozos + 1)] if trozos <= MAXIMO_TROZOS else []
+        self.trozos = [(inicio, (1 << (fin - inicio)) - 1) for inicio, fin in zip(limites, limites[1:])]
+        self.tablas = [{} for _ in self.trozos]
+        self.valores = {}
+
+    def agregar(self, valor, identificador):
+        self.valores[identificador] = valor
+        for (desplazamiento, mascara), tabla in zip(self.trozos, self.tablas):
+            tabla.setdefault((valor >> desplazamiento) & mascara, []).append(identificador)
+
+    def eliminar(self, identificador):
+        valor = self.valores.pop(identificador)
+        for (desplazamiento, mascara), tabla in zip(self.trozos, self.tablas):
+            clave = (valor >> desplazamiento) & mascara
+            tabla[clave].remove(identificador)
+            if not tabla[clave]:
+                del tabla[clave]
+
+    def buscar(self, valor):
+        """
+        Devuelve los identificadores dentro del umbral, ordenados de menor a mayor.
+        """
+        if not self.trozos:
+            umbral = self.umbral
+            return sorted([i for i, otro in self.valores.items() if (otro ^ valor).bit_count() <= umbral])
+        candidatos = set()
+        for (desplazamiento, mascara), tabla in zip(self.trozos, self.tablas):
+            candidatos.update(tabla.get((valor >> desplazamiento) & mascara, ()))
+        return sorted(i for i in candidatos if (self.valores[i] ^ valor).bit_count() <= self.umbral)
+
+    def __len__(self):
+        return len(self.valores)
+
+# FIN - Índice.
+
+# INICIO - Agrupamiento.
+def agrupar_por_umbral(elementos, umbral, posicion=1, bits=64):
+    """
+    Agrupa una secuencia de (dato, enteros) igual que la búsqueda lineal original: cada elemento
+    se une al primer grupo (en orden de creación) cuyo representante está dentro del umbral
+    en todos los hashes, o crea un grupo nuevo. El índice se construye sobre el hash "posicion".
+    Devuelve una lista de (enteros_representante, [datos]).
+    """
+    indice = IndiceHamming(umbral, bits)
+    grupos = []
+    comparaciones = 0
+
+    for dato, enteros in elementos:
+        for i in indice.buscar(enteros[posicion]):
+            comparaciones += 1
+            if dentro_del_umbral(enteros, grupos[i][0], umbral):
+                grupos[i][1].append(dato)
+                break
+        else:
+            indice.agregar(enteros[posicion], len(grupos))
+            grupos.append((enteros, [dato]))
+
+    metricas.sumar("agrupado.comparaciones", comparaciones)
+    metricas.sumar("agrupado.grupos", len(grupos))
+    return grupos
+
+def agrupar_por_muestras(elementos, umbral, muestras, bits=64, posicion=1):
+    """
+    Igual que agrupar_por_umbral, para hashes formados por "muestras" hashes de "bits" bits concatenados.
+    Por el palomar, dos hashes a distancia <= umbral están a distancia <= umbral // muestras en al menos
+    una muestra: cada muestra tiene su propio IndiceHamming con ese umbral, y sólo los representantes
+    encontrados en alguno se comparan con el hash completo.
+    """
+    umbral_muestra = umbral // muestras
+    mascara = (1 << bits) - 1
+    indices = [IndiceHamming(umbral_muestra, bits) for _ in range(muestras)]
+    grupos = []
+    comparaciones = 0
+
+    for dato, enteros in elementos:
+        partes = [(enteros[posicion] >> (bits * i)) & mascara for i in range(muestras)]
+        candidatos = set()
+        for indice, parte in zip(indices, partes):
+            candidatos.update(indice.buscar(parte))
+        for i in sorted(candidatos):
+            comparaciones += 1
+            if dentro_del_umbral(enteros, grupos[i][0], umbral):
+                grupos[i][1].append(dato)
+                break
+        else:
+            for indice, parte in zip(indices, partes):
+                indice.agregar(parte, len(grupos))
+            grupos.append((enteros, [dato]))
+
+    metricas.sumar("agrupado.comparaciones", comparaciones)
+    metricas.sumar("agrupado.grupos", len(grupos))
+    return grupos
+
+# FIN - Agrupamiento.
+
+# INICIO - Agrupamiento vectorizado.
+class _UnionFind:
+    def __init__(self, cantidad):
+        self.padres = list(range(cantidad))
+
+    def raiz(self, i):
+        padres = self.padres
+        while padres[i] != i:
+            padres[i] = padres[padres[i]] # Compresión de caminos a la mitad.
+            i = padres[i]
+        return i
+
+    def unir_pares(self, primeros, segundos):
+        for a, b in zip(primeros.tolist(), segundos.tolist()):
+            raiz_a, raiz_b = self.raiz(a), self.raiz(b)
+            if raiz_a != raiz_b:
+                if raiz_a < raiz_b: # La raíz es siempre el menor índice: el resultado no depende del orden de unión.
+                    raiz_a, raiz_b = raiz_b, raiz_a
+                self.padres[raiz_a] = raiz_b
+
+def _pares_dentro_del_umbral(matriz, primeros, segundos, umbral, otra=None):
+    """
+    Filtra los pares de filas de "matriz" que están a distancia <= umbral en todas las columnas.
+    Con "otra", los índices de "segundos" son filas de esa matriz.
+    """
+    otra = matriz if otra is None else otra
+    validos = np.ones(len(primeros), dtype=bool)
+    for columna in range(matriz.shape[1]):
+        indices = np.flatnonzero(validos)
+        if not len(indices):
+            break
+        distancias = contar_bits(matriz[primeros[indices], columna] ^ otra[segundos[indices], columna])
+        validos[indices[distancias > umbral]] = False
+    return primeros[validos], segundos[validos]
+
+def _pares_en_runs_chicos(orden, runs, limite):
+    """
+    Genera los pares de elementos de "orden" que están en el mismo run, para runs de hasta "limite"
+    elementos: con un desplazamiento por vez, cada paso es una operación sobre todo el arreglo.
+    """
+    for desplazamiento in range(1, limite):
+        mismo_run = np.flatnonzero(runs[:-desplazamiento] == runs[desplazamiento:])
+        if not len(mismo_run):
+            break
+        yield orden[mismo_run], orden[mismo_run + desplazamiento]
+
+def _pares_en_bloques(matriz, miembros, umbral, posicion, tamano_bloque):
+    """
+    Genera los pares de "miembros" dentro del umbral en la columna "posicion", comparando de a
+    bloques de tamano_bloque x tamano_bloque para acotar la memoria.
+    """
+    valores = matriz[miembros, posicion]
+    for inicio in range(0, len(miembros), tamano_bloque):
+        filas = valores[inicio:inicio + tamano_bloque]
+        for inicio_columnas in range(inicio, len(miembros), tamano_bloque):
+            columnas = valores[inicio_columnas:inicio_columnas + tamano_bloque]
+            cerca = contar_bits(filas[:, None] ^ columnas[None, :]) <= umbral
+            if inicio_columnas == inicio:
+                cerca = np.triu(cerca, 1)
+            i, j = np.nonzero(cerca)
+            yield miembros[inicio + i], miembros[inicio_columnas + j]
+
+def _trozos(umbral):
+    """
+    Límites en bits de los umbral + 1 trozos del palomar (con umbral 0, un solo trozo de 64 bits: hash exacto).
+    Por encima de MAXIMO_TROZOS devuelve [0, 0], un solo trozo vacío: todos contra todos.
+    """
+    trozos = umbral + 1
+    if trozos > MAXIMO_TROZOS:
+        return [0, 0]
+    return [64 * i // trozos for i in range(trozos + 1)]
+
+def _claves(columna, inicio, fin): # Bits [inicio, fin) de cada elemento de un arreglo uint64.
+    return (columna >> np.uint64(inicio)) & np.uint64((1 << (fin - inicio)) - 1)
+
+def agrupar_vectorizado(elementos, umbral, posicion=1, tamano_bloque=TAMANO_BLOQUE_HAMMING):
+    """
+    Agrupa una secuencia de (dato, enteros) con hashes de 64 bits: dos elementos son duplicados si están
+    a distancia <= umbral en todos los hashes, y cada grupo es una componente conexa de esa relación
+    (si A se parece a B y B a C, los tres quedan juntos). El resultado no depende del orden de entrada.
+    Los candidatos salen de los trozos del hash "posicion", como en IndiceHamming.
+    Devuelve una lista de (enteros del primer miembro, [datos]) en el orden en que aparece el primer
+    miembro de cada grupo, con la misma forma que agrupar_por_umbral.
+    """
+    datos, enteros = [], []
+    for dato, valores in elementos:
+        datos.append(dato)
+        enteros.append(valores)
+    if not datos:
+        return []
+    # Las copias con hashes idénticos se comparan una sola vez: si no, mil copias de una foto serían medio millón de pares.
+    matriz, inversa = np.unique(np.array(enteros, dtype=np.uint64).reshape(len(datos), -1), axis=0, return_inverse=True)
+    inversa = inversa.reshape(-1).tolist()
+    conjuntos = _UnionFind(len(matriz))
+    comparaciones = 0
+
+    limites = _trozos(umbral)
+    columna = matriz[:, posicion]
+    for inicio_trozo, fin_trozo in zip(limites, limites[1:]):
+        claves = _claves(columna, inicio_trozo, fin_trozo)
+        orden = np.argsort(claves, kind="stable")
+        claves = claves[orden]
+        runs = np.concatenate(([0], np.cumsum(claves[1:] != claves[:-1]))) # Run (clave distinta) de cada posición.
+        largos = np.bincount(runs)
+        inicios = np.concatenate(([0], np.cumsum(largos)[:-1]))
+
+        chicos = np.flatnonzero(largos[runs] <= LARGO_RUN_CHICO)
+        fuentes = [_pares_en_runs_chicos(orden[chicos], runs[chicos], min(int(largos.max()), LARGO_RUN_CHICO))]
+        fuentes += [_pares_en_bloques(matriz, orden[inicios[run]:inicios[run] + largos[run]], umbral, posicion, tamano_bloque)
+                    for run in np.flatnonzero(largos > LARGO_RUN_CHICO)]
+        for primeros, segundos in chain.from_iterable(fuentes):
+            comparaciones += len(primeros)
+            conjuntos.unir_pares(*_pares_dentro_del_umbral(matriz, primeros, segundos, umbral))
+
+    grupos = {}
+    for i, unico in enumerate(inversa):
+        grupos.setdefault(conjuntos.raiz(unico), []).append(i)
+
+    metricas.sumar("agrupado.comparaciones", comparaciones)
+    metricas.sumar("agrupado.grupos", len(grupos))
+    return [(enteros[miembros[0]], [datos[i] for i in miembros]) for miembros in grupos.values()]
+
+def buscar_en_referencia(referencia, consultas, umbral, posicion=1, maximo_candidatos=MAXIMO_CANDIDATOS):
+    """
+    Busca, para cada fila de "consultas", las filas de "referencia" (matrices uint64 con una columna
+    por hash) que están a distancia <= umbral en todos los hashes. Por cada trozo del hash "posicion"
+    la referencia se ordena una vez y cada consulta ubica con búsqueda binaria el run que comparte su trozo;
+    los candidatos se verifican de a lotes de a lo sumo "maximo_candidatos" pares (o de una consulta,
+    si su run es más grande).
+    Devuelve (indices de consulta, indices de referencia) ordenados por consulta y sin pares repetidos.
+    """
+    vacio = np.zeros(0, dtype=np.int64)
+    if not len(referencia) or not len(consultas):
+        return vacio, vacio
+    encontrados = []
+    comparaciones = 0
+
+    limites = _trozos(umbral)
+    for inicio_trozo, fin_trozo in zip(limites, limites[1:]):
+        claves = _claves(referencia[:, posicion], inicio_trozo, fin_trozo)
+        orden = np.argsort(claves, kind="stable")
+        claves = claves[orden]
+        buscadas = _claves(consultas[:, posicion], inicio_trozo, fin_trozo)
+        desde = np.searchsorted(claves, buscadas, side="left")
+        cantidades = np.searchsorted(claves, buscadas, side="right") - desde
+        acumuladas = np.cumsum(cantidades)
+
+        inicio = 0
+        while inicio < len(consultas):
+            base = int(acumuladas[inicio - 1]) if inicio else 0
+            fin = max(inicio + 1, int(np.searchsorted(acumuladas, base + maximo_candidatos, side="right")))
+            cantidad = cantidades[inicio:fin]
+            total = int(acumuladas[fin - 1]) - base
+            if total:
+                # Posición de cada candidato dentro del run de su consulta: 0, 1, ..., cantidad - 1.
+                desplazamientos = np.arange(total) - np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+                filas = np.repeat(np.arange(inicio, fin), cantidad)
+                columnas = orden[np.repeat(desde[inicio:fin], cantidad) + desplazamientos]
+                comparaciones += total
+                encontrados.append(_pares_dentro_del_umbral(consultas, filas, columnas, umbral, otra=referencia))
+            inicio = fin
+
+    metricas.sumar("referencia.comparaciones", comparaciones)
+    if not encontrados:
+        return vacio, vacio
+    # Un par aparece una vez por cada trozo en el que coincide.
+    pares = np.unique(np.concatenate([filas * len(referencia) + columnas for filas, columnas in encontrados]))
+    return pares // len(referencia), pares % len(referencia)
+
+# FIN - Agrupamiento vectorizado.
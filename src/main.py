@@ -1,28 +1,46 @@
 import os, time
-import imagenes, videos, audio, documentos, otros
+import importlib
+import cache, deshacer, metricas
 from colorama import Fore, Style, init
 from tabulate import tabulate
-from config import registrar_operacion, deshacer_ultima_operacion
+from tuberia import ejecutar_tuberia, imprimir_reporte_tuberia
+from escaner import olvidar_stat
+from contenedores import huella_zip
+from config import (TRABAJADORES_IMAGENES, DECODIFICACION_REDUCIDA, VERIFICAR_IMAGENES,
+                    TRABAJADORES_VIDEOS, HILOS_OPENCV_POR_TRABAJADOR, HILOS_HASH_EXACTO, EXTENSIONES_POR_TIPO,
+                    IGNORAR_ETIQUETAS_AUDIO, COMPARAR_ZIP_POR_CONTENIDO)
 
 init(autoreset=True)
 
-EXTENSIONES = {
-    "Imagenes": [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".webp", ".svg"],
-    "Videos": [".mp4", ".avi", ".mov", ".mkv", ".flv", ".wmv", ".webm"],
-    "Audio": [".mp3", ".m4a", ".wav", ".flac", ".aac", ".ogg"],
-    "Documentos": [".txt", ".doc", ".docx", ".xls", ".xlsx", ".xlsm", ".ppt", ".pptx", 
-                   ".ppsx", ".odt", ".ods", ".odp", ".pdf", ".epub", ".mobi"],
-    "Otros": [".zip", ".rar", ".7z", ".tar", ".gz", ".iso", ".ttf", ".otf"],
+EXTENSIONES = EXTENSIONES_POR_TIPO
+
+# Módulo de cada tipo. Se importan recién cuando el tipo se elige: imágenes y videos cargan
+# OpenCV, PIL e imagehash, que no hacen falta para buscar, por ejemplo, sólo audio.
+MODULOS = {"Imagenes": "imagenes", "Videos": "videos", "Audio": "audio", "Documentos": "documentos", "Otros": "otros"}
+
+TIPOS_EXACTOS = { # Tipos que se comparan por contenido exacto, con el nombre de su función de hash.
+    "Audio": "calcular_hash_audio",
+    "Documentos": "calcular_hash_documento",
+    "Otros": "calcular_hash_otro",
 }
 
+carpetas_origen = []
+carpeta_destino = None
+tipos_seleccionados = []
+
 # INICIO - Encapsulado
 def elegir_carpeta_origen(): # Opción 1
-    global carpeta_origen
-    carpeta_origen = input("Ingrese la carpeta de origen: ").strip()
-    if os.path.exists(carpeta_origen):
-        print(Fore.LIGHTMAGENTA_EX + f"Carpeta de origen elegida: {carpeta_origen}" + Style.RESET_ALL)
-    else:
-        print(Fore.LIGHTRED_EX + "La carpeta ingresada no existe." + Style.RESET_ALL)
+    global carpetas_origen
+    entrada = input("Ingrese la/s carpeta/s de origen (separadas por \",\"): ")
+    carpetas = [carpeta.strip() for carpeta in entrada.split(",") if carpeta.strip()]
+    carpetas_origen = []
+
+    for carpeta in carpetas:
+        if os.path.exists(carpeta):
+            carpetas_origen.append(carpeta)
+            print(Fore.LIGHTMAGENTA_EX + f"Carpeta de origen elegida: {carpeta}" + Style.RESET_ALL)
+        else:
+            print(Fore.LIGHTRED_EX + f"La carpeta ingresada no existe: {carpeta}" + Style.RESET_ALL)
 
 def elegir_carpeta_destino(): # Opción 2
     global carpeta_destino
@@ -34,64 +52,115 @@ def elegir_carpeta_destino(): # Opción 2
         print(Fore.LIGHTMAGENTA_EX + f"Carpeta de destino creada: {carpeta_destino}" + Style.RESET_ALL)
 
 def elegir_tipo(): # Opción 3
-    global tipo_seleccionado, extensiones_seleccionadas
+    global tipos_seleccionados
     print(Fore.LIGHTMAGENTA_EX + "\nTipos de archivos disponibles:" + Style.RESET_ALL)
 
     for idx, tipo in enumerate(EXTENSIONES.keys(), start=1):
         print(Fore.LIGHTMAGENTA_EX + f"{idx}. {tipo}" + Style.RESET_ALL)
     
-    seleccion = input("Elija el tipo de archivo a buscar (1-5): ").strip()
+    seleccion = input("Elija el/los tipo/s de archivo a buscar (1-5, separados por \",\"): ").strip()
 
     try:
-        idx = int(seleccion)
-
-        if 1 <= idx <= len(EXTENSIONES):
-            tipo_seleccionado = list(EXTENSIONES.keys())[idx - 1]
-            extensiones_seleccionadas = EXTENSIONES[tipo_seleccionado]
-            print(Fore.LIGHTMAGENTA_EX + f"Tipo seleccionado: {tipo_seleccionado}")
-            print(Fore.LIGHTMAGENTA_EX + f"Extensiones: {', '.join(extensiones_seleccionadas)}" + Style.RESET_ALL)
-            return tipo_seleccionado, extensiones_seleccionadas
+        indices = [int(valor) for valor in seleccion.split(",") if valor.strip()]
+
+        if indices and all(1 <= idx <= len(EXTENSIONES) for idx in indices):
+            tipos_seleccionados = list(dict.fromkeys(list(EXTENSIONES.keys())[idx - 1] for idx in indices))
+            for tipo in tipos_seleccionados:
+                print(Fore.LIGHTMAGENTA_EX + f"Tipo seleccionado: {tipo}")
+                print(Fore.LIGHTMAGENTA_EX + f"Extensiones: {', '.join(EXTENSIONES[tipo])}" + Style.RESET_ALL)
+            return tipos_seleccionados
         
         else:
             print(Fore.LIGHTRED_EX + "Selección fuera de rango." + Style.RESET_ALL)
-            return None, None
+            return None
         
     except ValueError:
         print(Fore.LIGHTRED_EX + "Selección inválida. Intente nuevamente." + Style.RESET_ALL)
-        return None, None
-
-def iniciar_busqueda(carpeta_origen, carpeta_destino, tipo_seleccionado): # Opción 4
-    if not carpeta_origen or not carpeta_destino or not tipo_seleccionado:
-        print(Fore.LIGHTRED_EX + "Debe elegir la carpeta de origen, carpeta de destino y tipo de archivo antes de iniciar la búsqueda." + Style.RESET_ALL)
-        return
-
-    if tipo_seleccionado == "Imagenes":
+        return None
+
+def cargar_modulo(tipo):
+    return importlib.import_module(MODULOS[tipo])
+
+def ejecutar_busqueda(carpetas_origen, carpeta_destino, tipos_seleccionados, umbral_imagenes=3, umbral_videos=None,
+                      trabajadores_imagenes=TRABAJADORES_IMAGENES, trabajadores_videos=TRABAJADORES_VIDEOS,
+                      hilos_hash=HILOS_HASH_EXACTO, reducida=DECODIFICACION_REDUCIDA, instantanea=None,
+                      ignorar_etiquetas_audio=IGNORAR_ETIQUETAS_AUDIO, zip_por_contenido=COMPARAR_ZIP_POR_CONTENIDO,
+                      referencia=None, mover_referencia=True, verificar_imagenes=VERIFICAR_IMAGENES):
+    """
+    Busca y mueve los duplicados de los tipos elegidos, sin pedir nada por consola.
+    Con una "instantanea" (incremental.Instantanea) sólo se listan las carpetas que cambiaron.
+    Con "ignorar_etiquetas_audio" los archivos de audio se comparan sin sus etiquetas ni carátula,
+    y con "zip_por_contenido" los documentos y archivos ZIP por los archivos que contienen.
+    Con "referencia" (carpetas de una colección ya ordenada) las imágenes se buscan primero en su índice
+    persistente y las que ya están ahí se mueven (o sólo se informan, si "mover_referencia" es False);
+    la referencia nunca se modifica. Con "verificar_imagenes" los grupos de imágenes se confirman con sus miniaturas.
+    Devuelve un resumen serializable a JSON con lo hecho por cada tipo y las etapas de la tubería.
+    """
+    metricas.comenzar() # Las métricas de cada búsqueda empiezan en cero y van a su propio archivo.
+    # Un solo recorrido de todas las carpetas de origen para todos los tipos elegidos.
+    # Los duplicados exactos se hashean y mueven durante el recorrido; imágenes y videos se procesan después.
+    exactos = {tipo: getattr(cargar_modulo(tipo), TIPOS_EXACTOS[tipo])
+               for tipo in tipos_seleccionados if tipo in TIPOS_EXACTOS}
+    cargas = {}
+    if ignorar_etiquetas_audio and "Audio" in exactos:
+        audio = cargar_modulo("Audio")
+        exactos["Audio"], cargas["Audio"] = audio.calcular_hash_carga_audio, audio.ubicar_carga
+    if zip_por_contenido:
+        cargas.update({tipo: huella_zip for tipo in ("Documentos", "Otros") if tipo in exactos})
+    archivos, reportes, movidos, estadisticas = ejecutar_tuberia(
+        carpetas_origen, carpeta_destino, {tipo: EXTENSIONES[tipo] for tipo in tipos_seleccionados}, exactos,
+        hilos=hilos_hash, instantanea=instantanea, cargas=cargas
+    )
+    imprimir_reporte_tuberia(reportes, movidos, estadisticas)
+    resumen = {"tipos": {tipo: {"movidos": movidos[tipo], "prefiltro": reportes[tipo]} for tipo in exactos},
+               "etapas": estadisticas}
+
+    for tipo_seleccionado in archivos:
         print(Fore.LIGHTMAGENTA_EX + f"Buscando duplicados de tipo {tipo_seleccionado}..." + Style.RESET_ALL)
-        duplicados_imagenes = imagenes.buscar_duplicados_imagenes(carpeta_origen)
-        imagenes.mover_duplicados_imagenes(duplicados_imagenes, carpeta_destino, registrar_operacion)
 
-    elif tipo_seleccionado == "Videos":
-        print(Fore.LIGHTMAGENTA_EX + f"Buscando duplicados de tipo {tipo_seleccionado}..." + Style.RESET_ALL)
-        videos.buscar_videos(carpeta_origen, carpeta_destino)
+        if tipo_seleccionado == "Imagenes":
+            imagenes = cargar_modulo("Imagenes")
+            restantes = archivos[tipo_seleccionado]
+            en_referencia = None
+            if referencia:
+                en_referencia, restantes = importlib.import_module("referencia").buscar_en_biblioteca(
+                    referencia, restantes, carpeta_destino, umbral_imagenes, trabajadores_imagenes, reducida,
+                    mover=mover_referencia, excluir=[carpeta_destino, *carpetas_origen],
+                    incremental=instantanea is not None
+                )
+            duplicados_imagenes = imagenes.buscar_duplicados_imagenes(
+                carpetas_origen, EXTENSIONES["Imagenes"], umbral_imagenes, trabajadores_imagenes, reducida,
+                archivos=restantes, verificar=verificar_imagenes
+            )
+            resumen["tipos"]["Imagenes"] = {
+                "encontrados": len(archivos[tipo_seleccionado]), "grupos": len(duplicados_imagenes),
+                "movimiento": imagenes.mover_duplicados_imagenes(duplicados_imagenes, carpeta_destino)
+            }
+            if en_referencia is not None:
+                resumen["tipos"]["Imagenes"]["referencia"] = en_referencia
+
+        elif tipo_seleccionado == "Videos":
+            videos = cargar_modulo("Videos")
+            resumen["tipos"]["Videos"] = videos.buscar_videos(
+                carpetas_origen, carpeta_destino, trabajadores_videos, HILOS_OPENCV_POR_TRABAJADOR,
+                archivos=archivos[tipo_seleccionado],
+                umbral=videos.UMBRAL_VIDEO if umbral_videos is None else umbral_videos
+            )
 
-    elif tipo_seleccionado == "Audio":
-        print(Fore.LIGHTMAGENTA_EX + f"Buscando duplicados de tipo {tipo_seleccionado}..." + Style.RESET_ALL)
-        duplicados_audio = audio.buscar_duplicados_audio(carpeta_origen)
-        audio.mover_duplicados_audio(duplicados_audio, carpeta_destino)
-
-    elif tipo_seleccionado == "Documentos":
-        print(Fore.LIGHTMAGENTA_EX + f"Buscando duplicados de tipo {tipo_seleccionado}..." + Style.RESET_ALL)
-        duplicados_documentos = documentos.buscar_duplicados_documentos(carpeta_origen)
-        documentos.mover_duplicados_documentos(duplicados_documentos, carpeta_destino, registrar_operacion)
+        else:
+            print(Fore.LIGHTRED_EX + f"Actualmente, no hay soporte avanzado para {tipo_seleccionado}." + Style.RESET_ALL)
 
-    elif tipo_seleccionado == "Otros":
-        print(Fore.LIGHTMAGENTA_EX + f"Buscando duplicados de tipo {tipo_seleccionado}..." + Style.RESET_ALL)
-        duplicados_otros = otros.buscar_duplicados_otros(carpeta_origen)
-        otros.mover_duplicados_otros(duplicados_otros, carpeta_destino, registrar_operacion)
+    olvidar_stat() # Los stats del recorrido ya no se usan: no se guardan hasta la próxima búsqueda.
+    metricas.imprimir_resumen()
+    return resumen
 
-    else:
-        print(Fore.LIGHTRED_EX + f"Actualmente, no hay soporte avanzado para {tipo_seleccionado}." + Style.RESET_ALL)
+def iniciar_busqueda(carpetas_origen, carpeta_destino, tipos_seleccionados): # Opción 4
+    if not carpetas_origen or not carpeta_destino or not tipos_seleccionados:
+        print(Fore.LIGHTRED_EX + "Debe elegir la carpeta de origen, carpeta de destino y tipo de archivo antes de iniciar la búsqueda." + Style.RESET_ALL)
+        return
 
+    ejecutar_busqueda(carpetas_origen, carpeta_destino, tipos_seleccionados)
+    metricas.exportar()
     print(Fore.LIGHTGREEN_EX + "Proceso de búsqueda completado." + Style.RESET_ALL)
 
 # FIN - Encapsulado
@@ -139,9 +208,10 @@ def menu_principal():
         ["2.", "Elegir carpeta destino"],
         ["3.", "Seleccionar tipo/s de archivo"],
         ["4.", "Iniciar búsqueda de duplicados"],
-        ["5.", "Deshacer última operación"],
+        ["5.", "Deshacer operaciones"],
         ["6.", "Ayuda"],
         ["7.", "Información"],
+        ["8.", "Podar caché de hashes"],
         ["0.", "Salir"]
     ]
 
@@ -160,7 +230,8 @@ def menu_ayuda():
         ["2. Elegir destino:", "Elija la carpeta donde mover los duplicados encontrados."],
         ["3. Seleccionar tipos de archivo:", "Defina qué tipo/s de archivo desea buscar."],
         ["4. Iniciar búsqueda de duplicados:", "Ejecuta la búsqueda de duplicados en la/s carpeta/s seleccionada/s."],
-        ["5. Deshacer última operación:", "Revierte la última operación realizada."]
+        ["5. Deshacer operaciones:", "Revierte una ejecución guardada, completa o sus últimas operaciones."],
+        ["8. Podar caché de hashes:", "Elimina de la caché los archivos borrados o modificados."]
     ]
 
     print(Fore.LIGHTYELLOW_EX + tabulate(opciones, tablefmt="grid") + Style.RESET_ALL)
@@ -217,10 +288,10 @@ def main():
                 elegir_tipo()
 
             case "4":
-                iniciar_busqueda(carpeta_origen, carpeta_destino, tipo_seleccionado)
+                iniciar_busqueda(carpetas_origen, carpeta_destino, tipos_seleccionados)
 
             case "5":
-                deshacer_ultima_operacion()
+                deshacer.menu_deshacer()
 
             case "6":
                 menu_ayuda()
@@ -229,6 +300,9 @@ def main():
             case "7":
                 informacion()
 
+            case "8":
+                cache.podar_cache()
+
             case "0":
                 animacion_cierre()
                 break
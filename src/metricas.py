@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import threading
+from datetime import datetime
+import config
+
+"""
+Contadores y tiempos de las partes costosas (decodificación, lecturas, búsquedas en videos,
+comparaciones y movimientos), para saber en qué se va el tiempo de una ejecución lenta.
+Con las métricas desactivadas cada llamada sólo consulta una variable y vuelve.
+
+Los nombres usan puntos ("videos.busqueda"). Al terminar se guarda un JSON en "Registros" y,
+si se configuró una ruta, un archivo en formato de texto de Prometheus (para el textfile collector
+de node_exporter). Los trabajadores de los pools de procesos devuelven sus métricas con cada lote
+y el proceso principal las suma (ver paralelo.py).
+"""
+
+_activas = config.USAR_METRICAS
+_ruta_json = None # Archivo JSON de la búsqueda en curso (ver comenzar).
+_bloqueo = threading.Lock()
+_contadores = {}
+_tiempos = {} # nombre -> [segundos, veces]
+
+# INICIO - Registro.
+def activar(activas=True):
+    global _activas
+    _activas = activas
+
+def activas():
+    return _activas
+
+def sumar(nombre, valor=1):
+    if not _activas:
+        return
+    with _bloqueo:
+        _contadores[nombre] = _contadores.get(nombre, 0) + valor
+
+def registrar_tiempo(nombre, segundos, veces=1):
+    if not _activas:
+        return
+    with _bloqueo:
+        tiempo = _tiempos.setdefault(nombre, [0.0, 0])
+        tiempo[0] += segundos
+        tiempo[1] += veces
+
+class _Medicion: # Context manager que suma la duración del bloque al tiempo "nombre".
+    __slots__ = ("nombre", "inicio")
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        registrar_tiempo(self.nombre, time.perf_counter() - self.inicio)
+
+class _SinMedicion:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+_SIN_MEDICION = _SinMedicion()
+
+def medir(nombre):
+    """
+    Uso: "with metricas.medir("imagenes.hash"):". Sin métricas no toma el tiempo.
+    """
+    return _Medicion(nombre) if _activas else _SIN_MEDICION
+
+# FIN - Registro.
+
+# INICIO - Consulta y combinación.
+def instantanea():
+    """
+    Copia del estado actual: {"contadores": {nombre: valor}, "tiempos": {nombre: {"segundos", "veces"}}}.
+    """
+    with _bloqueo:
+        return {
+            "contadores": dict(_contadores),
+            "tiempos": {nombre: {"segundos": segundos, "veces": veces} for nombre, (segundos, veces) in _tiempos.items()},
+        }
+
+def extraer(): # Devuelve lo acumulado y lo vacía; lo usan los trabajadores para enviarlo con cada lote.
+    datos = instantanea()
+    reiniciar()
+    return datos
+
+def fusionar(datos): # Suma las métricas enviadas por un trabajador.
+    for nombre, valor in datos["contadores"].items():
+        sumar(nombre, valor)
+    for nombre, tiempo in datos["tiempos"].items():
+        registrar_tiempo(nombre, tiempo["segundos"], tiempo["veces"])
+
+def reiniciar():
+    with _bloqueo:
+        _contadores.clear()
+        _tiempos.clear()
+
+def comenzar():
+    """
+    Empieza las métricas de una búsqueda: vacía lo acumulado por las anteriores (en el menú o en modo vigilancia
+    el proceso hace varias) y fija el archivo JSON con la hora de inicio, leyendo LOG_METRICAS en este momento.
+    """
+    global _ruta_json
+    reiniciar()
+    _ruta_json = config.LOG_METRICAS.format(datetime.now().strftime("%Y%m%d-%H%M%S"))
+
+# FIN - Consulta y combinación.
+
+# INICIO - Exportación.
+def imprimir_resumen():
+    if not _activas:
+        return
+    datos = instantanea()
+    print("Métricas:")
+    for nombre, tiempo in sorted(datos["tiempos"].items()):
+        promedio = tiempo["segundos"] / tiempo["veces"] * 1000 if tiempo["veces"] else 0
+        print(f"  {nombre}: {tiempo['segundos']:.2f} s en {tiempo['veces']} llamadas ({promedio:.2f} ms promedio)")
+    for nombre, valor in sorted(datos["contadores"].items()):
+        print(f"  {nombre}: {valor}")
+
+def _nombre_prometheus(nombre):
+    return "doppelfiles_" + "".join(c if c.isalnum() else "_" for c in nombre)
+
+def texto_prometheus(datos):
+    """
+    Formato de texto de Prometheus: un contador "_total" por contador, y por cada tiempo
+    los segundos acumulados y la cantidad de llamadas.
+    """
+    lineas = []
+    for nombre, valor in sorted(datos["contadores"].items()):
+        metrica = _nombre_prometheus(nombre) + "_total"
+        lineas += [f"# TYPE {metrica} counter", f"{metrica} {valor}"]
+    for nombre, tiempo in sorted(datos["tiempos"].items()):
+        metrica = _nombre_prometheus(nombre)
+        lineas += [f"# TYPE {metrica}_segundos_total counter", f"{metrica}_segundos_total {tiempo['segundos']:.6f}",
+                   f"# TYPE {metrica}_llamadas_total counter", f"{metrica}_llamadas_total {tiempo['veces']}"]
+    return "\n".join(lineas) + "\n"
+
+def _escribir_atomico(ruta, texto): # Se escribe aparte y se reemplaza, así nunca se lee un archivo a medias.
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as archivo:
+        archivo.write(texto)
+    os.replace(temporal, ruta)
+
+def exportar(ruta_json=None, ruta_prometheus=None):
+    """
+    Guarda las métricas de la ejecución en JSON (por defecto, el archivo fijado por comenzar) y, si se indica
+    o está en METRICAS_PROMETHEUS, en formato Prometheus.
+    Devuelve los datos exportados, o None si las métricas están desactivadas.
+    """
+    if not _activas:
+        return None
+    ruta_json = ruta_json or _ruta_json or config.LOG_METRICAS.format(config.TIMESTAMP)
+    ruta_prometheus = ruta_prometheus or config.METRICAS_PROMETHEUS
+    datos = instantanea()
+    _escribir_atomico(ruta_json, json.dumps(datos, indent=2, ensure_ascii=False))
+    if ruta_prometheus:
+        _escribir_atomico(ruta_prometheus, texto_prometheus(datos))
+    return datos
+
+# FIN - Exportación.
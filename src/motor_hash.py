@@ -0,0 +1,110 @@
+import os
+import zlib
+import mmap
+import hashlib
+import threading
+import cache
+import metricas
+from escaner import obtener_stat
+from contenedores import actualizar_con_ogg
+from config import ALGORITMO_HASH, TAMANO_BUFFER_HASH, UMBRAL_MMAP
+
+"""
+Motor de hash de contenido compartido por los módulos de coincidencia exacta (audio, documentos y otros).
+Lee con readinto sobre un buffer reutilizable por hilo (o con mmap los archivos grandes, si se activa UMBRAL_MMAP)
+en lugar de crear un objeto bytes nuevo por cada bloque.
+"""
+
+ALGORITMOS_CRIPTOGRAFICOS = ("sha256", "blake2b")
+ALGORITMOS = ALGORITMOS_CRIPTOGRAFICOS + ("crc32",) # crc32 sólo sirve como primera pasada (hash parcial).
+SUFIJO_CARGA = "_carga" # Tipo de caché de los hashes de sólo la carga de un contenedor (ver contenedores.py).
+
+_local = threading.local()
+
+# INICIO - Algoritmos.
+class _Crc32: # Misma interfaz que los objetos de hashlib.
+    def __init__(self):
+        self.valor = 0
+
+    def update(self, datos):
+        self.valor = zlib.crc32(datos, self.valor)
+
+    def hexdigest(self):
+        return f"{self.valor:08x}"
+
+def nuevo_hash(algoritmo=ALGORITMO_HASH):
+    if algoritmo == "sha256":
+        return hashlib.sha256()
+    if algoritmo == "blake2b":
+        return hashlib.blake2b()
+    if algoritmo == "crc32":
+        return _Crc32()
+    raise ValueError(f"Algoritmo de hash desconocido: {algoritmo}")
+
+def _buffer(tamano): # Buffer de lectura del hilo actual; se reutiliza mientras no cambie el tamaño.
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None or len(buffer) != tamano:
+        buffer = _local.buffer = bytearray(tamano)
+    return memoryview(buffer)
+
+# FIN - Algoritmos.
+
+# INICIO - Lectura.
+def actualizar_con_archivo(hash_obj, f, cantidad=None, tamano_buffer=TAMANO_BUFFER_HASH):
+    """
+    Agrega al hash "cantidad" bytes de "f" desde la posición actual (o hasta el final si es None).
+    Devuelve los bytes leídos.
+    """
+    vista = _buffer(tamano_buffer)
+    leidos = 0
+    while cantidad is None or leidos < cantidad:
+        limite = tamano_buffer if cantidad is None else min(tamano_buffer, cantidad - leidos)
+        n = f.readinto(vista[:limite])
+        if not n:
+            break
+        hash_obj.update(vista[:n])
+        leidos += n
+    return leidos
+
+def hashear_archivo(ruta, algoritmo=ALGORITMO_HASH, tamano_buffer=TAMANO_BUFFER_HASH, umbral_mmap=UMBRAL_MMAP, carga=None):
+    """
+    Calcula el hash del contenido completo del archivo, sin pasar por la caché.
+    Con una "carga" (contenedores.Carga) sólo se hashea esa región del archivo.
+    Los archivos de "umbral_mmap" bytes o más se mapean en memoria y se hashean en una sola llamada;
+    umbral_mmap=None (el valor por omisión de config.UMBRAL_MMAP) desactiva mmap.
+    """
+    hash_obj = nuevo_hash(algoritmo)
+    with metricas.medir("hash.completo"), open(ruta, "rb", buffering=0) as f:
+        tamano = os.fstat(f.fileno()).st_size
+        inicio, largo = (0, tamano) if carga is None else (carga.inicio, min(carga.largo, tamano - carga.inicio))
+        metricas.sumar("hash.bytes_leidos_completo", largo)
+        if carga is not None and carga.ogg:
+            f.seek(inicio)
+            actualizar_con_ogg(hash_obj, f, largo, tamano_buffer)
+        elif umbral_mmap is not None and largo >= max(umbral_mmap, 1):
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapa, memoryview(mapa) as vista:
+                if hasattr(mapa, "madvise"):
+                    mapa.madvise(mmap.MADV_SEQUENTIAL)
+                hash_obj.update(vista[inicio:inicio + largo])
+        else:
+            f.seek(inicio)
+            actualizar_con_archivo(hash_obj, f, largo, tamano_buffer)
+    return hash_obj.hexdigest()
+
+def calcular_hash_contenido(ruta, algoritmo=ALGORITMO_HASH, carga=None):
+    """
+    Hash del contenido completo con la caché persistente; el tipo de la caché es el nombre del algoritmo,
+    más SUFIJO_CARGA si sólo se hashea la "carga".
+    Los errores de lectura se propagan para que cada módulo los registre a su manera.
+    """
+    tipo = algoritmo if carga is None else algoritmo + SUFIJO_CARGA
+    stat = obtener_stat(ruta)
+    guardado = cache.obtener(ruta, tipo, stat)
+    if guardado:
+        return guardado
+
+    valor = hashear_archivo(ruta, algoritmo, carga=carga)
+    cache.guardar(ruta, tipo, valor, stat)
+    return valor
+
+# FIN - Lectura.
@@ -0,0 +1,216 @@
+import os
+import time
+import errno
+import shutil
+import threading
+import metricas
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from escaner import obtener_stat
+from config import registrar_error, mover_a_problematicos, TRABAJADORES_COPIA, DIARIO_OPERACIONES
+
+"""
+Motor de movimiento compartido por todos los módulos.
+Dentro del mismo dispositivo cada archivo se mueve con os.rename, que no copia datos.
+Entre dispositivos se copia con copy_file_range o sendfile (la copia la hace el kernel)
+en un pool acotado de hilos, y después se borra el original.
+Los nombres de la carpeta de destino se leen una sola vez y las colisiones se resuelven en memoria.
+Los movimientos se hacen por lotes: primero se anotan y confirman en el registro las intenciones
+de todo el lote y recién después se mueven los archivos. Quien recibe los archivos de a uno
+(la tubería) llama a vaciar() cuando no tiene más pendientes, así nada espera a que el lote se llene.
+"""
+
+TAMANO_COPIA = 64 * 1024 * 1024 # Bytes pedidos al kernel en cada llamada de copia.
+TAMANO_LOTE_MOVIMIENTOS = 256 # Movimientos por cada confirmación de intenciones en el registro.
+
+# INICIO - Copia entre dispositivos.
+def _copiar_contenido(origen, destino):
+    """
+    Copia el contenido de "origen" a "destino" con la llamada más directa que acepte el sistema.
+    """
+    with open(origen, "rb") as f_origen, open(destino, "wb") as f_destino:
+        entrada, salida = f_origen.fileno(), f_destino.fileno()
+        restante = os.fstat(entrada).st_size
+
+        for copiar in (getattr(os, "copy_file_range", None), getattr(os, "sendfile", None)):
+            if copiar is None:
+                continue
+            try:
+                while restante > 0:
+                    if copiar is os.sendfile:
+                        copiados = copiar(salida, entrada, None, min(restante, TAMANO_COPIA))
+                    else:
+                        copiados = copiar(entrada, salida, min(restante, TAMANO_COPIA))
+                    if copiados == 0:
+                        break
+                    restante -= copiados
+                return
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP):
+                    raise
+                # Si la llamada no sirve para este par de sistemas de archivos se sigue con la próxima
+                # desde la posición ya alcanzada.
+
+        shutil.copyfileobj(f_origen, f_destino, 1024 * 1024)
+
+def copiar_y_borrar(origen, destino):
+    """
+    Mueve entre dispositivos: copia el contenido y los metadatos y recién entonces borra el original.
+    Si la copia falla se borra el destino incompleto.
+    """
+    try:
+        _copiar_contenido(origen, destino)
+        shutil.copystat(origen, destino)
+    except BaseException:
+        if os.path.exists(destino):
+            os.remove(destino)
+        raise
+    os.remove(origen)
+
+# FIN - Copia entre dispositivos.
+
+# INICIO - Motor.
+class MotorMovimiento:
+    """
+    Mueve archivos a "carpeta_destino" sin pisar nombres existentes.
+    Se usa como context manager: al salir mueve el último lote y espera las copias pendientes.
+    "estadisticas" cuenta los archivos renombrados, copiados entre dispositivos y fallidos.
+    """
+
+    def __init__(self, carpeta_destino, trabajadores=TRABAJADORES_COPIA, intentos=3, espera=5,
+                 diario=DIARIO_OPERACIONES, tamano_lote=TAMANO_LOTE_MOVIMIENTOS):
+        os.makedirs(carpeta_destino, exist_ok=True)
+        self.carpeta_destino = carpeta_destino
+        self.intentos = intentos
+        self.espera = espera
+        self.diario = diario
+        self.tamano_lote = tamano_lote
+        self.estadisticas = {"renombrados": 0, "copiados": 0, "fallidos": 0}
+        self._dispositivo = os.stat(carpeta_destino).st_dev
+        self._bloqueo = threading.Lock()
+        self._nombres = {os.path.normcase(nombre) for nombre in os.listdir(carpeta_destino)}
+        self._contadores = {} # (nombre base, extensión) -> último sufijo probado.
+        self._trabajadores = max(1, trabajadores)
+        self._pool = None
+        self._pendientes = deque()
+        self._lote = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
+
+    def reservar_nombre(self, ruta):
+        """
+        Devuelve un destino libre para "ruta" con el mismo esquema de siempre (nombre_1.ext, nombre_2.ext...)
+        y lo marca como usado, sin consultar el disco.
+        """
+        nombre = os.path.basename(ruta)
+        with self._bloqueo:
+            if os.path.normcase(nombre) in self._nombres:
+                nombre_base, extension = os.path.splitext(nombre)
+                contador = self._contadores.get((nombre_base, extension), 0)
+                while True:
+                    contador += 1
+                    nombre = f"{nombre_base}_{contador}{extension}"
+                    if os.path.normcase(nombre) not in self._nombres:
+                        break
+                self._contadores[(nombre_base, extension)] = contador
+            self._nombres.add(os.path.normcase(nombre))
+        return os.path.join(self.carpeta_destino, nombre)
+
+    def mover(self, ruta, hash_=None):
+        """
+        Agrega "ruta" al lote actual; el lote se mueve cuando se llena o al cerrar el motor.
+        "hash_" se guarda en el registro junto con el movimiento.
+        """
+        self._lote.append((ruta, hash_))
+        if len(self._lote) >= self.tamano_lote:
+            self._mover_lote()
+
+    def vaciar(self): # Mueve ya el lote actual, sin esperar a que se llene.
+        if self._lote:
+            self._mover_lote()
+
+    def _mover_lote(self):
+        lote, self._lote = self._lote, []
+        planes = []
+        for ruta, hash_ in lote:
+            destino = self.reservar_nombre(ruta)
+            try:
+                stat = obtener_stat(ruta)
+                mismo_dispositivo, tamano = stat.st_dev == self._dispositivo, stat.st_size
+            except OSError:
+                mismo_dispositivo, tamano = False, None
+            op = self.diario.intencion(ruta, destino, tamano, hash_, "rename" if mismo_dispositivo else "copia")
+            planes.append((op, ruta, destino, mismo_dispositivo, tamano))
+        self.diario.confirmar()  # Las intenciones quedan en disco antes de mover cualquier archivo.
+
+        for op, ruta, destino, mismo_dispositivo, tamano in planes:
+            if mismo_dispositivo:
+                self._con_reintentos(os.rename, op, ruta, destino, tamano, copiar_si_exdev=True)
+            else:
+                self._enviar(op, ruta, destino, tamano)
+
+    def _enviar(self, op, ruta, destino, tamano=None): # Copia en el pool, con a lo sumo dos copias pendientes por hilo.
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self._trabajadores)
+        while len(self._pendientes) >= self._trabajadores * 2:
+            self._pendientes.popleft().result()
+        self._pendientes.append(self._pool.submit(self._con_reintentos, copiar_y_borrar, op, ruta, destino, tamano))
+
+    def _con_reintentos(self, operacion, op, ruta, destino, tamano=None, copiar_si_exdev=False):
+        """
+        Ejecuta la operación reintentando si el archivo está bloqueado y anota el resultado en el registro.
+        Devuelve True si se movió (o si pasó al pool de copia porque el rename cruzó sistemas de archivos)
+        y False si falló.
+        """
+        medicion = "movimiento.rename" if operacion is os.rename else "movimiento.copia"
+        for intento in range(self.intentos):
+            try:
+                with metricas.medir(medicion):
+                    operacion(ruta, destino)
+                break
+            except PermissionError:
+                metricas.sumar("movimiento.reintentos")
+                if intento < self.intentos - 1:
+                    time.sleep(self.espera)
+            except OSError as e:
+                if copiar_si_exdev and e.errno == errno.EXDEV:
+                    self._enviar(op, ruta, destino, tamano)
+                    return True
+                registrar_error(ruta, f"Error al mover archivo: {e}, moviendo a problemáticos.")
+                return self._fallar(op, ruta)
+        else:
+            registrar_error(ruta, f"No se pudo mover tras {self.intentos} intentos.")
+            return self._fallar(op, ruta)
+
+        with self._bloqueo:
+            self.estadisticas["renombrados" if operacion is os.rename else "copiados"] += 1
+        metricas.sumar("movimiento.bytes_renombrados" if operacion is os.rename else "movimiento.bytes_copiados", tamano or 0)
+        self.diario.resultado(op)
+        return True
+
+    def _fallar(self, op, ruta):
+        metricas.sumar("movimiento.fallidos")
+        self.diario.resultado(op, exito=False)
+        with self._bloqueo:
+            self.estadisticas["fallidos"] += 1
+        try:
+            mover_a_problematicos(ruta, self.carpeta_destino)
+        except Exception as e:
+            registrar_error(ruta, f"Error al mover a problemáticos: {e}", consola=False)
+        return False
+
+    def cerrar(self): # Mueve el último lote, espera las copias pendientes y libera el pool.
+        self.vaciar()
+        while self._pendientes:
+            self._pendientes.popleft().result()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self.diario.confirmar()
+        return self.estadisticas
+
+# FIN - Motor.
@@ -1,22 +1,18 @@
-import os
-import shutil
-import hashlib
 from tqdm import tqdm
 from colorama import Fore, Style, init
-from config import registrar_error, registrar_operacion, mover_a_problematicos, EXTENSIONES_OTROS
+from motor_hash import calcular_hash_contenido
+from contenedores import huella_zip
+from exactos import buscar_duplicados_exactos, imprimir_reporte_niveles
+from escaner import escanear
+from mover import MotorMovimiento
+from config import registrar_error, HILOS_HASH_EXACTO, EXTENSIONES_OTROS, COMPARAR_ZIP_POR_CONTENIDO
 
 init(autoreset=True)
 
 # INICIO - Hash.
-def calcular_hash_otro(ruta_otro): # Calcula un hash SHA-256 del contenido del archivo.
+def calcular_hash_otro(ruta_otro): # Calcula el hash del contenido del archivo con el algoritmo configurado.
     try:
-        hash_sha256 = hashlib.sha256()
-        with open(ruta_otro, "rb") as f:
-
-            for bloque in iter(lambda: f.read(4096), b""):
-                hash_sha256.update(bloque)
-
-        return hash_sha256.hexdigest()
+        return calcular_hash_contenido(ruta_otro)
     
     except Exception as e:
         registrar_error(ruta_otro, f"Error al calcular hash: {e}")
@@ -25,56 +21,30 @@ def calcular_hash_otro(ruta_otro): # Calcula un hash SHA-256 del contenido del a
 # FIN - Hash.
 
 # INICIO - Ejecución.
-def obtener_archivos_otros(carpeta_origen): # Busca archivos válidos en la carpeta origen y subcarpetas.
-    archivos = []
-
-    for root, _, files in os.walk(carpeta_origen):
-        for file in files:
-            if file.lower().endswith(tuple(EXTENSIONES_OTROS)):
-                archivos.append(os.path.join(root, file))
-
-    return archivos
-
-def buscar_duplicados_otros(carpeta_origen): # Busca duplicados en la carpeta origen.
-    archivos = obtener_archivos_otros(carpeta_origen)
+def obtener_archivos_otros(carpeta_origen): # Busca archivos válidos en la/s carpeta/s origen y subcarpetas.
+    return escanear(carpeta_origen, {"Otros": EXTENSIONES_OTROS})["Otros"]
+
+def buscar_duplicados_otros(carpeta_origen, archivos=None, hilos=HILOS_HASH_EXACTO, por_contenido=COMPARAR_ZIP_POR_CONTENIDO):
+    """
+    Busca duplicados en la carpeta origen, o en los archivos ya escaneados.
+    Con "por_contenido" los ZIP se comparan por los archivos que contienen (ver contenedores.huella_zip).
+    """
+    if archivos is None:
+        archivos = obtener_archivos_otros(carpeta_origen)
     print(f"Archivos encontrados: {len(archivos)}")
-    hashes = {}
-    
-    for ruta in tqdm(archivos, desc="Calculando hashes"):
-        hash_otro = calcular_hash_otro(ruta)
-        if hash_otro:
-            clave = (hash_otro, os.path.splitext(ruta)[1])
-            if clave not in hashes:
-                hashes[clave] = []
-            hashes[clave].append(ruta)
-    
-    duplicados = {clave: rutas for clave, rutas in hashes.items() if len(rutas) > 1}
+    duplicados, reporte = buscar_duplicados_exactos(archivos, calcular_hash_otro, hilos=hilos,
+                                                    ubicar=huella_zip if por_contenido else None)
+    imprimir_reporte_niveles(reporte)
     return duplicados
 
 def mover_duplicados_otros(duplicados, carpeta_destino): # Mueve los archivos duplicados a la carpeta destino.
-    os.makedirs(carpeta_destino, exist_ok=True)
-
-    for _, grupo in tqdm(duplicados.items(), desc="Moviendo duplicados"):
-        original = grupo[0]
-        grupo.remove(original)
-        
-        for ruta in grupo:
-
-            try:
-                destino = os.path.join(carpeta_destino, os.path.basename(ruta))
-                contador = 1
-                while os.path.exists(destino):
-                    destino = os.path.join(
-                        carpeta_destino,
-                        f"{os.path.splitext(os.path.basename(ruta))[0]}_{contador}{os.path.splitext(ruta)[1]}"
-                    )
-                    contador += 1
-                shutil.move(ruta, destino)
-                registrar_operacion(ruta, destino)
+    with MotorMovimiento(carpeta_destino) as motor:
+        for (hash_, _), grupo in tqdm(duplicados.items(), desc="Moviendo duplicados"):
+            original = grupo[0]
+            grupo.remove(original)
 
-            except Exception as e:
-                registrar_error(Fore.LIGHTRED_EX + ruta, f"Error al mover archivo: {e}" + Style.RESET_ALL)
-                mover_a_problematicos(ruta, carpeta_destino)
+            for ruta in grupo:
+                motor.mover(ruta, hash_)
     
     print(Fore.LIGHTGREEN_EX + "Archivos movidos exitosamente." + Style.RESET_ALL)
 
@@ -0,0 +1,53 @@
+from itertools import islice
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import metricas
+
+# INICIO - Pool de trabajadores.
+def _procesar_lote(funcion, lote): # Se ejecuta en el trabajador: procesa un lote completo en una sola tarea.
+    return [funcion(elemento) for elemento in lote]
+
+def _procesar_lote_medido(funcion, lote):
+    """
+    Como _procesar_lote, pero activa las métricas en el trabajador y las devuelve junto con los resultados.
+    Lo acumulado antes se descarta: en un fork son las métricas heredadas del proceso principal.
+    """
+    metricas.activar()
+    metricas.reiniciar()
+    return [funcion(elemento) for elemento in lote], metricas.extraer()
+
+def mapear_en_paralelo(funcion, elementos, trabajadores, tamano_lote=16, max_en_vuelo=None,
+                       hilos=False, inicializador=None, argumentos_inicializador=()):
+    """
+    Aplica "funcion" a cada elemento en un pool de procesos (o de hilos si "hilos" es True)
+    y devuelve los resultados en el mismo orden de entrada.
+    Los elementos se envían en lotes y nunca hay más de "max_en_vuelo" lotes pendientes,
+    así la memoria no crece con la cantidad de elementos.
+    Con las métricas activas, las de los procesos trabajadores se suman a las de este proceso.
+    """
+    max_en_vuelo = max_en_vuelo or trabajadores * 2
+    ejecutor = ThreadPoolExecutor if hilos else ProcessPoolExecutor
+    iterador = iter(elementos)
+    medido = metricas.activas() and not hilos # Los hilos ya comparten las métricas de este proceso.
+
+    with ejecutor(trabajadores, initializer=inicializador, initargs=argumentos_inicializador) as pool:
+        pendientes = deque()
+
+        def enviar_lote():
+            lote = list(islice(iterador, tamano_lote))
+            if lote:
+                pendientes.append(pool.submit(_procesar_lote_medido if medido else _procesar_lote, funcion, lote))
+            return bool(lote)
+
+        while len(pendientes) < max_en_vuelo and enviar_lote():
+            pass
+
+        while pendientes:
+            resultados = pendientes.popleft().result()
+            if medido:
+                resultados, datos = resultados
+                metricas.fusionar(datos)
+            enviar_lote()
+            yield from resultados
+
+# FIN - Pool de trabajadores.
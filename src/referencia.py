@@ -0,0 +1,206 @@
+import os
+import sqlite3
+import numpy as np
+from tqdm import tqdm
+from functools import partial
+import cache
+import metricas
+from escaner import recorrer, normalizar_raices, obtener_stat, olvidar_stat
+from incremental import Instantanea
+from imagenes import iterar_hashes, hashear_imagen, empaquetar_hashes, EXTENSIONES_IMAGENES, TAMANO_LOTE_IMAGENES
+from indice import buscar_en_referencia
+from mover import MotorMovimiento
+from paralelo import mapear_en_paralelo
+from config import registrar_error, INDICE_REFERENCIA_DB, INSTANTANEA_REFERENCIA_DB
+
+"""
+Biblioteca de referencia: un índice persistente de hashes perceptuales de una colección ya ordenada
+(por ejemplo, un archivo de fotos) para comparar contra ella sólo las imágenes nuevas.
+El índice se construye una vez y en cada ejecución se actualiza en el lugar: sólo se hashean los archivos
+agregados o modificados y se borran las filas de los que ya no están. Los archivos de la referencia
+nunca se mueven: sólo se leen.
+"""
+
+TAMANO_LOTE_REFERENCIA = 1000 # Filas guardadas por transacción al actualizar el índice.
+_SIGNO = 1 << 63 # SQLite guarda enteros de 64 bits con signo.
+
+def _con_signo(valor): # uint64 -> int64, para guardarlo en SQLite.
+    return valor - (1 << 64) if valor >= _SIGNO else valor
+
+def _rango(raiz): # Límites de las rutas dentro de "raiz", para consultarlas con el índice de la clave primaria.
+    return raiz + os.sep, raiz + chr(ord(os.sep) + 1)
+
+# INICIO - Índice.
+class IndiceReferencia:
+    """
+    Índice de referencia en SQLite: una fila por imagen con la firma del archivo y sus cuatro hashes.
+    Las imágenes que no se pudieron leer se guardan sin hashes, para no volver a intentarlo mientras no cambien.
+    """
+
+    def __init__(self, ruta=INDICE_REFERENCIA_DB, reducida=False):
+        self.ruta = ruta
+        self.reducida = reducida
+        self._conexion = None
+
+    def _conectar(self):
+        if self._conexion is None:
+            self._conexion = sqlite3.connect(self.ruta)
+            self._conexion.execute("PRAGMA journal_mode = WAL")
+            self._conexion.execute("PRAGMA synchronous = NORMAL")
+            self._conexion.execute("""
+                CREATE TABLE IF NOT EXISTS imagenes (
+                    ruta TEXT PRIMARY KEY,
+                    firma TEXT NOT NULL,
+                    h0 INTEGER, h1 INTEGER, h2 INTEGER, h3 INTEGER
+                )
+            """)
+        return self._conexion
+
+    def _firma(self, stat): # Cambiar el modo de decodificación invalida las filas: los hashes no son comparables.
+        return cache.firma_archivo(stat) + (":reducida" if self.reducida else "")
+
+    def _recorrer(self, raices, excluir, instantanea):
+        """
+        Recorre la referencia sin descartar los stats del recorrido de los orígenes, que siguen en uso.
+        """
+        tipos = {"Imagenes": EXTENSIONES_IMAGENES}
+        if instantanea is None:
+            for ruta, _ in recorrer(raices, tipos, excluir, olvidar=False):
+                yield ruta
+        else:
+            for ruta, _, _ in instantanea.recorrer(raices, tipos, excluir, olvidar=False):
+                yield ruta
+
+    def _hashear(self, rutas, trabajadores):
+        """
+        Genera (datos, error) de imagenes.hashear_imagen para cada ruta, en el mismo orden. No pasa por la caché
+        general: los hashes de la referencia ya se guardan en este índice, y la caché crecería con toda la colección.
+        """
+        funcion = partial(hashear_imagen, reducida=self.reducida)
+        if trabajadores <= 1:
+            return map(funcion, rutas)
+        return mapear_en_paralelo(funcion, rutas, trabajadores, TAMANO_LOTE_IMAGENES)
+
+    def actualizar(self, raices, trabajadores=1, excluir=(), instantanea=None):
+        """
+        Recorre las carpetas de "raices", hashea las imágenes nuevas o modificadas y borra del índice
+        las que ya no existen. Con una "instantanea" (incremental.Instantanea) sólo se listan las carpetas
+        que cambiaron; tiene que ser una propia de la referencia, porque al guardarse olvida las carpetas
+        de estas raíces que no recorrió (entre ellas, las excluidas).
+        Devuelve cuántas imágenes hay, cuántas se agregaron o actualizaron y cuántas se borraron.
+        """
+        raices = [os.path.abspath(raiz) for raiz in normalizar_raices(raices)]
+        conexion = self._conectar()
+        conexion.execute("CREATE TEMP TABLE IF NOT EXISTS recorrido (ruta TEXT PRIMARY KEY, firma TEXT NOT NULL)")
+        conexion.execute("DELETE FROM recorrido")
+
+        def firmas():
+            for ruta in self._recorrer(raices, excluir, instantanea):
+                try:
+                    yield ruta, self._firma(obtener_stat(ruta))
+                except OSError as e:
+                    registrar_error(ruta, f"Error al leer entrada: {e}", consola=False)
+                olvidar_stat(ruta) # No se guardan los stats de toda la referencia.
+
+        with metricas.medir("referencia.recorrido"):
+            conexion.executemany("INSERT OR REPLACE INTO recorrido VALUES (?, ?)", firmas())
+        total = conexion.execute("SELECT COUNT(*) FROM recorrido").fetchone()[0]
+        cambiadas = conexion.execute(
+            "SELECT r.ruta, r.firma FROM recorrido r LEFT JOIN imagenes i ON i.ruta = r.ruta WHERE i.firma IS NOT r.firma"
+        ).fetchall()
+
+        eliminadas = 0
+        with conexion:
+            for raiz in raices:
+                eliminadas += conexion.execute(
+                    "DELETE FROM imagenes WHERE ruta > ? AND ruta < ? AND ruta NOT IN (SELECT ruta FROM recorrido)",
+                    _rango(raiz)
+                ).rowcount
+
+        filas = []
+        resultados = self._hashear([ruta for ruta, _ in cambiadas], trabajadores)
+        for (ruta, firma), (datos, error) in tqdm(zip(cambiadas, resultados), total=len(cambiadas), desc="Indexando referencia"):
+            if error:
+                registrar_error(ruta, error, consola=False)
+            hashes = [_con_signo(h) for h in empaquetar_hashes(datos["hashes"])] if datos else [None] * 4
+            filas.append((ruta, firma, *hashes))
+            if len(filas) >= TAMANO_LOTE_REFERENCIA:
+                self._guardar(filas)
+        self._guardar(filas)
+
+        metricas.sumar("referencia.indexadas", len(cambiadas))
+        return {"imagenes": total, "indexadas": len(cambiadas), "eliminadas": eliminadas}
+
+    def _guardar(self, filas): # Guarda y vacía "filas"; cada lote queda confirmado aunque se interrumpa la actualización.
+        with self._conectar() as conexion:
+            conexion.executemany("INSERT OR REPLACE INTO imagenes VALUES (?, ?, ?, ?, ?, ?)", filas)
+        filas.clear()
+
+    def cargar(self, raices):
+        """
+        Devuelve (rutas, matriz) con las imágenes del índice dentro de "raices": "matriz" es un arreglo
+        uint64 con una fila por ruta y una columna por hash.
+        """
+        rutas, hashes = [], []
+        for raiz in (os.path.abspath(raiz) for raiz in normalizar_raices(raices)):
+            for ruta, *valores in self._conectar().execute(
+                "SELECT ruta, h0, h1, h2, h3 FROM imagenes WHERE ruta > ? AND ruta < ? AND h0 IS NOT NULL", _rango(raiz)
+            ):
+                rutas.append(ruta)
+                hashes.append(valores)
+        return rutas, np.array(hashes, dtype=np.int64).reshape(-1, 4).view(np.uint64)
+
+    def cerrar(self):
+        if self._conexion is not None:
+            self._conexion.close()
+            self._conexion = None
+
+# FIN - Índice.
+
+# INICIO - Consulta.
+def buscar_en_biblioteca(raices_referencia, archivos, carpeta_destino, umbral_hash=3, trabajadores=1, reducida=False,
+                         mover=True, excluir=(), incremental=False):
+    """
+    Actualiza el índice de "raices_referencia" y busca en él cada imagen de "archivos" (sólo éstas se hashean).
+    Las imágenes que están dentro del umbral de alguna de la referencia se mueven a "carpeta_destino",
+    o sólo se informan si "mover" es False. "excluir" son las carpetas que no forman parte de la referencia
+    (el destino y los orígenes, si están dentro de ella). Con "incremental" la referencia se recorre con
+    su propia instantánea (INSTANTANEA_REFERENCIA_DB), separada de la de los orígenes.
+    Devuelve (resumen, archivos sin coincidencias).
+    """
+    indice = IndiceReferencia(reducida=reducida)
+    instantanea = Instantanea(INSTANTANEA_REFERENCIA_DB) if incremental else None
+    try:
+        actualizacion = indice.actualizar(raices_referencia, trabajadores, excluir, instantanea)
+        rutas_referencia, referencia = indice.cargar(raices_referencia)
+    finally:
+        indice.cerrar()
+        if instantanea is not None:
+            instantanea.cerrar()
+    print(f"Imágenes en la referencia: {len(rutas_referencia)}")
+
+    registros = [registro for registro in tqdm(iterar_hashes(archivos, trabajadores, reducida), total=len(archivos),
+                                               desc="Procesando imágenes nuevas") if registro]
+    consultas = np.array([empaquetar_hashes(registro.hashes) for registro in registros], dtype=np.uint64).reshape(-1, 4)
+    with metricas.medir("referencia.consulta"):
+        filas, columnas = buscar_en_referencia(referencia, consultas, umbral_hash)
+
+    coincidencias = {}
+    for fila, columna in zip(filas.tolist(), columnas.tolist()):
+        if registros[fila].ruta != rutas_referencia[columna]:
+            coincidencias.setdefault(fila, []).append(rutas_referencia[columna])
+
+    resumen = {"referencia": actualizacion, "consultadas": len(registros), "coincidencias": [
+        {"ruta": registros[fila].ruta, "referencias": encontradas} for fila, encontradas in coincidencias.items()
+    ], "movimiento": None}
+    if mover:
+        with MotorMovimiento(carpeta_destino) as motor:
+            for fila in coincidencias:
+                motor.mover(registros[fila].ruta, ",".join(str(h) for h in registros[fila].hashes))
+        resumen["movimiento"] = motor.estadisticas
+    print(f"Imágenes que ya están en la referencia: {len(coincidencias)}")
+
+    encontradas = {registros[fila].ruta for fila in coincidencias}
+    return resumen, [ruta for ruta in archivos if ruta not in encontradas]
+
+# FIN - Consulta.
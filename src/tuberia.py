@@ -0,0 +1,238 @@
+import os
+import time
+import queue
+import threading
+from tqdm import tqdm
+from colorama import Fore, Style, init
+from escaner import recorrer, obtener_stat
+from mover import MotorMovimiento
+from exactos import PrefiltroIncremental, imprimir_reporte_niveles
+from config import registrar_error
+
+init(autoreset=True)
+
+"""
+Búsqueda de duplicados exactos por etapas: recorrido -> hash -> movimiento.
+Las etapas corren a la vez y se comunican por colas acotadas, así el hash empieza mientras
+el recorrido sigue y cada duplicado se mueve apenas queda confirmado. Las colas acotan sólo lo que
+espera entre etapas: el prefiltro guarda un original por cada contenido distinto y el escáner el stat
+de cada archivo recorrido, así que esa memoria sí crece con el árbol.
+Los tipos perceptuales (imágenes y videos) sólo se recolectan en el mismo recorrido,
+porque para elegir el mejor archivo de un grupo hace falta el grupo completo.
+"""
+
+TAMANO_COLA = 1024 # Elementos máximos en cada cola entre etapas.
+
+_FIN = object()
+
+# INICIO - Colas.
+class Cola:
+    """
+    Cola acotada que mide la contrapresión entre dos etapas: cuánto tiempo estuvo bloqueado
+    el productor con la cola llena y cuánto esperó el consumidor con la cola vacía.
+    """
+
+    def __init__(self, tamano=TAMANO_COLA):
+        self._cola = queue.Queue(tamano)
+        self.elementos = 0
+        self.bloqueos = 0
+        self.espera_llena = 0.0
+        self.espera_vacia = 0.0
+        self.ocupacion_maxima = 0
+
+    def poner(self, elemento):
+        try:
+            self._cola.put_nowait(elemento)
+        except queue.Full:
+            self.bloqueos += 1
+            inicio = time.perf_counter()
+            self._cola.put(elemento)
+            self.espera_llena += time.perf_counter() - inicio
+        if elemento is not _FIN:
+            self.elementos += 1
+        self.ocupacion_maxima = max(self.ocupacion_maxima, self._cola.qsize())
+
+    def sacar(self):
+        try:
+            return self._cola.get_nowait()
+        except queue.Empty:
+            inicio = time.perf_counter()
+            elemento = self._cola.get()
+            self.espera_vacia += time.perf_counter() - inicio
+            return elemento
+
+    def vacia(self): # True si por ahora no hay elementos esperando.
+        return self._cola.empty()
+
+    def __iter__(self): # Devuelve los elementos hasta que el productor marca el final.
+        while (elemento := self.sacar()) is not _FIN:
+            yield elemento
+
+# FIN - Colas.
+
+# INICIO - Etapas.
+def _etapa_recorrido(raices, tipos, tipos_exactos, excluir, salida, perceptuales, errores, detener, instantanea=None):
+    """
+    Con "instantanea" el recorrido es incremental: cada archivo se entrega marcado como nuevo o no, así el
+    prefiltro conserva el archivo viejo y mueve la copia recién llegada aunque ésta aparezca primero.
+    Deja de recorrer cuando otra etapa falla ("detener").
+    """
+    try:
+        if instantanea is None:
+            recorrido = ((ruta, tipos_archivo, True) for ruta, tipos_archivo in recorrer(raices, tipos, excluir))
+        else:
+            recorrido = instantanea.recorrer(raices, tipos, excluir)
+
+        for ruta, tipos_archivo, nuevo in recorrido:
+            if detener.is_set():
+                return
+            exacto = next((tipo for tipo in tipos_archivo if tipo in tipos_exactos), None)
+            if exacto:
+                salida.poner((exacto, ruta, nuevo))
+            for tipo in tipos_archivo:
+                if tipo not in tipos_exactos:
+                    perceptuales[tipo].append(ruta)
+    except BaseException as e:
+        errores.append(e)
+    finally:
+        salida.poner(_FIN)
+
+def _sin_cambios(ruta):
+    """
+    True si el archivo sigue igual al stat con el que se hasheó (el del recorrido o el de la instantánea).
+    Un archivo editado en el lugar no cambia el mtime de su carpeta: la instantánea conserva el stat viejo
+    y la caché devuelve el hash del contenido anterior.
+    """
+    try:
+        actual = os.stat(ruta)
+    except OSError as e:
+        registrar_error(ruta, f"Error al leer entrada: {e}", consola=False)
+        return False
+    guardado = obtener_stat(ruta)
+    if (actual.st_size, actual.st_mtime_ns, actual.st_ino, actual.st_dev) != \
+            (guardado.st_size, guardado.st_mtime_ns, guardado.st_ino, guardado.st_dev):
+        registrar_error(ruta, "El archivo cambió desde que se hasheó: su par de duplicados no se mueve.", consola=False)
+        return False
+    return True
+
+def _etapa_movimiento(entrada, carpeta_destino, movidos, errores, detener):
+    """
+    Los duplicados se juntan en lotes mientras llegan seguidos; cuando la entrada queda vacía el lote
+    se mueve enseguida, así ningún duplicado confirmado espera a que se llene.
+    Antes de mover se confirma que ninguno de los dos archivos cambió desde que se hasheó; si cambió, el par se descarta.
+    Si el movimiento falla, guarda el error, avisa a las otras etapas y sigue vaciando la entrada
+    hasta el final, así la etapa de hash nunca queda bloqueada con la cola llena.
+    """
+    try:
+        with MotorMovimiento(carpeta_destino) as motor:
+            for tipo, original, duplicado, hash_ in entrada:
+                if _sin_cambios(original) and _sin_cambios(duplicado):
+                    motor.mover(duplicado, hash_)
+                    movidos[tipo] += 1
+                if entrada.vacia():
+                    motor.vaciar()
+    except BaseException as e:
+        errores.append(e)
+        detener.set()
+        for _ in entrada:
+            pass
+
+def ejecutar_tuberia(raices, carpeta_destino, tipos, tipos_exactos, tamano_cola=TAMANO_COLA, hilos=1, instantanea=None,
+                     cargas=None):
+    """
+    Recorre "raices" una sola vez buscando los tipos de "tipos" ({tipo: extensiones}).
+    Los tipos de "tipos_exactos" ({tipo: calcular_hash}) se hashean y mueven
+    mientras sigue el recorrido; el resto se devuelve como {tipo: [rutas]} para procesarlos después.
+    "hilos" es la cantidad de lecturas de hash simultáneas de la etapa de hash.
+    Con una "instantanea" (incremental.Instantanea) sólo se listan las carpetas que cambiaron desde la última vez.
+    "cargas" ({tipo: ubicar}) indica los tipos que se comparan sólo por su carga (ver exactos.PrefiltroIncremental).
+    También devuelve {tipo: reporte del prefiltro}, {tipo: duplicados movidos} y las estadísticas por etapa.
+    """
+    archivos = Cola(tamano_cola)
+    movimientos = Cola(tamano_cola)
+    perceptuales = {tipo: [] for tipo in tipos if tipo not in tipos_exactos}
+    prefiltro = PrefiltroIncremental(tipos_exactos, hilos=hilos, cargas=cargas)
+    movidos = {tipo: 0 for tipo in tipos_exactos}
+    errores = []
+    detener = threading.Event() # Alguna etapa falló: las demás terminan sin procesar lo que falta.
+
+    inicio = time.perf_counter()
+    recorrido = threading.Thread(
+        target=_etapa_recorrido, daemon=True,
+        args=(raices, tipos, tipos_exactos, [carpeta_destino], archivos, perceptuales, errores, detener, instantanea)
+    )
+    movimiento = threading.Thread(
+        target=_etapa_movimiento, daemon=True, args=(movimientos, carpeta_destino, movidos, errores, detener)
+    )
+    recorrido.start()
+    movimiento.start()
+
+    fin_leido = threading.Event() # La etapa de hash ya sacó el final de la cola de archivos.
+    try:
+        with tqdm(desc="Procesando archivos", unit=" archivos") as progreso:
+            def entradas():
+                for elemento in archivos:
+                    progreso.update()
+                    yield elemento
+                fin_leido.set()
+
+            for confirmado in prefiltro.procesar(entradas()):
+                if detener.is_set():
+                    break
+                movimientos.poner(confirmado)
+    except BaseException:
+        detener.set()
+        raise
+    finally:
+        movimientos.poner(_FIN)
+        movimiento.join()
+        if detener.is_set() and not fin_leido.is_set():
+            for _ in archivos: # Libera al recorrido si quedó bloqueado con la cola llena.
+                pass
+        recorrido.join()
+
+    if errores:
+        raise errores[0]
+
+    reportes = prefiltro.finalizar()
+    estadisticas = {
+        "Recorrido": {"elementos": archivos.elementos, "espera_entrada_s": 0.0,
+                      "espera_salida_s": archivos.espera_llena, "bloqueos_salida": archivos.bloqueos,
+                      "ocupacion_maxima_salida": archivos.ocupacion_maxima},
+        "Hash": {"elementos": archivos.elementos, "espera_entrada_s": archivos.espera_vacia,
+                 "espera_salida_s": movimientos.espera_llena, "bloqueos_salida": movimientos.bloqueos,
+                 "ocupacion_maxima_salida": movimientos.ocupacion_maxima},
+        "Movimiento": {"elementos": movimientos.elementos, "espera_entrada_s": movimientos.espera_vacia,
+                       "espera_salida_s": 0.0, "bloqueos_salida": 0, "ocupacion_maxima_salida": 0},
+        "Total": {"duracion_s": time.perf_counter() - inicio},
+    }
+    if instantanea is not None:
+        estadisticas["Recorrido"].update(instantanea.estadisticas)
+    return perceptuales, reportes, movidos, estadisticas
+
+# FIN - Etapas.
+
+# INICIO - Reporte.
+def imprimir_reporte_tuberia(reportes, movidos, estadisticas):
+    """
+    Muestra el prefiltro de cada tipo y la contrapresión de cada etapa: mucha espera de salida
+    indica que la etapa siguiente es el cuello de botella, mucha espera de entrada que lo es la anterior.
+    """
+    for tipo, reporte in reportes.items():
+        print(Fore.LIGHTMAGENTA_EX + f"{tipo}: {movidos[tipo]} duplicados movidos." + Style.RESET_ALL)
+        imprimir_reporte_niveles(reporte)
+
+    recorrido = estadisticas["Recorrido"]
+    if "carpetas_reutilizadas" in recorrido:
+        print(Fore.LIGHTCYAN_EX + f"Recorrido incremental: {recorrido['carpetas_leidas']} carpetas leídas, "
+              f"{recorrido['carpetas_reutilizadas']} sin cambios, {recorrido['archivos_nuevos']} archivos nuevos o modificados."
+              + Style.RESET_ALL)
+    print(Fore.LIGHTCYAN_EX + f"Etapas ({estadisticas['Total']['duracion_s']:.2f} s en total):" + Style.RESET_ALL)
+    for etapa in ("Recorrido", "Hash", "Movimiento"):
+        datos = estadisticas[etapa]
+        print(Fore.LIGHTCYAN_EX + f"  {etapa}: {datos['elementos']} elementos, "
+              f"{datos['espera_entrada_s']:.2f} s esperando entrada, "
+              f"{datos['espera_salida_s']:.2f} s bloqueada por la salida ({datos['bloqueos_salida']} veces), "
+              f"cola de salida máxima {datos['ocupacion_maxima_salida']}" + Style.RESET_ALL)
+
+# FIN - Reporte.
@@ -1,9 +1,16 @@
 import os
 import cv2
-import shutil
+import time
+import numpy as np
+import cache
+import metricas
 from tqdm import tqdm
 from colorama import Fore, Style, init
-from config import registrar_error, registrar_operacion, mover_a_problematicos, EXTENSIONES_VIDEOS
+from indice import agrupar_por_muestras
+from paralelo import mapear_en_paralelo
+from escaner import escanear, obtener_stat
+from mover import MotorMovimiento
+from config import registrar_error, mover_a_problematicos, EXTENSIONES_VIDEOS
 
 init(autoreset=True)
 
@@ -18,122 +25,253 @@ Es una solución temporal mientras puedo ajustar la nueva versión.
 """
 
 # INICIO - Configuraciones dinámicas.
-def configurar_backend(ruta_video): # Intenta configurar el mejor backend de decodificación disponible.
-    backends = [cv2.CAP_FFMPEG, cv2.CAP_GSTREAMER, cv2.CAP_DSHOW]
+BACKENDS = [cv2.CAP_FFMPEG, cv2.CAP_GSTREAMER, cv2.CAP_DSHOW]
+MUESTRAS_VIDEO = 16 # Frames muestreados por video, en posiciones relativas fijas.
+BITS_MUESTRA = 64 # Bits del dHash de cada frame.
+UMBRAL_VIDEO = 6 # Bits distintos permitidos por muestra, en promedio, para considerar dos videos duplicados.
+FRAMES_MEDICION_GRAB = 8 # Frames avanzados con grab() después de la primera búsqueda, para medir su costo.
+
+_backends_por_extension = {} # Backend que funcionó para cada tipo de contenedor.
+
+def configurar_backend(ruta_video):
+    """
+    Abre el video con el mejor backend de decodificación disponible y devuelve (captura, backend).
+    Recuerda el backend elegido por extensión para probarlo primero con los siguientes videos.
+    """
+    extension = os.path.splitext(ruta_video)[1].lower()
+    preferido = _backends_por_extension.get(extension)
+    backends = [preferido] + [b for b in BACKENDS if b != preferido] if preferido is not None else BACKENDS
 
     for backend in backends:
         cap = cv2.VideoCapture(ruta_video, backend)
         if cap.isOpened():
-            cap.release()
-            return backend
-        
+            _backends_por_extension[extension] = backend
+            return cap, backend
+        cap.release()
+
     print(Fore.LIGHTYELLOW_EX + "No se pudo seleccionar backend, usando predeterminado." + Style.RESET_ALL)
-    return None
+    return cv2.VideoCapture(ruta_video), None
 
-def definir_frame_interval(ruta_video):
+class SesionVideo:
     """
-    Determina automáticamente el frame_interval en función de la duración y FPS del video.
+    Abre un video una sola vez y guarda sus datos básicos (fps, frames, resolución y duración).
+    Los frames se leen avanzando con grab() y decodificando sólo los pedidos con retrieve(),
+    y sólo se busca con set() cuando resulta más barato que avanzar (set() decodifica desde el último keyframe).
     """
-    try:
-        cap = cv2.VideoCapture(ruta_video)
+    def __init__(self, ruta_video):
+        self.ruta = ruta_video
+        self.cap, self.backend = configurar_backend(ruta_video)
+        if not self.cap.isOpened():
+            raise ValueError("No se puede abrir el video.")
 
-        if not cap.isOpened():
-            return 30  # Valor por defecto si no se puede abrir el video.
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        self.frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.ancho = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.alto = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.duracion = self.frames / self.fps
+        self.posicion = 0 # Índice del próximo frame que devolvería grab().
+
+    def calidad(self, tamano): # Criterio usado para elegir la mejor copia.
+        return self.ancho * self.alto, int(self.duracion), tamano
+
+    def leer_frames(self, indices):
+        """
+        Genera (indice, frame) para cada índice pedido, en orden creciente.
+        Para cada salto elige entre avanzar con grab() o buscar con set(), según lo que haya costado
+        cada forma en los frames anteriores de este mismo video (el costo de set() depende de la
+        distancia entre keyframes del códec). Mientras no se conoce el costo de grab(), los saltos de más de
+        FRAMES_MEDICION_GRAB frames buscan hasta esa cantidad de frames antes del pedido y avanzan el resto
+        con grab() para medirlo: así los frames avanzados no dependen de la duración del video.
+        Si un frame no se puede leer devuelve (indice, None) y termina.
+        """
+        costo_grab = costo_busqueda = None  # Segundos por frame avanzado y por búsqueda.
+
+        for indice in indices:
+            avance = indice - self.posicion + 1
+            if avance <= 0:
+                buscar = True
+            elif costo_grab is None:
+                buscar = avance > FRAMES_MEDICION_GRAB
+            elif avance == 1:
+                buscar = False
+            elif costo_busqueda is None:
+                buscar = True
+            else:
+                buscar = costo_busqueda < avance * costo_grab
+
+            if buscar:
+                destino = indice - FRAMES_MEDICION_GRAB + 1 if costo_grab is None else indice
+                inicio = time.perf_counter()
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, destino)
+                self.posicion = destino
+                costo_busqueda = time.perf_counter() - inicio
+                metricas.registrar_tiempo("videos.busqueda", costo_busqueda)
+
+            inicio = time.perf_counter()
+            leidos = 0
+            while self.posicion <= indice:
+                if not self.cap.grab():
+                    yield indice, None
+                    return
+                self.posicion += 1
+                leidos += 1
+            if leidos > 1:
+                costo_grab = (time.perf_counter() - inicio) / leidos
+
+            ret, frame = self.cap.retrieve()
+            metricas.sumar("videos.frames_avanzados", leidos)
+            metricas.sumar("videos.frames_decodificados")
+
+            yield indice, frame if ret else None
+            if not ret:
+                return
 
-        fps = cap.get(cv2.CAP_PROP_FPS) or 30
-        duracion = cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps if fps > 0 else 60
+    def cerrar(self):
+        self.cap.release()
 
-        if duracion < 60:
-            return 10  # Videos cortos: Mayor precisión.
-        elif duracion < 300:
-            return 30  # Videos medios: Balanceado.
-        else:
-            return 60  # Videos largos: Optimizado.
-        
-    except Exception:
-        return 30  # Valor por defecto en caso de error.
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cerrar()
 
 # FIN - Configuraciones dinámicas.
 
 # INICIO - Hashes.
-def calcular_hash_video(ruta_video):
+def hash_perceptual_frame(frame):
     """
-    Calcula un hash basado en frames seleccionados de un video.
-    Utiliza un frame_interval dinámico determinado por la función definir_frame_interval.
+    dHash de 64 bits del frame: se reduce a 9x8 en escala de grises y cada bit indica
+    si un píxel es más claro que el de su izquierda. Resiste recompresión y cambios de resolución.
     """
-    frame_interval = definir_frame_interval(ruta_video)
-    backend = configurar_backend(ruta_video)
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    pequeno = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return int.from_bytes(np.packbits(pequeno[:, 1:] > pequeno[:, :-1]).tobytes(), "big")
 
+def analizar_video(ruta_video):
+    """
+    Calcula la huella perceptual de un video: un dHash de cada uno de MUESTRAS_VIDEO frames tomados
+    en posiciones relativas fijas, empaquetados en un solo entero de MUESTRAS_VIDEO * 64 bits.
+    La cantidad de frames leídos no depende de la duración del video. Abre el video una sola vez
+    y obtiene también su calidad. No usa la caché, el registro ni mueve archivos, así puede
+    ejecutarse en otro proceso. Devuelve (huella, calidad, None) o (None, None, mensaje de error).
+    """
     try:
-        cap = cv2.VideoCapture(ruta_video, backend)
-        if not cap.isOpened():
-            raise ValueError("No se puede abrir el video.")
-        
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        tamano = os.path.getsize(ruta_video)
+        metricas.sumar("videos.bytes_archivos", tamano)
+        with metricas.medir("videos.analisis"), SesionVideo(ruta_video) as sesion:
+            if sesion.frames == 0:
+                raise ValueError("El archivo de video no contiene frames válidos.")
+
+            huella = 0
+            indices = [int(sesion.frames * (i + 0.5) / MUESTRAS_VIDEO) for i in range(MUESTRAS_VIDEO)]
+            for i, frame in sesion.leer_frames(indices):
+                if frame is None:
+                    return None, None, f"Error al leer frame {i}, moviendo a problemáticos."
+                try:
+                    huella = (huella << BITS_MUESTRA) | hash_perceptual_frame(frame)
+                except Exception as e:
+                    return None, None, f"Error al procesar frame {i}: {e}, moviendo a problemáticos."
+
+            return huella, sesion.calidad(tamano), None
 
-        if frame_count == 0:
-            raise ValueError("El archivo de video no contiene frames válidos.")
+    except Exception as e:
+        return None, None, f"Error al calcular hash: {e}, moviendo a problemáticos."
 
-        frames_hash = []
+def registrar_resultado_video(ruta_video, stat, huella, calidad, error):
+    """
+    Registra el error y aparta el video, o guarda la huella y la calidad en la caché.
+    Siempre se ejecuta en el proceso principal: los trabajadores nunca mueven archivos.
+    """
+    if error:
+        registrar_error(ruta_video, error)
+        mover_a_problematicos(ruta_video, os.path.dirname(ruta_video))
+        return None, None
+    cache.guardar(ruta_video, "video_calidad", calidad, stat)
+    cache.guardar(ruta_video, "huella_video", format(huella, "x"), stat)
+    return huella, tuple(calidad)
 
-        for i in tqdm(range(0, frame_count, max(1, frame_interval)), desc="Procesando frames"):
-            cap.set(cv2.CAP_PROP_POS_FRAMES, i)
-            ret, frame = cap.read()
+def consultar_cache_video(ruta_video, stat): # Devuelve (huella, calidad) guardadas, o None si falta alguna.
+    huella = cache.obtener(ruta_video, "huella_video", stat)
+    calidad = cache.obtener(ruta_video, "video_calidad", stat) if huella else None
+    return (int(huella, 16), tuple(calidad)) if calidad else None
 
-            if not ret:
-                registrar_error(ruta_video, f"Error al leer frame {i}, moviendo a problemáticos.")
-                cap.release()
-                mover_a_problematicos(ruta_video, os.path.dirname(ruta_video))
-                return None
+def calcular_hash_video(ruta_video):
+    """
+    Devuelve (huella, calidad) del video, desde la caché si el archivo no cambió.
+    """
+    try:
+        stat = obtener_stat(ruta_video)
+    except OSError as e:
+        registrar_error(ruta_video, f"Error al calcular hash: {e}")
+        return None, None
 
-            try:
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                frames_hash.append(hash(gray.tobytes()))
+    guardado = consultar_cache_video(ruta_video, stat)
+    if guardado:
+        metricas.sumar("videos.desde_cache")
+        return guardado
+    return registrar_resultado_video(ruta_video, stat, *analizar_video(ruta_video))
 
-            except Exception as e:
-                registrar_error(ruta_video, f"Error al procesar frame {i}: {e}, moviendo a problemáticos.")
-                cap.release()
-                mover_a_problematicos(ruta_video, os.path.dirname(ruta_video))
-                return None
+def configurar_trabajador(hilos_opencv): # Limita los hilos internos de OpenCV en cada proceso del pool.
+    cv2.setNumThreads(hilos_opencv)
 
-        cap.release()
-        return sum(frames_hash) // len(frames_hash) if frames_hash else None
+def iterar_huellas(archivos, trabajadores=1, hilos_opencv=1):
+    """
+    Genera (ruta, huella, calidad) en el mismo orden que "archivos" (None si falló).
+    Con más de un trabajador, los videos que no están en la caché se analizan en un pool de procesos
+    con "hilos_opencv" hilos de OpenCV cada uno, para no saturar los núcleos.
+    """
+    if trabajadores <= 1:
+        for ruta in archivos:
+            yield ruta, *calcular_hash_video(ruta)
+        return
 
-    except Exception as e:
-        registrar_error(ruta_video, f"Error al calcular hash: {e}, moviendo a problemáticos.")
-        mover_a_problematicos(ruta_video, os.path.dirname(ruta_video))
-        return None
+    consultas = []
+    for ruta in archivos:
+        try:
+            stat = obtener_stat(ruta)
+            consultas.append((ruta, stat, consultar_cache_video(ruta, stat)))
+        except OSError as e:
+            registrar_error(ruta, f"Error al calcular hash: {e}")
+            consultas.append((ruta, None, None))
+
+    if metricas.activas():
+        metricas.sumar("videos.desde_cache", sum(1 for _, _, guardado in consultas if guardado))
+    faltantes = (ruta for ruta, stat, guardado in consultas if stat and not guardado)
+    resultados = mapear_en_paralelo(analizar_video, faltantes, trabajadores, tamano_lote=1,
+                                    inicializador=configurar_trabajador, argumentos_inicializador=(hilos_opencv,))
+
+    for ruta, stat, guardado in consultas:
+        if stat is None:
+            yield ruta, None, None
+        elif guardado:
+            yield ruta, *guardado
+        else:
+            yield ruta, *registrar_resultado_video(ruta, stat, *next(resultados))
 
 # FIN - Hashes.
 
 # INICIO - Análisis y procesamiento.
-def obtener_archivos_videos(carpeta): # Busca archivos válidos en la carpeta origen y subcarpetas.
-    archivos = []
+def obtener_archivos_videos(carpeta): # Busca archivos válidos en la/s carpeta/s origen y subcarpetas.
+    return escanear(carpeta, {"Videos": EXTENSIONES_VIDEOS})["Videos"]
 
-    for root, _, files in os.walk(carpeta):
-        for file in files:
-            if file.lower().endswith(tuple(EXTENSIONES_VIDEOS)):
-                archivos.append(os.path.join(root, file))
-
-    return archivos
-
-def seleccionar_mejor_calidad(grupo_videos):
+def seleccionar_mejor_calidad(grupo_videos, calidades=None):
     """
     Selecciona el video de mejor calidad basado en resolución, duración y tamaño.
+    Usa las calidades ya obtenidas al calcular las huellas si se pasan en "calidades".
     """
     def obtener_calidad(ruta):
+        if calidades and ruta in calidades:
+            return calidades[ruta]
         try:
-            cap = cv2.VideoCapture(ruta)
-            if not cap.isOpened():
-                raise ValueError("No se puede abrir el video.")
-
-            ancho = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            alto = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            fps = cap.get(cv2.CAP_PROP_FPS) or 1
-            duracion = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) / fps)
-            tamano = os.path.getsize(ruta)
-            cap.release()
-            return ancho * alto, duracion, tamano
+            stat = obtener_stat(ruta)
+            guardado = cache.obtener(ruta, "video_calidad", stat)
+            if guardado:
+                return tuple(guardado)
+
+            with SesionVideo(ruta) as sesion:
+                calidad = sesion.calidad(stat.st_size)
+            cache.guardar(ruta, "video_calidad", calidad, stat)
+            return calidad
         
         except Exception as e:
             registrar_error(ruta, f"Error al obtener calidad: {e}")
@@ -144,46 +282,39 @@ def seleccionar_mejor_calidad(grupo_videos):
 # FIN - Análisis y procesamiento.
 
 # INICIO - Ejecución.
-def buscar_videos(carpeta_origen, carpeta_destino):
-    archivos = obtener_archivos_videos(carpeta_origen)
+def buscar_videos(carpeta_origen, carpeta_destino, trabajadores=1, hilos_opencv=1, archivos=None, umbral=UMBRAL_VIDEO):
+    """
+    Busca videos duplicados y los mueve. "umbral" son los bits distintos permitidos por muestra, en promedio.
+    Devuelve {"encontrados": n, "grupos": n, "movimiento": estadísticas del motor}.
+    """
+    if archivos is None:
+        archivos = obtener_archivos_videos(carpeta_origen)
     print(f"Videos encontrados: {len(archivos)}")
     
-    hashes = {}
-    for ruta in tqdm(archivos, desc="Calculando hashes"):
-        hash_video = calcular_hash_video(ruta)
-        if hash_video:
-            hashes.setdefault(hash_video, []).append(ruta)
-    
-    duplicados = {hash_: rutas for hash_, rutas in hashes.items() if len(rutas) > 1}
-    mover_duplicados_videos(duplicados, carpeta_destino)
-
-def mover_duplicados_videos(duplicados, carpeta_destino): # Mueve los archivos duplicados, dejando el de mejor calidad.
-    os.makedirs(carpeta_destino, exist_ok=True)
-
-    for hash_, grupo in tqdm(duplicados.items(), desc="Moviendo duplicados"):
-        referencia = seleccionar_mejor_calidad(grupo)
-        grupo.remove(referencia)
-
-        for ruta in grupo:
-
-            try:
-                destino = os.path.join(carpeta_destino, os.path.basename(ruta))
-                contador = 1
-                nombre_base, extension = os.path.splitext(os.path.basename(ruta))
-
-                while os.path.exists(destino):
-                    destino = os.path.join(
-                        carpeta_destino,
-                        f"{nombre_base}_{contador}{extension}"
-                    )
-                    contador += 1
-                shutil.move(ruta, destino)
-                registrar_operacion(ruta, destino)
-
-            except Exception as e:
-                registrar_error(ruta, f"Error al mover archivo: {e}, moviendo a problemáticos.")
-                mover_a_problematicos(ruta, carpeta_destino)
+    huellas = []
+    calidades = {}
+    for ruta, huella, calidad in tqdm(iterar_huellas(archivos, trabajadores, hilos_opencv), total=len(archivos), desc="Calculando hashes"):
+        if huella is not None:
+            huellas.append((ruta, (huella,)))
+            calidades[ruta] = calidad
+
+    # Las huellas se agrupan con un índice de Hamming por muestra: copias recodificadas o redimensionadas
+    # quedan a pocos bits de distancia aunque sus bytes no se parezcan en nada.
+    grupos = agrupar_por_muestras(huellas, umbral * MUESTRAS_VIDEO, MUESTRAS_VIDEO, BITS_MUESTRA, posicion=0)
+    duplicados = {huella: rutas for (huella,), rutas in grupos if len(rutas) > 1}
+    return {"encontrados": len(archivos), "grupos": len(duplicados),
+            "movimiento": mover_duplicados_videos(duplicados, carpeta_destino, calidades)}
+
+def mover_duplicados_videos(duplicados, carpeta_destino, calidades=None): # Mueve los archivos duplicados, dejando el de mejor calidad.
+    with MotorMovimiento(carpeta_destino) as motor:
+        for hash_, grupo in tqdm(duplicados.items(), desc="Moviendo duplicados"):
+            referencia = seleccionar_mejor_calidad(grupo, calidades)
+            grupo.remove(referencia)
+
+            for ruta in grupo:
+                motor.mover(ruta)
 
     print(Fore.LIGHTGREEN_EX + "Videos duplicados movidos exitosamente." + Style.RESET_ALL)
+    return motor.estadisticas
 
 # FIN - Ejecución.
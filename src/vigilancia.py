@@ -0,0 +1,191 @@
+import os
+import time
+import errno
+import signal
+import select
+import struct
+import ctypes
+import ctypes.util
+from config import registrar_error, ESPERA_VIGILANCIA, INTERVALO_SONDEO, LOG_DIR
+
+"""
+Modo vigilancia: espera a que lleguen archivos a las carpetas de origen y dispara una pasada
+incremental cuando dejan de llegar durante unos segundos (así una copia grande no se procesa a medias).
+En Linux usa inotify por ctypes, sin dependencias; si no está disponible, o se agota el límite de
+carpetas vigiladas (fs.inotify.max_user_watches), revisa cada INTERVALO_SONDEO segundos: la pasada
+incremental sólo relee las carpetas que cambiaron, así que sondear también es barato.
+Sólo disparan una pasada los archivos que llegan o cambian: los que se van (incluidos los que mueve
+el propio programa) no, y tampoco lo que pasa en el destino o en "Registros".
+"""
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+
+MASCARA = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENTO = struct.Struct("iIII") # wd, mask, cookie, len; le sigue el nombre.
+
+# INICIO - Vigilantes.
+class VigilanteInotify:
+    """
+    Vigila con inotify cada carpeta de los árboles de "raices" (inotify no es recursivo:
+    las carpetas nuevas se agregan a medida que aparecen).
+    """
+
+    def __init__(self, raices, excluir=()):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._agregar_vigilancia = libc.inotify_add_watch
+        self._agregar_vigilancia.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._quitar_vigilancia = libc.inotify_rm_watch
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self._excluidas = {os.path.realpath(carpeta) for carpeta in excluir}
+        self._raices = list(raices)
+        self._carpetas = {} # wd -> carpeta
+        try:
+            for raiz in raices:
+                self._vigilar_arbol(raiz)
+        except OSError:
+            self.cerrar()
+            raise
+
+    def _vigilar(self, carpeta):
+        wd = self._agregar_vigilancia(self._fd, os.fsencode(carpeta), MASCARA)
+        if wd < 0:
+            codigo = ctypes.get_errno()
+            if codigo == errno.ENOSPC: # Límite de vigilancias agotado: no sirve vigilar sólo una parte.
+                raise OSError(codigo, "Se alcanzó fs.inotify.max_user_watches")
+            registrar_error(carpeta, f"No se pudo vigilar la carpeta: {os.strerror(codigo)}", consola=False)
+            return
+        self._carpetas[wd] = carpeta
+
+    def _vigilar_arbol(self, raiz):
+        for carpeta, subcarpetas, _ in os.walk(raiz):
+            subcarpetas[:] = [nombre for nombre in subcarpetas
+                              if os.path.realpath(os.path.join(carpeta, nombre)) not in self._excluidas]
+            self._vigilar(carpeta)
+
+    def _excluida(self, ruta): # True si "ruta" es una carpeta excluida o está dentro de una.
+        ruta = os.path.realpath(ruta)
+        return any(ruta == carpeta or ruta.startswith(carpeta + os.sep) for carpeta in self._excluidas)
+
+    def _leer_eventos(self):
+        """
+        Lee los eventos pendientes y empieza a vigilar las carpetas nuevas. Devuelve True si hubo alguno.
+        Si la cola de inotify se desbordó se perdieron eventos, quizás de carpetas nuevas: se vuelven
+        a recorrer todas las raíces para vigilarlas y se dispara una pasada.
+        Lanza OSError si se agota el límite de vigilancias.
+        """
+        hubo = False
+        while True:
+            try:
+                datos = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return hubo
+            posicion = 0
+            while posicion < len(datos):
+                wd, mascara, _, largo = _EVENTO.unpack_from(datos, posicion)
+                nombre = datos[posicion + _EVENTO.size:posicion + _EVENTO.size + largo].rstrip(b"\0")
+                posicion += _EVENTO.size + largo
+                if mascara & IN_IGNORED:
+                    self._carpetas.pop(wd, None)
+                    continue
+                if mascara & IN_Q_OVERFLOW:
+                    for raiz in self._raices:
+                        self._vigilar_arbol(raiz)
+                    hubo = True
+                    continue
+                carpeta = self._carpetas.get(wd)
+                if carpeta is None:
+                    continue
+                ruta = os.path.join(carpeta, os.fsdecode(nombre))
+                if self._excluida(ruta):
+                    continue
+                hubo = True
+                if mascara & IN_ISDIR and mascara & (IN_CREATE | IN_MOVED_TO):
+                    self._vigilar_arbol(ruta)
+
+    def esperar(self, espera=ESPERA_VIGILANCIA):
+        """
+        Bloquea hasta que llega algún cambio y después hasta que pasan "espera" segundos sin cambios.
+        """
+        while True:
+            select.select([self._fd], [], [])
+            if self._leer_eventos():
+                break
+        while select.select([self._fd], [], [], espera)[0]:
+            self._leer_eventos()
+
+    def cerrar(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+class VigilanteSondeo:
+    """
+    Alternativa sin inotify: cada "intervalo" segundos se dispara una pasada.
+    """
+
+    def __init__(self, intervalo=INTERVALO_SONDEO):
+        self.intervalo = intervalo
+
+    def esperar(self, espera=ESPERA_VIGILANCIA):
+        time.sleep(self.intervalo)
+
+    def cerrar(self):
+        pass
+
+def crear_vigilante(raices, excluir=(), intervalo=INTERVALO_SONDEO):
+    """
+    Devuelve un VigilanteInotify si el sistema lo permite, o un VigilanteSondeo.
+    """
+    if hasattr(os, "O_NONBLOCK") and ctypes.util.find_library("c"):
+        try:
+            return VigilanteInotify(raices, excluir)
+        except (OSError, AttributeError) as e: # AttributeError: la libc no tiene inotify (no es Linux).
+            registrar_error(", ".join(raices), f"Sin inotify, se revisará cada {intervalo:g} s: {e}", consola=False)
+    return VigilanteSondeo(intervalo)
+
+# FIN - Vigilantes.
+
+# INICIO - Ciclo.
+def _interrumpir(*_):
+    raise KeyboardInterrupt
+
+def vigilar(pasada, raices, excluir=(), espera=ESPERA_VIGILANCIA, intervalo=INTERVALO_SONDEO):
+    """
+    Ejecuta "pasada()" una vez y después cada vez que el vigilante detecta archivos nuevos,
+    hasta que se interrumpe con Ctrl+C o SIGTERM (systemd, kill), cerrando los registros normalmente.
+    "Registros" se excluye siempre. Si inotify falla mientras vigila (por ejemplo, se agota el límite
+    de vigilancias al crearse carpetas nuevas), se sigue revisando cada "intervalo" segundos.
+    """
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, _interrumpir)
+    excluir = [*excluir, LOG_DIR]
+    vigilante = crear_vigilante(raices, excluir, intervalo)
+    try:
+        pasada()
+        while True:
+            try:
+                vigilante.esperar(espera)
+            except OSError as e:
+                registrar_error(", ".join(raices), f"Sin inotify, se revisará cada {intervalo:g} s: {e}", consola=False)
+                vigilante.cerrar()
+                vigilante = VigilanteSondeo(intervalo)
+            pasada()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        vigilante.cerrar()
+
+# FIN - Ciclo.
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Los módulos de src se importan sin paquete, como al ejecutar main.py o cli.py desde esa carpeta.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+# config.py crea "Registros" en la carpeta actual al importarse: las pruebas corren en una carpeta temporal.
+os.chdir(tempfile.mkdtemp(prefix="doppelfiles-pruebas-"))
@@ -0,0 +1,28 @@
+import threading
+
+import cache
+
+def test_primer_uso_concurrente(tmp_path, monkeypatch):
+    # Los hilos que abren la caché a la vez tienen que esperar a que la tabla exista.
+    monkeypatch.setattr(cache, "CACHE_DB", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(cache, "_conexion", None)
+    errores = []
+    monkeypatch.setattr(cache, "registrar_error", lambda ruta, mensaje, consola=True: errores.append(mensaje))
+    archivo = tmp_path / "archivo"
+    archivo.write_bytes(b"x")
+    barrera = threading.Barrier(8)
+
+    def guardar(numero):
+        barrera.wait()
+        cache.guardar(f"{archivo}-{numero}", "prueba", numero, archivo.stat())
+
+    hilos = [threading.Thread(target=guardar, args=(numero,)) for numero in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    try:
+        assert errores == []
+        assert cache._conectar().execute("SELECT COUNT(*) FROM cache").fetchone()[0] == 8
+    finally:
+        cache.cerrar()
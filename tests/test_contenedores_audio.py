@@ -0,0 +1,160 @@
+import random
+import struct
+import zlib
+
+import pytest
+
+from contenedores import ubicar_carga
+from motor_hash import hashear_archivo
+
+AUDIO = random.Random(8).randbytes(40000)
+OTRO_AUDIO = AUDIO[:20000] + bytes([AUDIO[20000] ^ 1]) + AUDIO[20001:]
+
+# INICIO - Etiquetas.
+def _synchsafe(valor):
+    return bytes((valor >> desplazamiento) & 0x7F for desplazamiento in (21, 14, 7, 0))
+
+def _id3v2(texto, pie=False):
+    cuerpo = b"TIT2" + _synchsafe(len(texto) + 1) + b"\x00\x00\x03" + texto
+    banderas = 0x10 if pie else 0
+    etiqueta = b"ID3\x04\x00" + bytes([banderas]) + _synchsafe(len(cuerpo)) + cuerpo
+    return etiqueta + (b"3DI\x04\x00" + bytes([banderas]) + _synchsafe(len(cuerpo)) if pie else b"")
+
+def _id3v1(titulo):
+    return b"TAG" + titulo.ljust(125, b"\x00")
+
+def _ape(texto):
+    elementos = struct.pack("<II", len(texto), 0) + b"Title\x00" + texto
+    def bloque(banderas):
+        return b"APETAGEX" + struct.pack("<IIII", 2000, len(elementos) + 32, 1, banderas) + bytes(8)
+    return bloque(0xA0000000) + elementos + bloque(0x80000000) # Con cabecera y pie.
+
+def _lyrics3(texto):
+    cuerpo = b"LYRICSBEGIN" + b"IND00002" + b"11" + b"LYR" + b"%05d" % len(texto) + texto
+    return cuerpo + b"%06d" % len(cuerpo) + b"LYRICS200"
+
+# FIN - Etiquetas.
+
+# INICIO - Contenedores.
+def _mp3(audio):
+    return [
+        audio,
+        _id3v2(b"Titulo") + audio,
+        _id3v2(b"Otro titulo mucho mas largo" * 20) + _id3v2(b"Apilada") + audio,
+        audio + _id3v1(b"Titulo"),
+        _id3v2(b"Titulo") + audio + _ape(b"Titulo APE") + _id3v1(b"Titulo"),
+        audio + _lyrics3(b"La la la") + _id3v1(b"Titulo"),
+        audio + _id3v2(b"Al final", pie=True),
+    ]
+
+def _bloque_flac(tipo, datos, ultimo=False):
+    return bytes([tipo | (0x80 if ultimo else 0)]) + len(datos).to_bytes(3, "big") + datos
+
+def _flac(audio):
+    info = _bloque_flac(0, bytes(range(34)))
+    comentario = lambda texto, ultimo=False: _bloque_flac(4, struct.pack("<I", 3) + b"ref" + struct.pack("<I", 1)
+                                                          + struct.pack("<I", len(texto)) + texto, ultimo)
+    return [
+        b"fLaC" + _bloque_flac(0, bytes(range(34)), ultimo=True) + audio,
+        b"fLaC" + info + comentario(b"TITLE=Titulo", ultimo=True) + audio,
+        b"fLaC" + info + comentario(b"TITLE=Otro") + _bloque_flac(6, bytes(30000)) + _bloque_flac(1, bytes(500), True) + audio,
+        _id3v2(b"Titulo") + b"fLaC" + info + comentario(b"TITLE=Titulo", ultimo=True) + audio + _id3v1(b"Titulo"),
+    ]
+
+def _chunk(tipo, datos):
+    return tipo + struct.pack("<I", len(datos)) + datos + (b"\x00" if len(datos) & 1 else b"")
+
+def _wav(audio):
+    formato = _chunk(b"fmt ", struct.pack("<HHIIHH", 1, 2, 44100, 176400, 4, 16))
+    lista = _chunk(b"LIST", b"INFO" + _chunk(b"INAM", b"Titulo impar\x00"))
+    def riff(*chunks):
+        cuerpo = b"WAVE" + b"".join(chunks)
+        return b"RIFF" + struct.pack("<I", len(cuerpo)) + cuerpo
+    return [
+        riff(formato, _chunk(b"data", audio)),
+        riff(formato, lista, _chunk(b"data", audio)),
+        riff(lista, formato, _chunk(b"data", audio), _chunk(b"id3 ", _id3v2(b"Titulo"))),
+    ]
+
+def _atomo(tipo, datos, largo_64=False):
+    if largo_64:
+        return struct.pack(">I", 1) + tipo + struct.pack(">Q", len(datos) + 16) + datos
+    return struct.pack(">I", len(datos) + 8) + tipo + datos
+
+def _m4a(audio):
+    tipo = _atomo(b"ftyp", b"M4A \x00\x00\x02\x00isomM4A ")
+    moov = lambda etiquetas: _atomo(b"moov", _atomo(b"mvhd", bytes(100)) + _atomo(b"udta", _atomo(b"meta", etiquetas)))
+    return [
+        tipo + moov(b"") + _atomo(b"mdat", audio),
+        tipo + moov(_atomo(b"covr", bytes(20000))) + _atomo(b"mdat", audio),
+        tipo + _atomo(b"free", bytes(64)) + _atomo(b"mdat", audio) + moov(_atomo(b"\xa9nam", b"Titulo")),
+        tipo + moov(b"") + _atomo(b"mdat", audio, largo_64=True),
+    ]
+
+def _paginas_ogg(paquetes, secuencia, granulo=0, inicio=False):
+    """
+    Pagina "paquetes" (una página nueva para el primero) y devuelve (páginas, siguiente secuencia).
+    Las páginas llevan un CRC que depende de su contenido y de su número de secuencia.
+    """
+    segmentos, datos = [], b""
+    for paquete in paquetes:
+        segmentos += [255] * (len(paquete) // 255) + [len(paquete) % 255]
+        datos += paquete
+    paginas, continuada = b"", False
+    while segmentos:
+        tabla, segmentos = segmentos[:255], segmentos[255:]
+        cuerpo, datos = datos[:sum(tabla)], datos[sum(tabla):]
+        banderas = (0x01 if continuada else 0) | (0x02 if inicio else 0)
+        cabecera = b"OggS\x00" + bytes([banderas]) + struct.pack("<qII", granulo, 1234, secuencia)
+        crc = zlib.crc32(cabecera + cuerpo)
+        paginas += cabecera + struct.pack("<I", crc) + bytes([len(tabla)]) + bytes(tabla) + cuerpo
+        secuencia, continuada, inicio = secuencia + 1, tabla[-1] == 255, False
+    return paginas, secuencia
+
+def _ogg_con(cabeceras, comentarios, audio):
+    primera, secuencia = _paginas_ogg(cabeceras[:1], 0, inicio=True)
+    resto, secuencia = _paginas_ogg([cabeceras[1](comentarios), *cabeceras[2:]], secuencia)
+    paginas = primera + resto
+    for numero, desde in enumerate(range(0, len(audio), 4000)):
+        paquetes = [audio[posicion:posicion + 1000] for posicion in range(desde, min(desde + 4000, len(audio)), 1000)]
+        pagina, secuencia = _paginas_ogg(paquetes, secuencia, granulo=(numero + 1) * 1024)
+        paginas += pagina
+    return paginas
+
+VORBIS = (b"\x01vorbis" + bytes(23), lambda texto: b"\x03vorbis" + texto, b"\x05vorbis" + bytes(300))
+OPUS = (b"OpusHead" + bytes(11), lambda texto: b"OpusTags" + texto)
+
+def _ogg(audio):
+    return [_ogg_con(VORBIS, texto, audio) for texto in (b"", b"TITLE=Titulo", bytes(70000), bytes(130000))]
+
+def _opus(audio):
+    return [_ogg_con(OPUS, texto, audio) for texto in (b"", bytes(70000))]
+
+# FIN - Contenedores.
+
+FORMATOS = {".mp3": _mp3, ".flac": _flac, ".wav": _wav, ".m4a": _m4a, ".ogg": _ogg, ".opus": _opus}
+
+def _hash(ruta, datos):
+    ruta.write_bytes(datos)
+    carga = ubicar_carga(str(ruta))
+    assert carga is not None
+    return hashear_archivo(str(ruta), carga=carga)
+
+@pytest.mark.parametrize("extension", FORMATOS)
+def test_reetiquetar_no_cambia_el_hash(tmp_path, extension):
+    variantes = FORMATOS[extension](AUDIO)
+    assert len(set(variantes)) == len(variantes)
+    hashes = {_hash(tmp_path / f"variante{numero}{extension}", datos) for numero, datos in enumerate(variantes)}
+    assert len(hashes) == 1
+
+@pytest.mark.parametrize("extension", FORMATOS)
+def test_audio_distinto_cambia_el_hash(tmp_path, extension):
+    original = _hash(tmp_path / f"original{extension}", FORMATOS[extension](AUDIO)[1])
+    modificado = _hash(tmp_path / f"modificado{extension}", FORMATOS[extension](OTRO_AUDIO)[1])
+    assert original != modificado
+
+def test_paginas_ogg_renumeradas(tmp_path):
+    # Los comentarios largos ocupan más páginas: las de audio cambian de número de secuencia y de CRC.
+    corto, largo = _ogg(AUDIO)[0], _ogg(AUDIO)[2]
+    assert corto[-len(AUDIO) // 2:] != largo[-len(AUDIO) // 2:]
+    assert _hash(tmp_path / "corto.ogg", corto) == _hash(tmp_path / "largo.ogg", largo)
@@ -0,0 +1,98 @@
+import hashlib
+import struct
+import zipfile
+
+import pytest
+
+from contenedores import huella_zip, Huella
+
+MIEMBROS = {
+    "documento.xml": b"<texto>" + b"hola mundo " * 500 + b"</texto>",
+    "imagenes/foto.bin": bytes(range(256)) * 40,
+    "vacio.txt": b"",
+}
+
+def _escribir(ruta, miembros=MIEMBROS, compresion=zipfile.ZIP_STORED, comentario=b"", **opciones):
+    with zipfile.ZipFile(ruta, "w", compression=compresion) as archivo:
+        archivo.comment = comentario
+        for nombre, datos in miembros.items():
+            info = zipfile.ZipInfo(nombre)
+            info.compress_type = compresion
+            with archivo.open(info, "w", **opciones) as miembro:
+                miembro.write(datos)
+    return ruta
+
+def _esperada(ruta): # La huella calculada con el directorio que lee zipfile.
+    with zipfile.ZipFile(ruta) as archivo:
+        miembros = sorted((info.filename.encode(), info.CRC, info.file_size)
+                          for info in archivo.infolist() if not info.is_dir())
+    valor = hashlib.sha256()
+    for nombre, crc, tamano in miembros:
+        valor.update(struct.pack("<I", len(nombre)) + nombre + struct.pack("<IQ", crc, tamano))
+    return Huella(sum(miembro[2] for miembro in miembros), valor.hexdigest())
+
+def test_guardado_y_comprimido_tienen_la_misma_huella(tmp_path):
+    guardado = _escribir(tmp_path / "guardado.zip")
+    comprimido = _escribir(tmp_path / "comprimido.zip", compresion=zipfile.ZIP_DEFLATED)
+    assert guardado.read_bytes() != comprimido.read_bytes()
+    assert huella_zip(str(guardado)) == huella_zip(str(comprimido)) == _esperada(guardado)
+
+def test_contenido_distinto_cambia_la_huella(tmp_path):
+    original = _escribir(tmp_path / "original.docx")
+    modificado = _escribir(tmp_path / "modificado.docx", {**MIEMBROS, "documento.xml": b"<texto>chau</texto>"})
+    assert huella_zip(str(original)) != huella_zip(str(modificado))
+
+def test_carpetas_ignoradas(tmp_path):
+    sin_carpetas = _escribir(tmp_path / "sin.zip")
+    con_carpetas = _escribir(tmp_path / "con.zip", {"imagenes/": b"", **MIEMBROS})
+    assert huella_zip(str(sin_carpetas)) == huella_zip(str(con_carpetas))
+
+def test_miembros_zip64(tmp_path):
+    normal = _escribir(tmp_path / "normal.zip")
+    forzado = _escribir(tmp_path / "forzado.zip", compresion=zipfile.ZIP_DEFLATED, force_zip64=True)
+    assert b"PK\x06\x06" not in forzado.read_bytes() # Sólo los miembros llevan el campo extra zip64.
+    assert huella_zip(str(forzado)) == huella_zip(str(normal)) == _esperada(forzado)
+
+def test_fin_de_directorio_zip64(tmp_path):
+    miembros = {f"{numero:05d}.txt": str(numero).encode() for numero in range(0x10000)}
+    ruta = _escribir(tmp_path / "muchos.zip", miembros)
+    with open(ruta, "rb") as f:
+        f.seek(-22, 2)
+        assert struct.unpack("<4s6xH", f.read(12)) == (b"PK\x05\x06", 0xFFFF)
+    assert huella_zip(str(ruta)) == _esperada(ruta)
+
+@pytest.mark.parametrize("relleno", [0, 10000])
+def test_comentario_con_firma_de_fin_falsa(tmp_path, relleno):
+    # Un registro de fin de directorio falso en el comentario, que apunta a un directorio vacío
+    # (zipfile mismo lo toma por el verdadero: la huella esperada sale del archivo sin comentario).
+    falso = b"PK\x05\x06" + struct.pack("<HHHHIIH", 0, 0, 0, 0, 0, 0, 0)
+    comentario = b"x" * relleno + falso + b"fin del comentario"
+    normal = _escribir(tmp_path / "normal.zip")
+    comentado = _escribir(tmp_path / "comentado.zip", comentario=comentario)
+    assert huella_zip(str(comentado)) == huella_zip(str(normal)) == _esperada(normal)
+
+def test_datos_agregados_al_principio(tmp_path):
+    normal = _escribir(tmp_path / "normal.zip")
+    autoextraible = tmp_path / "autoextraible.zip"
+    autoextraible.write_bytes(b"MZ" + bytes(5000) + normal.read_bytes())
+    assert huella_zip(str(autoextraible)) == huella_zip(str(normal))
+
+@pytest.mark.parametrize("cortados", [1, 22, 100])
+def test_archivo_truncado(tmp_path, cortados):
+    datos = _escribir(tmp_path / "completo.zip").read_bytes()
+    truncado = tmp_path / "truncado.zip"
+    truncado.write_bytes(datos[:-cortados])
+    assert huella_zip(str(truncado)) is None
+
+def test_directorio_truncado(tmp_path):
+    # El fin de directorio está completo pero falta el principio del directorio central.
+    datos = _escribir(tmp_path / "completo.zip").read_bytes()
+    fin = datos.rfind(b"PK\x05\x06")
+    largo, posicion = struct.unpack_from("<II", datos, fin + 12)
+    truncado = tmp_path / "truncado.zip"
+    truncado.write_bytes(datos[posicion + largo - 30:])
+    assert huella_zip(str(truncado)) is None
+
+def test_extension_que_no_es_zip(tmp_path):
+    ruta = _escribir(tmp_path / "documento.txt")
+    assert huella_zip(str(ruta)) is None
@@ -0,0 +1,19 @@
+import random
+
+from indice import agrupar_por_umbral, agrupar_por_muestras
+
+def test_por_muestras_igual_que_lineal():
+    # Huellas de 16 muestras de 64 bits, con copias a distancias alrededor del umbral total (96 bits).
+    azar = random.Random(8)
+    elementos = []
+    for numero in range(300):
+        huella = azar.getrandbits(1024)
+        elementos.append((numero, (huella,)))
+        for copia in range(azar.randint(0, 2)):
+            for _ in range(azar.randint(0, 130)):
+                huella ^= 1 << azar.randrange(1024)
+            elementos.append((f"{numero}-{copia}", (huella,)))
+    azar.shuffle(elementos)
+    lineal = agrupar_por_umbral(elementos, 96, posicion=0, bits=1024)
+    assert any(len(datos) > 1 for _, datos in lineal)
+    assert agrupar_por_muestras(elementos, 96, 16, 64, posicion=0) == lineal